@@ -12,6 +12,8 @@ Reference:
 
 import httpx
 import asyncio
+import logging
+import os
 import zipfile
 import io
 from pathlib import Path
@@ -26,9 +28,13 @@ import pyproj
 from shapely.geometry import Point, box as shapely_box
 from shapely.ops import transform as shapely_transform
 
+from app import metrics
 
-# ATOM Feed URL
-ATOM_FEED_URL = "https://atom.cuzk.gov.cz/DMR5G-SJTSK/DMR5G-SJTSK.xml"
+logger = logging.getLogger(__name__)
+
+
+# ATOM Feed URL (CUZK_ATOM_FEED_URL přesměruje např. na lokální stub, viz benchmarks/cuzk_stub.py)
+ATOM_FEED_URL = os.getenv("CUZK_ATOM_FEED_URL", "https://atom.cuzk.gov.cz/DMR5G-SJTSK/DMR5G-SJTSK.xml")
 
 # Namespaces pro XML parsing
 NAMESPACES = {
@@ -37,10 +43,18 @@ NAMESPACES = {
     'inspire_dls': 'http://inspire.ec.europa.eu/schemas/inspire_dls/1.0'
 }
 
-# Cache adresář pro stažená data
-CACHE_DIR = Path(__file__).parent.parent / "data_cache" / "dmr5g"
+# Cache adresář pro stažená data (DATA_CACHE_DIR = jiný kořen data_cache, např. pro zátěžové testy)
+CACHE_DIR = Path(os.getenv("DATA_CACHE_DIR") or Path(__file__).parent.parent / "data_cache") / "dmr5g"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Kompaktní ukládání listů: výšky v centimetrech jako int16/int32 se scale/offset
+# v metadatech pásma (GDAL) a prediktorem – přesnost DMR 5G je ~0.18 m, takže
+# zaokrouhlení na 0.5 cm nic neztrácí a soubory jsou výrazně menší než float32.
+# Čtení přes dem_cache.read_elevation dekóduje oba formáty transparentně.
+COMPACT_STORAGE = os.getenv("DMR5G_COMPACT_STORAGE", "0").lower() in ("1", "true", "yes")
+COMPACT_SCALE = 0.01
+NODATA = -32768.0
+
 
 class AtomMapSheet:
     """Reprezentace jednoho mapového listu DMR 5G."""
@@ -64,7 +78,7 @@ async def fetch_atom_feed() -> List[AtomMapSheet]:
     Returns:
         List mapových listů s jejich metadaty
     """
-    print(f"[ATOM] Stahuji hlavní feed: {ATOM_FEED_URL}")
+    logger.info("Stahuji hlavní feed: %s", ATOM_FEED_URL)
     
     async with httpx.AsyncClient(timeout=30.0) as client:
         resp = await client.get(ATOM_FEED_URL)
@@ -98,7 +112,7 @@ async def fetch_atom_feed() -> List[AtomMapSheet]:
             sheet = AtomMapSheet(sheet_id, title, bbox, dataset_feed_url, updated)
             sheets.append(sheet)
     
-    print(f"[ATOM] Nalezeno {len(sheets)} mapových listů")
+    logger.info("Nalezeno %d mapových listů", len(sheets))
     return sheets
 
 
@@ -109,7 +123,7 @@ async def fetch_dataset_feed(sheet: AtomMapSheet) -> Optional[str]:
     Returns:
         URL ke stažení ZIP s LAZ souborem
     """
-    print(f"[ATOM] Stahuji dataset feed: {sheet.title}")
+    logger.info("Stahuji dataset feed: %s", sheet.title)
     
     async with httpx.AsyncClient(timeout=30.0) as client:
         resp = await client.get(sheet.dataset_feed_url)
@@ -124,10 +138,10 @@ async def fetch_dataset_feed(sheet: AtomMapSheet) -> Optional[str]:
             link_type = link.get('type')
             if link.get('rel') == 'alternate' and link_type in ['application/vnd.laszip', 'application/zip']:
                 download_url = link.get('href')
-                print(f"[ATOM] Nalezen download URL: {download_url}")
+                logger.debug("Nalezen download URL: %s", download_url)
                 return download_url
     
-    print(f"[ATOM] VAROVÁNÍ: Nenalezen download link pro {sheet.title}")
+    logger.warning("Nenalezen download link pro %s", sheet.title)
     return None
 
 
@@ -139,10 +153,10 @@ async def download_laz_zip(url: str, output_path: Path) -> bool:
         True pokud úspěšné
     """
     if output_path.exists():
-        print(f"[ATOM] Soubor již existuje: {output_path.name}")
+        logger.debug("Soubor již existuje: %s", output_path.name)
         return True
     
-    print(f"[ATOM] Stahuji LAZ ZIP (~20 MB): {output_path.name}")
+    logger.info("Stahuji LAZ ZIP (~20 MB): %s", output_path.name)
     
     try:
         async with httpx.AsyncClient(timeout=120.0) as client:
@@ -155,13 +169,13 @@ async def download_laz_zip(url: str, output_path: Path) -> bool:
                         f.write(chunk)
                         total += len(chunk)
                         if total % (1024 * 1024) == 0:  # Každý MB
-                            print(f"[ATOM] Staženo: {total // (1024*1024)} MB")
+                            logger.debug("Staženo %d MB: %s", total // (1024 * 1024), output_path.name)
         
-        print(f"[ATOM] ✅ Staženo: {output_path.name}")
+        logger.info("Staženo: %s", output_path.name, extra={"bytes": total})
         return True
     
     except Exception as e:
-        print(f"[ATOM] ❌ Chyba při stahování: {e}")
+        logger.error("Chyba při stahování %s: %s", output_path.name, e)
         if output_path.exists():
             output_path.unlink()
         return False
@@ -177,7 +191,7 @@ def extract_laz_from_zip(zip_path: Path) -> Optional[Path]:
     laz_dir = zip_path.parent / "laz"
     laz_dir.mkdir(exist_ok=True)
     
-    print(f"[ATOM] Rozbaluji ZIP: {zip_path.name}")
+    logger.info("Rozbaluji ZIP: %s", zip_path.name)
     
     try:
         with zipfile.ZipFile(zip_path, 'r') as zf:
@@ -185,14 +199,14 @@ def extract_laz_from_zip(zip_path: Path) -> Optional[Path]:
             laz_files = [f for f in zf.namelist() if f.lower().endswith('.laz')]
             
             if not laz_files:
-                print(f"[ATOM] ❌ LAZ soubor nenalezen v archivu!")
+                logger.error("LAZ soubor nenalezen v archivu %s", zip_path.name)
                 return None
             
             laz_filename = laz_files[0]
             laz_path = laz_dir / Path(laz_filename).name
             
             if laz_path.exists():
-                print(f"[ATOM] LAZ již existuje: {laz_path.name}")
+                logger.debug("LAZ již existuje: %s", laz_path.name)
                 return laz_path
             
             # Extrahuj
@@ -200,21 +214,61 @@ def extract_laz_from_zip(zip_path: Path) -> Optional[Path]:
                 with laz_path.open('wb') as target:
                     target.write(source.read())
             
-            print(f"[ATOM] ✅ Extrahováno: {laz_path.name}")
+            logger.info("Extrahováno: %s", laz_path.name)
             return laz_path
     
     except Exception as e:
-        print(f"[ATOM] ❌ Chyba při rozbalování: {e}")
+        logger.error("Chyba při rozbalování %s: %s", zip_path.name, e)
         return None
 
 
-def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0) -> Optional[Path]:
+def encode_compact_elevation(raster: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, Dict]:
+    """
+    Převede float výšky na celočíselné centimetry pro kompaktní GeoTIFF.
+
+    int16 se použije, pokud se rozsah výšek listu vejde do ~655 m (offset
+    je střed rozsahu), jinak int32 s nulovým offsetem. Nejmenší hodnota typu
+    slouží jako nodata. Výška = hodnota * scale + offset.
+
+    Args:
+        raster: float výšky v metrech
+        mask: True = pixel bez dat
+
+    Returns:
+        (celočíselné pole, {"profile": parametry pro rasterio, "scale", "offset"})
+    """
+    valid = raster[~mask]
+    zmin, zmax = float(valid.min()), float(valid.max())
+    int16 = np.iinfo(np.int16)
+    # Offset zaokrouhlený na celé metry, aby šel snadno přečíst v gdalinfo
+    offset = float(np.floor((zmin + zmax) / 2))
+
+    if (zmin - offset) / COMPACT_SCALE > int16.min + 1 and (zmax - offset) / COMPACT_SCALE < int16.max - 1:
+        dtype, nodata = np.int16, int16.min
+    else:
+        dtype, nodata = np.int32, np.iinfo(np.int32).min
+        offset = 0.0
+
+    encoded = np.rint((raster - offset) / COMPACT_SCALE).astype(dtype)
+    encoded[mask] = nodata
+    return encoded, {
+        "profile": {"dtype": np.dtype(dtype).name, "nodata": nodata, "predictor": 2},
+        "scale": COMPACT_SCALE,
+        "offset": offset,
+    }
+
+
+def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0,
+                             sheet_id: Optional[str] = None,
+                             compact: Optional[bool] = None) -> Optional[Path]:
     """
     Rasterizuje LAZ point cloud do GeoTIFF DEMu.
     
     Args:
         laz_path: Cesta k LAZ souboru
         resolution: Rozlišení v metrech (default 5m = DMR 5G)
+        sheet_id: ID mapového listu z ATOM feedu (zapíše se do katalogu)
+        compact: Uložit výšky jako celočíselné centimetry (default DMR5G_COMPACT_STORAGE)
     
     Returns:
         Path k výstupnímu GeoTIFF
@@ -223,12 +277,18 @@ def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0) -> Optiona
     tif_dir.mkdir(exist_ok=True)
     
     tif_path = tif_dir / f"{laz_path.stem}.tif"
+    if compact is None:
+        compact = COMPACT_STORAGE
     
+    # Import až zde – katalog importuje CACHE_DIR z tohoto modulu
+    from app import catalog
+
     if tif_path.exists():
-        print(f"[ATOM] GeoTIFF již existuje: {tif_path.name}")
+        logger.debug("GeoTIFF již existuje: %s", tif_path.name)
+        catalog.register_sheet(tif_path, sheet_id=sheet_id)
         return tif_path
     
-    print(f"[ATOM] Rasterizuji LAZ → GeoTIFF (rozlišení {resolution}m)")
+    logger.info("Rasterizuji LAZ → GeoTIFF (rozlišení %sm): %s", resolution, laz_path.name)
     
     try:
         # Načti LAZ point cloud
@@ -240,23 +300,24 @@ def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0) -> Optiona
             y = las.y
             z = las.z
             
-            print(f"[ATOM] Načteno {len(x):,} bodů z point cloudu")
-            print(f"[ATOM] X rozsah: {x.min():.2f} - {x.max():.2f}")
-            print(f"[ATOM] Y rozsah: {y.min():.2f} - {y.max():.2f}")
-            print(f"[ATOM] Z rozsah (výška): {z.min():.2f} - {z.max():.2f} m")
+            logger.info("Načteno %d bodů z point cloudu", len(x))
             
             # Spočti bounding box
             minx, maxx = x.min(), x.max()
             miny, maxy = y.min(), y.max()
+            # Rozsah výšek jen kvůli logu – další průchod přes miliony bodů
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Rozsah bodů: X %.2f - %.2f, Y %.2f - %.2f, Z %.2f - %.2f m",
+                             minx, maxx, miny, maxy, z.min(), z.max())
             
             # Vytvoř grid
             width = int((maxx - minx) / resolution) + 1
             height = int((maxy - miny) / resolution) + 1
             
-            print(f"[ATOM] Raster rozměry: {width} x {height} pixelů")
+            logger.debug("Raster rozměry: %d x %d pixelů", width, height)
             
             # Inicializuj prázdný raster
-            raster = np.full((height, width), -32768.0, dtype=np.float32)
+            raster = np.full((height, width), NODATA, dtype=np.float32)
             counts = np.zeros((height, width), dtype=np.int32)
             
             # Rasterizace - průměrování bodů v každém pixelu
@@ -274,17 +335,17 @@ def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0) -> Optiona
             
             # Interpolace prázdných pixelů (jednoduchá - nearest neighbor by bylo lepší)
             # Pro produkci použít scipy.interpolate nebo gdal_fillnodata
-            mask = (raster == -32768.0)
-            filled_pixels = np.sum(~mask)
-            print(f"[ATOM] Vyplněno {filled_pixels:,} / {raster.size:,} pixelů ({filled_pixels/raster.size*100:.1f}%)")
+            mask = (raster == NODATA)
+            if logger.isEnabledFor(logging.DEBUG):
+                filled_pixels = int(np.sum(~mask))
+                logger.debug("Vyplněno %d / %d pixelů (%.1f%%)", filled_pixels, raster.size,
+                             filled_pixels / raster.size * 100)
             
             # Vytvoř transformaci
             transform = from_bounds(minx, miny, maxx, maxy, width, height)
             
             # Zapiš GeoTIFF
-            with rasterio.open(
-                tif_path,
-                'w',
+            profile = dict(
                 driver='GTiff',
                 height=height,
                 width=width,
@@ -293,18 +354,29 @@ def rasterize_laz_to_geotiff(laz_path: Path, resolution: float = 5.0) -> Optiona
                 crs=RioCRS.from_epsg(5514),  # S-JTSK
                 transform=transform,
                 compress='deflate',
-                nodata=-32768.0
-            ) as dst:
+                nodata=NODATA
+            )
+            scale, offset = 1.0, 0.0
+            if compact and not mask.all():
+                raster, encoding = encode_compact_elevation(raster, mask)
+                profile.update(encoding["profile"])
+                scale, offset = encoding["scale"], encoding["offset"]
+                logger.debug("Kompaktní uložení: %s, scale=%s, offset=%s", profile["dtype"], scale, offset)
+
+            with rasterio.open(tif_path, 'w', **profile) as dst:
                 dst.write(raster, 1)
                 dst.set_band_description(1, 'Elevation (m above Baltic 1957)')
+                if (scale, offset) != (1.0, 0.0):
+                    dst.scales = (scale,)
+                    dst.offsets = (offset,)
+                    dst.update_tags(1, UNIT='m')
             
-            print(f"[ATOM] ✅ Vytvořen GeoTIFF: {tif_path.name}")
+            catalog.register_sheet(tif_path, point_count=len(x), sheet_id=sheet_id)
+            logger.info("Vytvořen GeoTIFF: %s", tif_path.name)
             return tif_path
     
     except Exception as e:
-        print(f"[ATOM] ❌ Chyba při rasterizaci: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Chyba při rasterizaci %s: %s", laz_path.name, e)
         return None
 
 
@@ -334,50 +406,63 @@ async def download_and_process_area(lat: float, lon: float) -> Optional[Path]:
     Returns:
         Path k výslednému GeoTIFF
     """
-    print(f"\n{'='*60}")
-    print(f"[ATOM] Začínám download pro oblast: {lat:.4f}°N, {lon:.4f}°E")
-    print(f"{'='*60}\n")
+    logger.info("Začínám download pro oblast: %.4f°N, %.4f°E", lat, lon)
     
     # 1. Načti ATOM feed
-    sheets = await fetch_atom_feed()
+    with metrics.stage("upstream"):
+        sheets = await fetch_atom_feed()
     
     # 2. Najdi relevantní mapový list
     sheet = find_mapsheet_for_point(sheets, lat, lon)
     
     if not sheet:
-        print(f"[ATOM] ❌ Žádný mapový list pro zadaný bod!")
+        logger.warning("Žádný mapový list pro bod %.4f°N, %.4f°E", lat, lon)
         return None
     
-    print(f"[ATOM] ✅ Nalezen mapový list: {sheet.title}")
+    logger.info("Nalezen mapový list: %s", sheet.title)
+    
+    # Import až zde – katalog importuje CACHE_DIR z tohoto modulu
+    from app import cache_manager, catalog
+
+    # List už je zrasterizovaný (ZIP/LAZ mohly být mezitím uvolněny) – nic nestahuj
+    existing = catalog.find_by_sheet_id(sheet.sheet_id)
+    if existing and existing.exists():
+        logger.info("GeoTIFF listu už je v cache: %s", existing.name)
+        return existing
     
     # 3. Získej download URL
-    download_url = await fetch_dataset_feed(sheet)
+    with metrics.stage("upstream"):
+        download_url = await fetch_dataset_feed(sheet)
     
     if not download_url:
         return None
     
     # 4. Stáhni ZIP
     zip_path = CACHE_DIR / f"{sheet.sheet_id}.zip"
-    success = await download_laz_zip(download_url, zip_path)
+    with metrics.stage("download"):
+        success = await download_laz_zip(download_url, zip_path)
     
     if not success:
         return None
     
     # 5. Extrahuj LAZ
-    laz_path = extract_laz_from_zip(zip_path)
+    with metrics.stage("extract"):
+        laz_path = extract_laz_from_zip(zip_path)
     
     if not laz_path:
         return None
     
     # 6. Rasterizuj do GeoTIFF
-    tif_path = rasterize_laz_to_geotiff(laz_path, resolution=5.0)
+    with metrics.stage("rasterize"):
+        tif_path = rasterize_laz_to_geotiff(laz_path, resolution=5.0, sheet_id=sheet.sheet_id)
     
     if not tif_path:
         return None
     
-    print(f"\n{'='*60}")
-    print(f"[ATOM] ✅ HOTOVO! GeoTIFF: {tif_path}")
-    print(f"{'='*60}\n")
+    # 7. Udržení rozpočtu na disk (nový list je čerstvě použitý, evikce se ho nedotkne)
+    await asyncio.to_thread(cache_manager.enforce_budget)
+    
+    logger.info("Hotovo: %s", tif_path, extra={"sheet": sheet.sheet_id})
     
     return tif_path
 
@@ -391,6 +476,9 @@ if __name__ == "__main__":
         print("Example: python atom_downloader.py 50.0755 14.4378  # Praha")
         sys.exit(1)
     
+    from app import logging_config
+    logging_config.configure_logging()
+
     lat = float(sys.argv[1])
     lon = float(sys.argv[2])
     
@@ -0,0 +1,219 @@
+"""
+Správa místa v data_cache/dmr5g s pevným rozpočtem na disk.
+
+Pro celé území ČR by ZIP, LAZ a GeoTIFF kopie listů zabraly 40–50 GB.
+Po překročení rozpočtu (DMR5G_CACHE_BUDGET_GB) se maže podle politik
+v tomto pořadí, dokud využití neklesne pod LOW_WATERMARK rozpočtu:
+
+1. adresáře úloh (jobs/), které registr úloh nezná – výsledky z předchozího
+   běhu procesu a nedokončené uploady (živé úlohy maže jejich TTL)
+2. ZIP archivy – po rozbalení už nejsou potřeba
+3. LAZ mračna – po rasterizaci už nejsou potřeba
+4. bloky SVF (svf/) – od nejstaršího, dají se kdykoli dopočítat
+5. studené GeoTIFF listy – LRU podle posledního přístupu při servírování
+
+Nikdy se nemažou připnuté listy (catalog.set_pinned, např. oblast, kterou
+daný uzel obsluhuje) ani listy použité během posledních ACTIVE_SECONDS.
+Soubory ZIP/LAZ, bloky SVF a adresáře úloh mladší než ACTIVE_SECONDS se
+také nechávají – může je právě zpracovávat jiný request.
+
+Přístupy k listům se zaznamenávají v paměti a do katalogu se zapisují
+dávkově (nejvýše jednou za ACCESS_FLUSH_INTERVAL s).
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app import catalog, jobs
+from app.atom_downloader import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUDGET_GB = float(os.getenv("DMR5G_CACHE_BUDGET_GB", "20"))
+# Po překročení rozpočtu se uklízí pod tento podíl, aby se nemazalo po každém listu
+LOW_WATERMARK = 0.9
+ACTIVE_SECONDS = float(os.getenv("DMR5G_CACHE_ACTIVE_SECONDS", "900"))
+ACCESS_FLUSH_INTERVAL = 30.0
+
+_access: Dict[str, float] = {}
+_access_lock = threading.Lock()
+_last_flush = 0.0
+_evict_lock = threading.Lock()
+
+
+def record_access(paths: Iterable[Path]) -> None:
+    """Zaznamená přístup k listům (volá se při každém vyhledání listů pro data)."""
+    global _last_flush
+    now = time.time()
+    with _access_lock:
+        for path in paths:
+            _access[path.name] = now
+        due = now - _last_flush > ACCESS_FLUSH_INTERVAL
+    if due:
+        flush_access()
+
+
+def flush_access() -> None:
+    """Zapíše nasbírané přístupy do katalogu."""
+    global _last_flush
+    with _access_lock:
+        pending = dict(_access)
+        _access.clear()
+        _last_flush = time.time()
+    try:
+        catalog.touch(pending)
+    except Exception as exc:
+        logger.warning("Nelze zapsat přístupy do katalogu: %s", exc)
+
+
+def _files(pattern_dir: Path, pattern: str) -> List[Tuple[Path, os.stat_result]]:
+    if not pattern_dir.exists():
+        return []
+    files = []
+    for path in pattern_dir.glob(pattern):
+        try:
+            files.append((path, path.stat()))
+        except OSError:
+            continue
+    return files
+
+
+def _zip_files():
+    return _files(CACHE_DIR, "*.zip")
+
+
+def _laz_files():
+    return _files(CACHE_DIR / "laz", "*.laz")
+
+
+def _svf_files():
+    return _files(CACHE_DIR / "svf", "*/*.npy")
+
+
+def _tree_size(path: Path) -> int:
+    if not path.is_dir():
+        return path.stat().st_size
+    size = 0
+    for entry in path.rglob("*"):
+        try:
+            if entry.is_file():
+                size += entry.stat().st_size
+        except OSError:
+            continue
+    return size
+
+
+def _job_dirs() -> List[Tuple[Path, int, float]]:
+    """Položky adresáře úloh: (cesta, velikost, mtime)."""
+    if not jobs.JOBS_DIR.exists():
+        return []
+    entries = []
+    for path in jobs.JOBS_DIR.iterdir():
+        try:
+            entries.append((path, _tree_size(path), path.stat().st_mtime))
+        except OSError:
+            continue
+    return entries
+
+
+def usage() -> Dict[str, Dict[str, int]]:
+    """Využití disku podle typu artefaktu: {typ: {"count", "bytes"}}."""
+    rows, _ = catalog.query_sheets()
+    report = {
+        "zip": [st.st_size for _, st in _zip_files()],
+        "laz": [st.st_size for _, st in _laz_files()],
+        "svf": [st.st_size for _, st in _svf_files()],
+        "jobs": [size for _, size, _ in _job_dirs()],
+        "geotiff": [row["size_bytes"] for row in rows],
+    }
+    return {kind: {"count": len(sizes), "bytes": sum(sizes)} for kind, sizes in report.items()}
+
+
+def _orphaned_jobs(now: float):
+    """Adresáře úloh, které registr nezná (předchozí běh, přerušený upload), od nejstaršího."""
+    known = jobs.job_manager.known_ids()
+    orphans = [
+        (path, size, mtime) for path, size, mtime in _job_dirs()
+        if path.name not in known and now - mtime > ACTIVE_SECONDS
+    ]
+    orphans.sort(key=lambda item: item[2])
+    return [(path, size) for path, size, _ in orphans]
+
+
+def _cold_raw_files(files, now: float):
+    """Soubory od nejstaršího, bez souborů, se kterými se právě pracuje."""
+    cold = [(path, st) for path, st in files if now - st.st_mtime > ACTIVE_SECONDS]
+    cold.sort(key=lambda item: item[1].st_mtime)
+    return [(path, st.st_size) for path, st in cold]
+
+
+def _cold_geotiffs(now: float):
+    """Nepřipnuté GeoTIFF listy od nejdéle nepoužitého, bez nedávno použitých."""
+    with _access_lock:
+        recent = dict(_access)
+    for row in catalog.eviction_candidates():
+        used = max(row["used"], recent.get(row["filename"], 0))
+        if now - used <= ACTIVE_SECONDS:
+            continue
+        yield catalog.GEOTIFF_DIR / row["filename"], row["size_bytes"]
+
+
+def enforce_budget(budget_gb: Optional[float] = None) -> Dict:
+    """
+    Uvolní místo, pokud cache překračuje rozpočet.
+
+    Returns:
+        Přehled: využití před/po, rozpočet a počty smazaných souborů podle typu
+    """
+    budget = (CACHE_BUDGET_GB if budget_gb is None else budget_gb) * 1024 ** 3
+    with _evict_lock:
+        flush_access()
+        before = usage()
+        total = sum(item["bytes"] for item in before.values())
+        report = {
+            "budget_bytes": int(budget),
+            "usage_before": before,
+            "evicted": {kind: 0 for kind in before},
+            "freed_bytes": 0,
+        }
+        if total <= budget:
+            report["usage_after"] = before
+            return report
+
+        target = budget * LOW_WATERMARK
+        now = time.time()
+        policies = (
+            ("jobs", _orphaned_jobs(now)),
+            ("zip", _cold_raw_files(_zip_files(), now)),
+            ("laz", _cold_raw_files(_laz_files(), now)),
+            ("svf", _cold_raw_files(_svf_files(), now)),
+            ("geotiff", _cold_geotiffs(now)),
+        )
+        for kind, candidates in policies:
+            for path, size in candidates:
+                if total <= target:
+                    break
+                try:
+                    if path.is_dir():
+                        shutil.rmtree(path)
+                    else:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as exc:
+                    logger.warning("Nelze smazat %s: %s", path.name, exc)
+                    continue
+                if kind == "geotiff":
+                    catalog.remove_sheet(path.name)
+                total -= size
+                report["freed_bytes"] += size
+                report["evicted"][kind] += 1
+
+        report["usage_after"] = usage()
+        logger.info("Uvolněno %.1f MB", report["freed_bytes"] / 1024 ** 2, extra={"evicted": report["evicted"]})
+        return report
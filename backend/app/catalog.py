@@ -0,0 +1,271 @@
+"""
+Katalog cachovaných listů DMR 5G (SQLite).
+
+Rasterizér po zápisu GeoTIFFu zaregistruje jeho metadata (bounds v S-JTSK,
+rozměry, rozlišení, CRS, velikost, počet bodů, časy). Vyhledání listů pro
+dlaždice a výpis cache pak čtou jen z katalogu – žádné procházení adresáře
+ani otevírání souborů rasterio při každém requestu.
+
+Při prvním použití v procesu se katalog srovná s obsahem adresáře
+(sync) – doplní se listy z dřívějších běhů a odeberou smazané.
+
+Pro správu místa (app/cache_manager.py) drží katalog i čas posledního
+přístupu k listu, příznak připnutí a ID mapového listu z ATOM feedu.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import rasterio
+
+from app.atom_downloader import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = CACHE_DIR / "catalog.sqlite"
+GEOTIFF_DIR = CACHE_DIR / "geotiff"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    filename    TEXT PRIMARY KEY,
+    min_x       REAL NOT NULL,
+    min_y       REAL NOT NULL,
+    max_x       REAL NOT NULL,
+    max_y       REAL NOT NULL,
+    width       INTEGER NOT NULL,
+    height      INTEGER NOT NULL,
+    res_x       REAL NOT NULL,
+    res_y       REAL NOT NULL,
+    crs         TEXT,
+    size_bytes  INTEGER NOT NULL,
+    point_count INTEGER,
+    created     REAL NOT NULL,
+    modified    REAL NOT NULL,
+    last_access REAL,
+    pinned      INTEGER NOT NULL DEFAULT 0,
+    sheet_id    TEXT
+);
+CREATE INDEX IF NOT EXISTS sheets_x ON sheets (min_x, max_x);
+CREATE INDEX IF NOT EXISTS sheets_y ON sheets (min_y, max_y);
+"""
+
+# Sloupce doplněné později – starší katalogy se při otevření rozšíří
+_MIGRATIONS = {
+    "last_access": "ALTER TABLE sheets ADD COLUMN last_access REAL",
+    "pinned": "ALTER TABLE sheets ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0",
+    "sheet_id": "ALTER TABLE sheets ADD COLUMN sheet_id TEXT",
+}
+
+_COLUMNS = (
+    "filename", "min_x", "min_y", "max_x", "max_y", "width", "height",
+    "res_x", "res_y", "crs", "size_bytes", "point_count", "created", "modified",
+)
+
+_sync_lock = threading.Lock()
+_synced = False
+_initialized: set = set()
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    path = CATALOG_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if path not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(sheets)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in existing:
+                    conn.execute(statement)
+            conn.execute("CREATE INDEX IF NOT EXISTS sheets_sheet_id ON sheets (sheet_id)")
+            _initialized.add(path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _read_metadata(path: Path, point_count: Optional[int] = None) -> Dict:
+    stat = path.stat()
+    with rasterio.open(path) as src:
+        b = src.bounds
+        return {
+            "filename": path.name,
+            "min_x": b.left, "min_y": b.bottom, "max_x": b.right, "max_y": b.top,
+            "width": src.width, "height": src.height,
+            "res_x": src.res[0], "res_y": src.res[1],
+            "crs": str(src.crs) if src.crs else None,
+            "size_bytes": stat.st_size,
+            "point_count": point_count,
+            "created": time.time(),
+            "modified": stat.st_mtime,
+        }
+
+
+def _upsert(conn: sqlite3.Connection, meta: Dict) -> None:
+    # Počet bodů a čas vytvoření se při přeindexování existujícího listu zachovají
+    conn.execute(
+        f"""
+        INSERT INTO sheets ({", ".join(_COLUMNS)})
+        VALUES ({", ".join("?" for _ in _COLUMNS)})
+        ON CONFLICT(filename) DO UPDATE SET
+            min_x=excluded.min_x, min_y=excluded.min_y, max_x=excluded.max_x, max_y=excluded.max_y,
+            width=excluded.width, height=excluded.height, res_x=excluded.res_x, res_y=excluded.res_y,
+            crs=excluded.crs, size_bytes=excluded.size_bytes, modified=excluded.modified,
+            point_count=COALESCE(excluded.point_count, sheets.point_count)
+        """,
+        [meta[c] for c in _COLUMNS],
+    )
+
+
+def register_sheet(path: Path, point_count: Optional[int] = None,
+                   sheet_id: Optional[str] = None) -> None:
+    """Zapíše (nebo aktualizuje) metadata listu – volá rasterizér po zápisu GeoTIFFu."""
+    meta = _read_metadata(path, point_count)
+    with _connect() as conn:
+        _upsert(conn, meta)
+        if sheet_id:
+            conn.execute("UPDATE sheets SET sheet_id = ? WHERE filename = ?", (sheet_id, path.name))
+
+
+def find_by_sheet_id(sheet_id: str) -> Optional[Path]:
+    """GeoTIFF už zpracovaného mapového listu ATOM feedu (None = není v cache)."""
+    ensure_synced()
+    with _connect() as conn:
+        row = conn.execute("SELECT filename FROM sheets WHERE sheet_id = ?", (sheet_id,)).fetchone()
+    return GEOTIFF_DIR / row["filename"] if row else None
+
+
+def touch(access: Dict[str, float]) -> None:
+    """Zapíše časy posledního přístupu {filename: timestamp} (dávkově)."""
+    if not access:
+        return
+    with _connect() as conn:
+        conn.executemany(
+            "UPDATE sheets SET last_access = MAX(COALESCE(last_access, 0), ?) WHERE filename = ?",
+            [(ts, name) for name, ts in access.items()],
+        )
+
+
+def set_pinned(bbox: Tuple[float, float, float, float], pinned: bool = True) -> int:
+    """Připne / odepne listy překrývající bbox v S-JTSK. Returns: počet listů."""
+    ensure_synced()
+    where, params = _bbox_clause(bbox)
+    with _connect() as conn:
+        cursor = conn.execute(f"UPDATE sheets SET pinned = ? {where}", [int(pinned)] + params)
+        return cursor.rowcount
+
+
+def eviction_candidates() -> List[Dict]:
+    """Nepřipnuté listy seřazené od nejdéle nepoužitého (bez přístupu = čas vytvoření)."""
+    ensure_synced()
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT filename, size_bytes, COALESCE(last_access, modified) AS used FROM sheets "
+            "WHERE pinned = 0 ORDER BY used"
+        )
+        return [dict(row) for row in rows]
+
+
+def remove_sheet(filename: str) -> None:
+    with _connect() as conn:
+        conn.execute("DELETE FROM sheets WHERE filename = ?", (filename,))
+
+
+def sync(directory: Optional[Path] = None) -> Dict[str, int]:
+    """
+    Srovná katalog s obsahem adresáře: nové / změněné listy přidá, zmizelé odebere.
+
+    Returns:
+        {"added": n, "updated": n, "removed": n}
+    """
+    directory = directory or GEOTIFF_DIR
+    on_disk = {}
+    if directory.exists():
+        for entry in directory.iterdir():
+            if entry.suffix == ".tif" and entry.is_file():
+                on_disk[entry.name] = entry
+
+    stats = {"added": 0, "updated": 0, "removed": 0}
+    with _connect() as conn:
+        known = {row["filename"]: row["modified"] for row in conn.execute("SELECT filename, modified FROM sheets")}
+
+        for name in known.keys() - on_disk.keys():
+            conn.execute("DELETE FROM sheets WHERE filename = ?", (name,))
+            stats["removed"] += 1
+
+        for name, path in on_disk.items():
+            try:
+                mtime = path.stat().st_mtime
+                if name in known and known[name] == mtime:
+                    continue
+                _upsert(conn, _read_metadata(path))
+            except Exception as exc:
+                logger.warning("Nelze načíst %s: %s", name, exc)
+                continue
+            stats["updated" if name in known else "added"] += 1
+
+    if any(stats.values()):
+        logger.info("Katalog synchronizován", extra=stats)
+    return stats
+
+
+def ensure_synced() -> None:
+    """Jednorázová synchronizace s adresářem při prvním použití v procesu."""
+    global _synced
+    if _synced:
+        return
+    with _sync_lock:
+        if not _synced:
+            sync()
+            _synced = True
+
+
+def _bbox_clause(bbox: Optional[Tuple[float, float, float, float]]) -> Tuple[str, list]:
+    if bbox is None:
+        return "", []
+    left, bottom, right, top = bbox
+    return "WHERE max_x >= ? AND min_x <= ? AND max_y >= ? AND min_y <= ?", [left, right, bottom, top]
+
+
+def query_sheets(bbox: Optional[Tuple[float, float, float, float]] = None,
+                 limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    Listy překrývající bbox v S-JTSK (left, bottom, right, top), stránkovaně.
+
+    Returns:
+        (seznam záznamů, celkový počet odpovídajících listů)
+    """
+    ensure_synced()
+    where, params = _bbox_clause(bbox)
+    with _connect() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM sheets {where}", params).fetchone()[0]
+        sql = f"SELECT * FROM sheets {where} ORDER BY filename"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+        rows = [dict(row) for row in conn.execute(sql, params)]
+    return rows, total
+
+
+def find_sheet_paths(left: float, bottom: float, right: float, top: float) -> List[Path]:
+    """Cesty k listům překrývajícím rozsah v S-JTSK."""
+    ensure_synced()
+    where, params = _bbox_clause((left, bottom, right, top))
+    with _connect() as conn:
+        rows = conn.execute(f"SELECT filename FROM sheets {where} ORDER BY filename", params)
+        return [GEOTIFF_DIR / row["filename"] for row in rows]
+
+
+def sheet_count() -> int:
+    ensure_synced()
+    with _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM sheets").fetchone()[0]
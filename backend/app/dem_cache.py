@@ -0,0 +1,198 @@
+"""
+Čtení DEM z lokální cache DMR 5G GeoTIFFů (S-JTSK, EPSG:5514).
+
+Poskytuje vyhledání listů překrývajících daný rozsah (přes katalog,
+viz app/catalog.py) a sestavení (mozaikování) DEM okna přes hranice listů.
+
+Listy mohou být uložené jako float32 nebo kompaktně jako celočíselné
+centimetry se scale/offset (DMR5G_COMPACT_STORAGE) – read_elevation
+vrací v obou případech float32 výšky v metrech s NaN mimo data.
+
+Katalog se s adresářem synchronizuje jen jednou za běh procesu – list
+smazaný mimo proces se při čtení z katalogu odebere a přeskočí.
+"""
+
+import logging
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pyproj
+import rasterio
+from affine import Affine
+from rasterio.transform import from_origin
+from rasterio.warp import Resampling, reproject
+from rasterio.windows import Window, from_bounds
+
+from app import cache_manager, catalog, metrics
+
+logger = logging.getLogger(__name__)
+
+GEOTIFF_DIR = catalog.GEOTIFF_DIR
+
+# Rozlišení rasterizovaných listů (viz rasterize_laz_to_geotiff)
+DEFAULT_RESOLUTION = 5.0
+
+_wgs84_to_sjtsk = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:5514", always_xy=True)
+
+
+def wgs84_bounds_to_sjtsk(min_lon: float, min_lat: float,
+                          max_lon: float, max_lat: float) -> Tuple[float, float, float, float]:
+    """Převede WGS84 bbox na obálku v S-JTSK (left, bottom, right, top)."""
+    return _wgs84_to_sjtsk.transform_bounds(min_lon, min_lat, max_lon, max_lat)
+
+
+def find_sheets(left: float, bottom: float, right: float, top: float) -> List[Path]:
+    """
+    Vrátí cachované GeoTIFF listy překrývající rozsah v S-JTSK (z katalogu, bez čtení souborů).
+
+    Přístup se zaznamená pro LRU evikci (app/cache_manager.py).
+    """
+    with metrics.stage("sheet_lookup"):
+        sheets = catalog.find_sheet_paths(left, bottom, right, top)
+        cache_manager.record_access(sheets)
+    return sheets
+
+
+def read_elevation(src: "rasterio.DatasetReader", window: Optional[Window] = None) -> np.ndarray:
+    """
+    Načte výšky z listu jako float32 v metrech (NaN = bez dat).
+
+    Dekóduje kompaktní listy (celočíselné cm, scale/offset pásma);
+    float32 listy se jen přečtou.
+    """
+    data = src.read(1, window=window, masked=True)
+    scale = src.scales[0] if src.scales[0] else 1.0
+    offset = src.offsets[0] or 0.0
+
+    dem = data.data.astype(np.float32, copy=data.dtype != np.float32)
+    if scale != 1.0:
+        dem *= np.float32(scale)
+    if offset:
+        dem += np.float32(offset)
+    dem[np.ma.getmaskarray(data)] = np.nan
+    dem[dem <= -1000] = np.nan
+    return dem
+
+
+def _read_sheet_window(path: Path, bounds: Tuple[float, float, float, float]):
+    """
+    Přečte část listu pokrývající bounds (+1 px okraj pro převzorkování).
+
+    List, který nejde otevřít ani přečíst (smazaný či přepsaný mimo proces),
+    se odebere z katalogu.
+
+    Returns:
+        (výšky, affine transformace, CRS), nebo None, pokud list bounds nepokrývá
+    """
+    try:
+        with metrics.stage("dataset_read"), rasterio.open(path) as src:
+            window = from_bounds(*bounds, transform=src.transform)
+            col, row = int(np.floor(window.col_off)) - 1, int(np.floor(window.row_off)) - 1
+            window = Window(col, row, int(np.ceil(window.width)) + 3, int(np.ceil(window.height)) + 3)
+            try:
+                window = window.intersection(Window(0, 0, src.width, src.height))
+            except rasterio.errors.WindowError:
+                return None
+            return read_elevation(src, window), src.window_transform(window), src.crs
+    except rasterio.errors.RasterioIOError as exc:
+        logger.warning("List %s nelze přečíst, odebírám z katalogu: %s", path.name, exc)
+        catalog.remove_sheet(path.name)
+        return None
+
+
+def _covered_slices(src_transform, src_shape: Tuple[int, int], transform,
+                    shape: Tuple[int, int]) -> Tuple[Optional[slice], Optional[slice]]:
+    """Řádky a sloupce okna (transform, shape), které překrývá zdrojový raster; (None, None) = nic."""
+    res = transform.a
+    src_left, src_top = src_transform.c, src_transform.f
+    src_right = src_left + src_shape[1] * src_transform.a
+    src_bottom = src_top + src_shape[0] * src_transform.e
+    c0 = max(0, int(np.floor((src_left - transform.c) / res)))
+    c1 = min(shape[1], int(np.ceil((src_right - transform.c) / res)))
+    r0 = max(0, int(np.floor((transform.f - src_top) / res)))
+    r1 = min(shape[0], int(np.ceil((transform.f - src_bottom) / res)))
+    if c0 >= c1 or r0 >= r1:
+        return None, None
+    return slice(r0, r1), slice(c0, c1)
+
+
+def _aligned_part(source: np.ndarray, src_transform, transform,
+                  rows: slice, cols: slice) -> Optional[np.ndarray]:
+    """
+    Výřez zdroje pro okno[rows, cols] bez převzorkování, pokud leží na stejné mřížce
+    (stejný krok, posun o celé pixely) – jinak None.
+    """
+    res = transform.a
+    if not (math.isclose(src_transform.a, res) and math.isclose(src_transform.e, -res)):
+        return None
+    col_shift = (transform.c - src_transform.c) / res
+    row_shift = (src_transform.f - transform.f) / res
+    if abs(col_shift - round(col_shift)) > 1e-6 or abs(row_shift - round(row_shift)) > 1e-6:
+        return None
+    c0 = cols.start + int(round(col_shift))
+    r0 = rows.start + int(round(row_shift))
+    if c0 < 0 or r0 < 0:
+        return None
+    part = source[r0:r0 + rows.stop - rows.start, c0:c0 + cols.stop - cols.start]
+    if part.shape != (rows.stop - rows.start, cols.stop - cols.start):
+        return None
+    return part
+
+
+def read_dem_window(left: float, bottom: float, right: float, top: float,
+                    res: float = DEFAULT_RESOLUTION,
+                    sheets: Optional[List[Path]] = None) -> Tuple[np.ndarray, "rasterio.Affine"]:
+    """
+    Sestaví DEM pro rozsah v S-JTSK z cachovaných listů.
+
+    Okno je zarovnané na mřížku s krokem res (levý horní roh = left, top).
+    Při kroku hrubším než rozlišení listů se výšky průměrují (listy se čtou
+    po jednom, paměť tedy závisí jen na velikosti okna v pixelech).
+    Místa bez dat mají hodnotu NaN.
+
+    Returns:
+        (float32 pole výšek, affine transformace okna)
+    """
+    width = max(1, int(round((right - left) / res)))
+    height = max(1, int(round((top - bottom) / res)))
+    transform = from_origin(left, top, res, res)
+
+    if sheets is None:
+        sheets = find_sheets(left, bottom, right, top)
+    if not sheets:
+        return np.full((height, width), np.nan, dtype=np.float32), transform
+
+    dem = np.full((height, width), np.nan, dtype=np.float32)
+    window_bounds = (left, top - height * res, left + width * res, top)
+    for path in sheets:
+        sheet = _read_sheet_window(path, window_bounds)
+        if sheet is None:
+            continue
+        source, src_transform, src_crs = sheet
+
+        # Část okna, kterou list pokrývá – převzorkovává se jen do ní
+        rows, cols = _covered_slices(src_transform, source.shape, transform, (height, width))
+        if rows is None:
+            continue
+        target = dem[rows, cols]
+        with metrics.stage("reproject"):
+            part = _aligned_part(source, src_transform, transform, rows, cols)
+            if part is None:
+                part = np.full(target.shape, np.nan, dtype=np.float32)
+                reproject(
+                    source=source,
+                    destination=part,
+                    src_transform=src_transform,
+                    src_crs=src_crs,
+                    dst_transform=transform * Affine.translation(cols.start, rows.start),
+                    dst_crs=src_crs,
+                    resampling=Resampling.average if res > src_transform.a * 1.001 else Resampling.nearest,
+                    src_nodata=np.nan,
+                    dst_nodata=np.nan,
+                )
+        # Jako merge(): v překryvu listů vyhrává první list
+        fill = np.isnan(target)
+        target[fill] = part[fill]
+    return dem, transform
@@ -0,0 +1,468 @@
+"""
+DEM dlaždice (výšky v metrech, Web Mercator 256x256) z ATOM cache DMR 5G.
+
+Dlaždice se sestaví z DEM okna přes všechny listy, které ji překrývají
+(mozaika přes hranice listů), a převzorkuje se bilineárně do mřížky
+Web Mercator. Souřadnice pixelů dlaždice v S-JTSK jsou pro dané z/x/y
+neměnné: spočítají se přesně v řídké mřížce uzlů (cachované přes
+lru_cache), mezi uzly se interpolují a výšky se pak z DEM okna
+vyberou jedním vektorizovaným bilineárním gatherem místo GDAL warpu.
+Při zmenšení (pixel dlaždice větší než pixel DEM) se dál používá GDAL
+reproject, který jádro převzorkování přizpůsobí a nevzniká aliasing.
+
+DEM okno se čte v kroku odpovídajícím velikosti pixelu dlaždice
+(dem_resolution – 5 m listy zprůměrované na 10, 20, 40 ... m), takže
+okno má vždy jen stovky pixelů na stranu. Pod MIN_DEM_ZOOM by dlaždice
+pokrývala tisíce listů – tam ATOM dlaždice nejsou (endpoint padá na WMS).
+
+Výsledek se ukládá do diskové cache jako syrový float32
+buffer s NaN v místech bez dat; požadovaná NoData hodnota a formát
+(viz app/tile_codecs.py) se aplikují až při servírování.
+
+Dlaždice v cache je platná, dokud není starší než nejnovější list, ze
+kterého vznikla – po stažení sousedního listu se okrajové dlaždice
+automaticky přepočítají. Cache lze předem naplnit skriptem
+scripts/seed_tiles.py.
+"""
+
+import math
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyproj
+from rasterio.crs import CRS as RioCRS
+from rasterio.transform import from_bounds
+from rasterio.warp import Resampling, reproject
+
+from app import catalog, dem_cache, metrics, terrain_mesh, tile_codecs
+from app.tile_cache import TileCache
+from app.tile_grid import mercator_tile_bounds
+
+TILE_SIZE = 256
+# Pod tímto zoomem by dlaždice pokrývala příliš mnoho listů (z10 ≈ 40 km, stovky listů)
+MIN_DEM_ZOOM = 10
+# Nejsevernější bod ČR – krok DEM se volá podle nejmenšího pixelu dlaždice na území
+NORTHMOST_LAT = 51.06
+# Rozsah platných výšek (DMR 5G v ČR cca 115–1603 m n. m.)
+MIN_ELEVATION = -1000.0
+MAX_ELEVATION = 3000.0
+
+WEB_MERCATOR = RioCRS.from_epsg(3857)
+SJTSK = RioCRS.from_epsg(5514)
+
+# Dávkové renderování: max. velikost sdíleného DEM okna (větší dávky po dlaždicích)
+MAX_BATCH_WINDOW_PX = 4096 * 4096
+
+# Vzorkovací mřížka: uzly po GRID_STEP px se transformují přesně, pixely mezi nimi
+# se interpolují (Křovák je na ploše dlaždice hladký, chyba je hluboko pod 1 cm)
+GRID_STEP = 16
+SAMPLE_GRID_CACHE_SIZE = 4096
+
+_3857_to_sjtsk = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:5514", always_xy=True)
+
+
+def _interpolation_matrix(pos: np.ndarray) -> np.ndarray:
+    """Váhy lineární interpolace z uzlů (po GRID_STEP px) do pozic pos v px: (len(pos), uzly)."""
+    nodes = TILE_SIZE // GRID_STEP + 1
+    pos = pos / GRID_STEP
+    i0 = np.minimum(np.floor(pos).astype(int), nodes - 2)
+    frac = pos - i0
+    matrix = np.zeros((len(pos), nodes))
+    matrix[np.arange(len(pos)), i0] = 1.0 - frac
+    matrix[np.arange(len(pos)), i0 + 1] = frac
+    return matrix
+
+
+# Středy pixelů dlaždice a rohy pixelů (vrcholy meshe, sdílené se sousední dlaždicí)
+_GRID_INTERP = _interpolation_matrix(np.arange(TILE_SIZE) + 0.5)
+_VERTEX_INTERP = _interpolation_matrix(np.arange(terrain_mesh.GRID_SIZE, dtype=float))
+
+dem_tile_cache = TileCache("dem", "f32")
+# Komprimované float32-shuffle dlaždice vedle syrových (varianta = codec a NoData)
+dem_shuffled_cache = TileCache("dem", "f32s")
+dem_mesh_cache = TileCache("dem-mesh", "bin")
+
+
+def dem_resolution(z: int) -> float:
+    """
+    Krok DEM okna pro zoom z: rozlišení listů krát mocnina dvou, nejvýše velikost pixelu dlaždice.
+
+    Závisí jen na zoomu (ne na poloze), takže sousední dlaždice i dávky
+    čtou DEM na stejné mřížce.
+    """
+    pixel = 2 * math.pi * 6378137.0 / (TILE_SIZE * 2 ** z) * math.cos(math.radians(NORTHMOST_LAT))
+    ratio = pixel / dem_cache.DEFAULT_RESOLUTION
+    return dem_cache.DEFAULT_RESOLUTION * 2 ** max(0, math.floor(math.log2(ratio)))
+
+
+@lru_cache(maxsize=SAMPLE_GRID_CACHE_SIZE)
+def _grid_nodes(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """S-JTSK souřadnice uzlů vzorkovací mřížky dlaždice (včetně hran), řádky od severu."""
+    minx, miny, maxx, maxy = mercator_tile_bounds(x, y, z)
+    nodes = TILE_SIZE // GRID_STEP + 1
+    mx, my = np.meshgrid(np.linspace(minx, maxx, nodes), np.linspace(maxy, miny, nodes))
+    east, north = _3857_to_sjtsk.transform(mx, my)
+    east.flags.writeable = False
+    north.flags.writeable = False
+    return east, north
+
+
+def tile_sample_grid(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    S-JTSK souřadnice středů všech pixelů dlaždice.
+
+    Returns:
+        (east, north) – pole TILE_SIZE x TILE_SIZE (float64)
+    """
+    east, north = _grid_nodes(z, x, y)
+    return _GRID_INTERP @ east @ _GRID_INTERP.T, _GRID_INTERP @ north @ _GRID_INTERP.T
+
+
+def tile_vertex_grid(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """S-JTSK souřadnice vrcholů meshe (rohy pixelů včetně hran dlaždice), GRID_SIZE x GRID_SIZE."""
+    east, north = _grid_nodes(z, x, y)
+    return _VERTEX_INTERP @ east @ _VERTEX_INTERP.T, _VERTEX_INTERP @ north @ _VERTEX_INTERP.T
+
+
+def tile_sjtsk_bounds(z: int, x: int, y: int,
+                      res: Optional[float] = None) -> Tuple[float, float, float, float]:
+    """
+    Obálka dlaždice v S-JTSK zarovnaná na mřížku DEM (+1 px okraj pro bilineární převzorkování).
+
+    Args:
+        res: krok mřížky DEM (default dem_resolution(z))
+    """
+    res = res or dem_resolution(z)
+    east, north = _grid_nodes(z, x, y)
+    left, bottom, right, top = east.min(), north.min(), east.max(), north.max()
+    return (
+        math.floor(left / res) * res - res,
+        math.floor(bottom / res) * res - res,
+        math.ceil(right / res) * res + res,
+        math.ceil(top / res) * res + res,
+    )
+
+
+def _warp(dem: np.ndarray, dem_transform, bounds: Tuple[float, float, float, float],
+          width: int, height: int) -> np.ndarray:
+    """Převzorkuje DEM okno v S-JTSK do mřížky Web Mercator a odfiltruje nereálné výšky."""
+    out = np.full((height, width), np.nan, dtype=np.float32)
+    reproject(
+        source=dem,
+        destination=out,
+        src_transform=dem_transform,
+        src_crs=SJTSK,
+        dst_transform=from_bounds(*bounds, width, height),
+        dst_crs=WEB_MERCATOR,
+        resampling=Resampling.bilinear,
+        src_nodata=np.nan,
+        dst_nodata=np.nan,
+    )
+    out[(out <= MIN_ELEVATION) | (out >= MAX_ELEVATION)] = np.nan
+    return out
+
+
+def remap_bilinear(dem: np.ndarray, dem_transform, east: np.ndarray, north: np.ndarray) -> np.ndarray:
+    """
+    Bilineární vzorkování DEM okna v bodech (east, north) jedním gatherem.
+
+    Chybějící sousedé (NaN) se z váhování vynechají (stejně jako GDAL s NoData),
+    body mimo okno jsou NaN.
+    """
+    height, width = dem.shape
+    col = (east - dem_transform.c) / dem_transform.a - 0.5
+    row = (north - dem_transform.f) / dem_transform.e - 0.5
+    c0 = np.floor(col).astype(np.intp)
+    r0 = np.floor(row).astype(np.intp)
+    fc = (col - c0).astype(np.float32)
+    fr = (row - r0).astype(np.float32)
+
+    inside = (c0 >= 0) & (r0 >= 0) & (c0 < width - 1) & (r0 < height - 1)
+    idx = np.clip(r0, 0, height - 2) * width + np.clip(c0, 0, width - 2)
+    flat = dem.ravel()
+
+    num = np.zeros(east.shape, dtype=np.float32)
+    den = np.zeros(east.shape, dtype=np.float32)
+    for offset, weight in (
+        (0, (1 - fr) * (1 - fc)),
+        (1, (1 - fr) * fc),
+        (width, fr * (1 - fc)),
+        (width + 1, fr * fc),
+    ):
+        values = flat[idx + offset]
+        valid = np.isfinite(values)
+        num += np.where(valid, values * weight, 0)
+        den += np.where(valid, weight, 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = num / den
+    out[~inside | (den < 1e-6)] = np.nan
+    out[(out <= MIN_ELEVATION) | (out >= MAX_ELEVATION)] = np.nan
+    return out
+
+
+def _resample_tile(dem: np.ndarray, dem_transform, z: int, x: int, y: int) -> np.ndarray:
+    with metrics.stage("reproject"):
+        east, north = tile_sample_grid(z, x, y)
+        # Velikost pixelu dlaždice v S-JTSK (vzdálenost sousedních středů v řádku)
+        pixel = math.hypot(east[0, 1] - east[0, 0], north[0, 1] - north[0, 0])
+        if pixel > dem_transform.a:
+            return _warp(dem, dem_transform, mercator_tile_bounds(x, y, z), TILE_SIZE, TILE_SIZE)
+        return remap_bilinear(dem, dem_transform, east, north)
+
+
+def _non_empty(tile: np.ndarray) -> Optional[np.ndarray]:
+    return tile if np.isfinite(tile).any() else None
+
+
+def render_dem_tile(z: int, x: int, y: int, sheets: List[Path],
+                    res: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Vyrenderuje DEM dlaždici z daných listů.
+
+    Args:
+        res: krok DEM okna (default dem_resolution(z))
+
+    Returns:
+        float32 pole TILE_SIZE x TILE_SIZE (NaN = bez dat), nebo None, pokud listy dlaždici nepokrývají
+    """
+    res = res or dem_resolution(z)
+    left, bottom, right, top = tile_sjtsk_bounds(z, x, y, res)
+    dem, dem_transform = dem_cache.read_dem_window(left, bottom, right, top, res, sheets)
+    if not np.isfinite(dem).any():
+        return None
+    return _non_empty(_resample_tile(dem, dem_transform, z, x, y))
+
+
+def _union_bounds(bounds: Iterable[Tuple[float, float, float, float]]) -> Tuple[float, float, float, float]:
+    lefts, bottoms, rights, tops = zip(*bounds)
+    return min(lefts), min(bottoms), max(rights), max(tops)
+
+
+def render_dem_tiles(z: int, xys: List[Tuple[int, int]], sheets: List[Path],
+                     res: Optional[float] = None) -> Dict[Tuple[int, int], Optional[np.ndarray]]:
+    """
+    Vyrenderuje více dlaždic jednoho zoomu nad jedním sdíleným DEM oknem.
+
+    Každý list se otevře a přečte jen jednou; okno je zarovnané na stejnou
+    mřížku jako u render_dem_tile, takže dlaždice jsou bitově shodné.
+
+    Returns:
+        {(x, y): pole výšek nebo None}
+    """
+    res = res or dem_resolution(z)
+    left, bottom, right, top = _union_bounds(tile_sjtsk_bounds(z, x, y, res) for x, y in xys)
+    if (right - left) * (top - bottom) / res ** 2 > MAX_BATCH_WINDOW_PX:
+        return {(x, y): render_dem_tile(z, x, y, sheets, res) for x, y in xys}
+
+    dem, dem_transform = dem_cache.read_dem_window(left, bottom, right, top, res, sheets)
+    if not np.isfinite(dem).any():
+        return {xy: None for xy in xys}
+
+    return {(x, y): _non_empty(_resample_tile(dem, dem_transform, z, x, y)) for x, y in xys}
+
+
+def _newest_mtime(sheets: List[Path]) -> float:
+    newest = 0.0
+    for path in sheets:
+        try:
+            newest = max(newest, path.stat().st_mtime)
+        except OSError:
+            continue
+    return newest
+
+
+def cached_tile(z: int, x: int, y: int, sheets: List[Path]) -> Optional[np.ndarray]:
+    """Dlaždice z cache, pokud je novější než všechny listy, ze kterých vznikla."""
+    max_age = time.time() - _newest_mtime(sheets)
+    data = dem_tile_cache.get(z, x, y, max_age=max_age)
+    if data is None or len(data) != TILE_SIZE * TILE_SIZE * 4:
+        return None
+    return np.frombuffer(data, dtype="<f4").reshape(TILE_SIZE, TILE_SIZE)
+
+
+def get_dem_tile(z: int, x: int, y: int,
+                 sheets: Optional[List[Path]] = None) -> Tuple[Optional[np.ndarray], List[Path], bool]:
+    """
+    DEM dlaždice z cache, při miss vyrenderovaná z listů a uložená.
+
+    Args:
+        sheets: listy překrývající dlaždici (default vyhledání přes dem_cache.find_sheets,
+                které zaznamená přístup pro LRU evikci listů)
+
+    Returns:
+        (pole výšek nebo None, použité listy, True = zásah cache)
+    """
+    if z < MIN_DEM_ZOOM:
+        return None, [], False
+    if sheets is None:
+        sheets = dem_cache.find_sheets(*tile_sjtsk_bounds(z, x, y))
+    if not sheets:
+        return None, sheets, False
+
+    tile = cached_tile(z, x, y, sheets)
+    if tile is not None:
+        return tile, sheets, True
+
+    tile = render_dem_tile(z, x, y, sheets)
+    if tile is not None:
+        dem_tile_cache.put(z, x, y, tile.astype("<f4", copy=False).tobytes())
+    return tile, sheets, False
+
+
+def get_shuffled_dem_tile(z: int, x: int, y: int, nodata: float,
+                          codec: str) -> Tuple[Optional[bytes], List[Path], bool]:
+    """
+    DEM dlaždice ve formátu float32-shuffle; komprimovaný výsledek se cachuje,
+    takže zásah nestojí kompresi. Platnost podle listů jako u get_dem_tile.
+
+    Returns:
+        (zakódovaná dlaždice nebo None, použité listy, True = zásah komprimované cache)
+    """
+    if z < MIN_DEM_ZOOM:
+        return None, [], False
+    sheets = dem_cache.find_sheets(*tile_sjtsk_bounds(z, x, y))
+    if not sheets:
+        return None, sheets, False
+
+    codec = tile_codecs.shuffle_codec(codec)
+    variant = f"{codec}-n{nodata:g}"
+    max_age = time.time() - _newest_mtime(sheets)
+    data = dem_shuffled_cache.get(z, x, y, variant=variant, max_age=max_age)
+    if data is not None:
+        return data, sheets, True
+
+    tile, sheets, _ = get_dem_tile(z, x, y, sheets)
+    if tile is None:
+        return None, sheets, False
+    with metrics.stage("encode"):
+        data = tile_codecs.float32_shuffled(tile, nodata, codec)
+    dem_shuffled_cache.put(z, x, y, data, variant=variant)
+    return data, sheets, False
+
+
+def get_dem_tiles(tiles: List[Tuple[int, int, int]]) -> Tuple[Dict[Tuple[int, int, int], Optional[np.ndarray]], int]:
+    """
+    Dávková varianta get_dem_tile: cache, chybějící dlaždice se renderují
+    po zoomech přes render_dem_tiles (sdílené listy i DEM okno).
+
+    Platnost cache se posuzuje podle nejnovějšího listu celé dávky.
+
+    Returns:
+        ({(z, x, y): pole výšek nebo None}, počet zásahů cache)
+    """
+    by_zoom = defaultdict(list)
+    for z, x, y in tiles:
+        by_zoom[z].append((x, y))
+
+    result: Dict[Tuple[int, int, int], Optional[np.ndarray]] = {}
+    hits = 0
+    for z, xys in by_zoom.items():
+        if z < MIN_DEM_ZOOM:
+            result.update({(z, x, y): None for x, y in xys})
+            continue
+        sheets = dem_cache.find_sheets(*_union_bounds(tile_sjtsk_bounds(z, x, y) for x, y in xys))
+        if not sheets:
+            result.update({(z, x, y): None for x, y in xys})
+            continue
+
+        missing = []
+        for x, y in xys:
+            tile = cached_tile(z, x, y, sheets)
+            if tile is None:
+                missing.append((x, y))
+            else:
+                result[(z, x, y)] = tile
+                hits += 1
+
+        if missing:
+            for (x, y), tile in render_dem_tiles(z, missing, sheets).items():
+                if tile is not None:
+                    dem_tile_cache.put(z, x, y, tile.astype("<f4", copy=False).tobytes())
+                result[(z, x, y)] = tile
+    return result, hits
+
+
+def render_mesh_heights(z: int, x: int, y: int, sheets: List[Path],
+                        res: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Výšky ve vrcholech meshe (GRID_SIZE x GRID_SIZE) z listů.
+
+    Vrcholy na hranách jsou shodné se sousední dlaždicí, takže mesh nemá švy.
+    Místa bez dat se vyplní nejnižší výškou dlaždice (plochá oblast = minimum trojúhelníků).
+    """
+    res = res or dem_resolution(z)
+    left, bottom, right, top = tile_sjtsk_bounds(z, x, y, res)
+    dem, dem_transform = dem_cache.read_dem_window(left, bottom, right, top, res, sheets)
+    with metrics.stage("reproject"):
+        heights = remap_bilinear(dem, dem_transform, *tile_vertex_grid(z, x, y))
+    valid = np.isfinite(heights)
+    if not valid.any():
+        return None
+    heights[~valid] = heights[valid].min()
+    return heights
+
+
+def get_dem_mesh(z: int, x: int, y: int, max_error: float) -> Tuple[Optional[bytes], bool]:
+    """
+    RTIN mesh dlaždice (viz app/terrain_mesh.py), cachovaný stejně jako DEM dlaždice.
+
+    Returns:
+        (zakódovaný mesh nebo None, True = zásah cache)
+    """
+    if z < MIN_DEM_ZOOM:
+        return None, False
+    sheets = dem_cache.find_sheets(*tile_sjtsk_bounds(z, x, y))
+    if not sheets:
+        return None, False
+
+    variant = f"e{max_error:g}"
+    max_age = time.time() - _newest_mtime(sheets)
+    data = dem_mesh_cache.get(z, x, y, variant=variant, max_age=max_age)
+    if data is not None:
+        return data, True
+
+    heights = render_mesh_heights(z, x, y, sheets)
+    if heights is None:
+        return None, False
+    with metrics.stage("mesh"):
+        data, _, _ = terrain_mesh.build_mesh(heights, max_error)
+    dem_mesh_cache.put(z, x, y, data, variant=variant)
+    return data, False
+
+
+def _catalog_tile(z: int, x: int, y: int, force: bool) -> Tuple[Optional[np.ndarray], str]:
+    if z < MIN_DEM_ZOOM:
+        return None, "empty"
+    # Listy přímo z katalogu – seedování ani export nemají ovlivnit LRU evikci listů
+    sheets = catalog.find_sheet_paths(*tile_sjtsk_bounds(z, x, y))
+    if not sheets:
+        return None, "empty"
+    if not force:
+        tile = cached_tile(z, x, y, sheets)
+        if tile is not None:
+            return tile, "cached"
+    tile = render_dem_tile(z, x, y, sheets)
+    if tile is None:
+        return None, "empty"
+    dem_tile_cache.put(z, x, y, tile.astype("<f4", copy=False).tobytes())
+    return tile, "rendered"
+
+
+def seed_tile(z: int, x: int, y: int, force: bool = False) -> str:
+    """
+    Předgeneruje jednu dlaždici do cache (pro scripts/seed_tiles.py).
+
+    Returns:
+        "cached" (už platná v cache), "rendered", nebo "empty" (bez dat)
+    """
+    return _catalog_tile(z, x, y, force)[1]
+
+
+def export_tile(z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Dlaždice pro export do archivu (z cache, případně vyrenderovaná a uložená)."""
+    return _catalog_tile(z, x, y, force=False)[0]
@@ -0,0 +1,163 @@
+"""
+Asynchronní úlohy pro dlouhé analýzy (SVF, profil, NDVI).
+
+Klient úlohu odešle (submit), průběžně se ptá na stav (poll) a hotový
+výsledek si stáhne (fetch). Úlohy běží na pozadí s omezeným počtem
+souběžně zpracovávaných úloh.
+
+ID úlohy je SHA-256 hash druhu úlohy, parametrů a obsahu vstupu – stejný
+požadavek (např. identický upload DEM) tedy dostane stejné ID a klienti
+sdílí jeden výpočet. Výsledky se drží po dobu TTL a pak se mažou.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app import metrics
+from app.atom_downloader import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = CACHE_DIR / "jobs"
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+
+@dataclass
+class JobResult:
+    """Výsledek úlohy – JSON data, nebo soubor na disku."""
+    data: Optional[Any] = None
+    path: Optional[Path] = None
+    media_type: str = "application/json"
+    filename: Optional[str] = None
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    status: str = "queued"  # queued | running | done | failed
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[JobResult] = None
+
+    @property
+    def workdir(self) -> Path:
+        return JOBS_DIR / self.job_id
+
+    def to_dict(self) -> Dict:
+        info = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error:
+            info["error"] = self.error
+        if self.finished:
+            info["expires"] = self.finished + JOB_RESULT_TTL
+        return info
+
+
+def hash_job(kind: str, params: Dict, payload_hash: Optional[str] = None) -> str:
+    """Deterministické ID úlohy z druhu, parametrů a hashe vstupních dat."""
+    h = hashlib.sha256()
+    h.update(kind.encode())
+    h.update(json.dumps(params, sort_keys=True, separators=(",", ":")).encode())
+    if payload_hash:
+        h.update(payload_hash.encode())
+    return h.hexdigest()
+
+
+class JobManager:
+    """Registr úloh s omezeným počtem souběžných výpočtů a retencí výsledků."""
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, ttl: float = JOB_RESULT_TTL):
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.purge_expired()
+        return self._jobs.get(job_id)
+
+    def known_ids(self) -> frozenset:
+        """ID úloh v registru (jejich adresáře nemaže úklid cache, jen TTL)."""
+        return frozenset(self._jobs)
+
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "queued")
+
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "running")
+
+    def purge_expired(self) -> None:
+        """Smaže úlohy, jejichž výsledek je starší než TTL."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished > self.ttl:
+                del self._jobs[job_id]
+                shutil.rmtree(job.workdir, ignore_errors=True)
+
+    def submit(self, kind: str, job_id: str,
+               runner: Callable[[Job], Awaitable[JobResult]]) -> tuple:
+        """
+        Zařadí úlohu ke zpracování.
+
+        Pokud úloha se stejným ID už existuje (čeká, běží nebo je hotová),
+        vrátí se existující úloha a runner se nespouští. Neúspěšné úlohy se
+        při opakovaném odeslání spustí znovu.
+
+        Returns:
+            (job, deduplicated)
+        """
+        self.purge_expired()
+        existing = self._jobs.get(job_id)
+        if existing and existing.status != "failed":
+            return existing, True
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        job = Job(job_id=job_id, kind=kind)
+        job.workdir.mkdir(parents=True, exist_ok=True)
+        self._jobs[job_id] = job
+
+        task = asyncio.create_task(self._run(job, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job, False
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[JobResult]]) -> None:
+        async with self._semaphore:
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.result = await runner(job)
+                job.status = "done"
+            except Exception as exc:
+                job.error = str(getattr(exc, "detail", None) or exc)
+                job.status = "failed"
+                logger.error("Úloha %s %s selhala: %s", job.kind, job.job_id[:12], job.error)
+            finally:
+                job.finished = time.time()
+
+
+job_manager = JobManager()
+# Přes modul, ne přes instanci – testy mohou job_manager nahradit
+metrics.QUEUE_DEPTH.set_function(lambda: job_manager.queue_depth(), queue="jobs")
+metrics.QUEUE_RUNNING.set_function(lambda: job_manager.running(), queue="jobs")
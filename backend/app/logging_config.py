@@ -0,0 +1,152 @@
+"""
+Strukturované logování backendu.
+
+Moduly používají standardní logging (logger = logging.getLogger(__name__))
+s %-šablonami a doplňujícími poli v extra:
+
+    logger.info("Staženo %s", name, extra={"sheet": sheet_id, "bytes": total})
+
+configure_logging() nastaví root logger:
+
+- úroveň loggerů backendu (app.*) z LOG_LEVEL (DEBUG / INFO / WARNING / ...,
+  default INFO), knihoven (httpx, rasterio, ...) z LOG_LEVEL_LIBS (default WARNING)
+- výstup z LOG_FORMAT: text (čas, úroveň, logger, zpráva a pole key=value)
+  nebo json (jeden JSON objekt na řádek)
+- neblokující zápis – request jen vloží záznam do fronty (QueueHandler),
+  formátování a zápis na stderr dělá vlákno QueueListener
+- omezení četnosti: stejná šablona zprávy z jednoho loggeru projde nejvýše
+  LOG_RATE_LIMIT krát za LOG_RATE_WINDOW sekund, zbytek se zahodí a počet
+  zahozených se připíše k dalšímu propuštěnému záznamu (pole suppressed);
+  záznam s extra={"sample": p} navíc projde jen s pravděpodobností p
+
+Diagnostiku, která něco počítá jen kvůli logu (min/max výšek apod.),
+obalte podmínkou logger.isEnabledFor(logging.DEBUG).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Atributy, které má každý LogRecord – vše ostatní přišlo přes extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sample"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")}
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    return datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+
+class TextFormatter(logging.Formatter):
+    """Čitelný řádek: čas úroveň logger: zpráva key=value ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{_timestamp(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Jeden JSON objekt na řádek (pro sběr logů)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": _timestamp(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Vzorkování a omezení četnosti záznamů podle šablony zprávy.
+
+    Běží v QueueHandleru, tj. ve vlákně volajícího ještě před formátováním –
+    zahozený záznam nestojí nic kromě slovníkového lookupu.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        # (logger, šablona) → [začátek okna, propuštěno, zahozeno]
+        self._windows: Dict[Tuple[str, object], List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, "sample", None)
+        if sample is not None and random.random() >= sample:
+            return False
+        if self.limit <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                state = self._windows[key] = [now, 0, 0]
+            if state[1] >= self.limit:
+                state[2] += 1
+                return False
+            state[1] += 1
+        return True
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Nastaví root logger (opakované volání nic nedělá).
+
+    Args:
+        level: úroveň logování backendu (default LOG_LEVEL, jinak INFO)
+        fmt: text / json (default LOG_FORMAT, jinak text)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    limit = int(os.getenv("LOG_RATE_LIMIT", "20"))
+    window = float(os.getenv("LOG_RATE_WINDOW", "10"))
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(limit, window))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL_LIBS", "WARNING").upper())
+    logging.getLogger("app").setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Při ukončení procesu vypsat, co zbylo ve frontě
+    atexit.register(_listener.stop)
@@ -1,18 +1,29 @@
 from fastapi import FastAPI, HTTPException, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+import aiofiles
 import whitebox
 import rasterio
-from rasterio.windows import Window
 import numpy as np
 from pathlib import Path
 import tempfile
 import os
+import shutil
 import io
+import json
+import hashlib
+import logging
+import struct
+import time
+import uuid
 from PIL import Image
 from datetime import datetime, timedelta
 import math
+import asyncio
+from typing import List, Optional, Tuple
 
 from shapely.geometry import LineString, shape
 from shapely.ops import transform
@@ -30,6 +41,12 @@ from sentinelhub import (
     bbox_to_dimensions,
 )
 from app.atom_downloader import download_and_process_area, CACHE_DIR
+from app import (
+    cache_manager, catalog, dem_cache, dem_tiles, jobs, logging_config, mbtiles, metrics, ndvi_tiles, raster_render, sentinel, svf,
+    svf_cache, terrain_mesh, terrain_profile, tile_codecs, vegetation, viz_tiles,
+)
+from app.tile_cache import TileCache
+from app.tile_grid import mercator_tile_bounds
 
 app = FastAPI(
     title="eArcheo API",
@@ -45,15 +62,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Histogramy fází / cache pro /metrics a hlavička Server-Timing
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Initialize WhiteboxTools
 wbt = whitebox.WhiteboxTools()
 load_dotenv()
+# Úroveň a formát logů z LOG_LEVEL / LOG_FORMAT (může je nastavit i .env)
+logging_config.configure_logging()
+logger = logging.getLogger(__name__)
 
 SENTINEL_CLIENT_ID = os.getenv("SENTINEL_CLIENT_ID")
 SENTINEL_CLIENT_SECRET = os.getenv("SENTINEL_CLIENT_SECRET")
 
 sh_config = SHConfig()
+sentinel.configure_timeouts(sh_config)
 if SENTINEL_CLIENT_ID and SENTINEL_CLIENT_SECRET:
     sh_config.sh_client_id = SENTINEL_CLIENT_ID
     sh_config.sh_client_secret = SENTINEL_CLIENT_SECRET
@@ -75,21 +98,6 @@ _project_3857_to_sjtsk = pyproj.Transformer.from_crs(WEB_MERCATOR, SJTSK, always
 _project_sjtsk_to_3857 = pyproj.Transformer.from_crs(SJTSK, WEB_MERCATOR, always_xy=True).transform
 
 
-def mercator_tile_bounds(x: int, y: int, z: int) -> tuple[float, float, float, float]:
-    """
-    Vrátí bounding box dlaždice v souřadnicích EPSG:3857.
-    """
-    if z < 0:
-        raise ValueError("Zoom level must be non-negative")
-    n = 2 ** z
-    lon_min = x / n * 360.0 - 180.0
-    lon_max = (x + 1) / n * 360.0 - 180.0
-    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
-    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
-    minx, miny = _project_to_3857(lon_min, lat_min)
-    maxx, maxy = _project_to_3857(lon_max, lat_max)
-    return minx, miny, maxx, maxy
-
 NDVI_EVALSCRIPT = """
 //VERSION=3
 function setup() {
@@ -113,6 +121,17 @@ def ensure_sentinel_config():
             detail="Chybí SENTINEL_CLIENT_ID / SENTINEL_CLIENT_SECRET v .env (Sentinel Hub API)."
         )
 
+
+async def run_sentinel(fn, *args):
+    """Spustí blokující Sentinel Hub volání v omezeném poolu (mimo event loop)."""
+    try:
+        # Fáze "queue" (čekání na vlákno) a "upstream" (Sentinel Hub) zapisuje pool a volání samo
+        return await sentinel.executor.run(fn, *args)
+    except sentinel.SentinelBusyError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "10"})
+    except sentinel.SentinelTimeoutError as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+
 class BBoxRequest(BaseModel):
     min_lon: float
     min_lat: float
@@ -122,19 +141,97 @@ class BBoxRequest(BaseModel):
 
 DEM_TILE_SIZE = 256
 
+# Služby ČÚZK; CUZK_WMS_URL / CUZK_WCS_URL přesměrují na lokální stub (benchmarks/cuzk_stub.py)
+DMR5G_WMS_URL = os.getenv("CUZK_WMS_URL", "https://ags.cuzk.gov.cz/arcgis2/services/dmr5g/ImageServer/WMSServer")
+DMR5G_WCS_URL = os.getenv("CUZK_WCS_URL", "https://ags.cuzk.gov.cz/arcgis2/services/dmr5g/ImageServer/WCSServer")
+
+# Upload DEM se zapisuje na disk po částech; SVF_TMP_DIR může mířit na tmpfs (např. /dev/shm)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SVF_TMP_DIR = os.getenv("SVF_TMP_DIR") or None
+
+# Normalizace PNG výstupů analýz: percentilový ořez, nebo pevný stretch vmin/vmax
+PNG_CLIP_QUERY = Query(raster_render.DEFAULT_CLIP_PERCENT, ge=0, lt=50,
+                       description="Percentilový ořez v % na každé straně histogramu")
+PNG_VMIN_QUERY = Query(None, description="Pevný stretch – spodní hodnota (spolu s vmax)")
+PNG_VMAX_QUERY = Query(None, description="Pevný stretch – horní hodnota (spolu s vmin)")
+
+
+def _fixed_stretch(vmin: Optional[float], vmax: Optional[float]) -> Optional[raster_render.Stretch]:
+    """Pevný stretch z query parametrů; None = percentilový ořez z histogramu."""
+    if vmin is None and vmax is None:
+        return None
+    if vmin is None or vmax is None or vmax <= vmin:
+        raise HTTPException(status_code=400, detail="Pevný stretch vyžaduje vmin i vmax (vmin < vmax)")
+    return raster_render.Stretch(vmin, vmax)
+
+
+def _archive_dem_tile(format: str, z: int, x: int, y: int, nodata: float, max_error: float,
+                      codec: str) -> Optional[bytes]:
+    """
+    Dlaždice z MBTiles archivu (None = není v archivu).
+
+    Archiv má NoData zapečené jako -32768. Terrarium PNG a float32 s touto NoData
+    se vrací beze změny, ostatní kombinace se překódují z float32 tabulky –
+    float32-shuffle se navíc cachuje (komprese je dražší než čtení z archivu).
+    """
+    archive_nodata = tile_codecs.TERRARIUM_NODATA
+    if format == "terrarium" and nodata == archive_nodata:
+        return mbtiles.dem_archive.get("terrarium", z, x, y)
+    if format == tile_codecs.SHUFFLE_FORMAT:
+        return _archive_shuffled_tile(z, x, y, nodata, codec)
+    data = mbtiles.dem_archive.get("float32", z, x, y)
+    if data is None or (format == "float32" and nodata == archive_nodata):
+        return data
+    return tile_codecs.encode_tile(_archive_float32(data), format, nodata, max_error, codec)
+
+
+def _archive_float32(data: bytes) -> np.ndarray:
+    """float32 dlaždice z archivu s NoData jako NaN."""
+    tile = np.frombuffer(data, dtype="<f4").reshape(dem_tiles.TILE_SIZE, dem_tiles.TILE_SIZE)
+    return np.where(tile == np.float32(tile_codecs.TERRARIUM_NODATA), np.float32(np.nan), tile)
+
+
+def _archive_shuffled_tile(z: int, x: int, y: int, nodata: float, codec: str) -> Optional[bytes]:
+    """
+    float32-shuffle dlaždice z archivu přes cache komprimovaných dlaždic.
+
+    Varianta je oddělená od dlaždic z listů a platí do dalšího exportu archivu.
+    """
+    exported = mbtiles.dem_archive.mtime()
+    if exported is None:
+        return None
+    codec = tile_codecs.shuffle_codec(codec)
+    variant = f"mbtiles-{codec}-n{nodata:g}"
+    cache = dem_tiles.dem_shuffled_cache
+    data = cache.get(z, x, y, variant=variant, max_age=time.time() - exported)
+    if data is not None:
+        return data
+    data = mbtiles.dem_archive.get("float32", z, x, y)
+    if data is None:
+        return None
+    data = tile_codecs.encode_tile(_archive_float32(data), tile_codecs.SHUFFLE_FORMAT, nodata, codec=codec)
+    cache.put(z, x, y, data, variant=variant)
+    return data
+
 
 @app.get("/api/tiles/dem/{z}/{x}/{y}")
 async def get_dem_tile(
     z: int,
     x: int,
     y: int,
-    format: str = Query("float32", pattern="^(float32|terrarium)$"),
+    format: str = Query("float32", pattern=tile_codecs.FORMAT_PATTERN),
     nodata: float = Query(-32768.0, description="Hodnota použitá pro NoData pixely"),
+    max_error: float = Query(tile_codecs.DEFAULT_MAX_ERROR, gt=0, le=100,
+                             description="Max. chyba výšky v metrech (jen format=int16)"),
+    codec: str = Query("deflate", pattern="^(deflate|zstd)$",
+                       description="Komprese pro format=float32-shuffle (zstd jen s balíčkem zstandard)"),
     use_wcs: bool = Query(False, description="Pokusit se získat skutečná výšková data přes WCS"),
     use_atom: bool = Query(True, description="Použít skutečná DMR 5G data z ATOM cache")
 ):
     """
-    Vrátí DEM dlaždici ve formátu float32 (raw buffer) nebo Terrarium RGB.
+    Vrátí DEM dlaždici ve formátu float32 (raw buffer nebo bezeztrátově komprimovaný
+    float32-shuffle), Terrarium RGB (PNG / bezeztrátový WebP) nebo kvantizovaný int16
+    s max. chybou max_error (viz app/tile_codecs.py).
     Slouží jako zdroj pro GPU shader.
     
     Specifikace DMR 5G (ZABAGED):
@@ -151,124 +248,70 @@ async def get_dem_tile(
         minx, miny, maxx, maxy = mercator_tile_bounds(x, y, z)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
+    # Skutečně použitý codec (bez zstandard → deflate), klient ho najde i v hlavičce dlaždice
+    codec = tile_codecs.shuffle_codec(codec)
+    codec_headers = {"X-Tile-Codec": codec} if format == tile_codecs.SHUFFLE_FORMAT else {}
+
+    # Pod MIN_DEM_ZOOM se z ATOM listů nerenderuje (příliš mnoho listů) → WCS / WMS
+    use_atom = use_atom and z >= dem_tiles.MIN_DEM_ZOOM
 
-    # Priorita 1: ATOM cache (skutečná DMR 5G data z LAZ)
+    # Priorita 0: předgenerovaný MBTiles archiv (scripts/export_mbtiles.py) – jedno indexované čtení
+    if use_atom:
+        # SQLite čtení i případné překódování mimo event loop
+        data = await run_in_threadpool(_archive_dem_tile, format, z, x, y, nodata, max_error, codec)
+        if data is not None:
+            return Response(
+                content=data,
+                media_type=tile_codecs.MEDIA_TYPES[format],
+                headers={
+                    "Cache-Control": "public, max-age=86400",
+                    "X-Data-Source": "MBTiles-DMR5G",
+                    **codec_headers,
+                },
+            )
+
+    # Priorita 1: ATOM cache (skutečná DMR 5G data z LAZ) – dlaždice z listů, cachovaná na disku
     if use_atom:
         try:
-            # Kontrola, zda máme cachovaný GeoTIFF pro tuto oblast
-            # Převedeme střed tile do WGS84
-            center_x = (minx + maxx) / 2
-            center_y = (miny + maxy) / 2
-            
-            # Web Mercator → WGS84
-            wgs84 = pyproj.CRS('EPSG:4326')
-            web_merc = pyproj.CRS('EPSG:3857')
-            transformer = pyproj.Transformer.from_crs(web_merc, wgs84, always_xy=True)
-            lon, lat = transformer.transform(center_x, center_y)
-            
-            # Hledej GeoTIFF v cache
-            geotiff_dir = CACHE_DIR / "geotiff"
-            
-            if geotiff_dir.exists():
-                # Zkus najít odpovídající GeoTIFF
-                for tif_path in geotiff_dir.glob("*.tif"):
-                    try:
-                        with rasterio.open(tif_path) as src:
-                            # Transformuj tile bbox do S-JTSK (souřadnic GeoTIFF)
-                            minx_sjtsk, miny_sjtsk = _project_3857_to_sjtsk(minx, miny)
-                            maxx_sjtsk, maxy_sjtsk = _project_3857_to_sjtsk(maxx, maxy)
-                            
-                            # Získej GeoTIFF bounds v S-JTSK
-                            tif_bounds = src.bounds
-                            
-                            # Kontrola překryvu bboxů
-                            overlaps = not (
-                                maxx_sjtsk < tif_bounds.left or
-                                minx_sjtsk > tif_bounds.right or
-                                maxy_sjtsk < tif_bounds.bottom or
-                                miny_sjtsk > tif_bounds.top
-                            )
-                            
-                            if overlaps:
-                                from rasterio.warp import reproject, Resampling
-                                from rasterio.transform import from_bounds
-                                
-                                # Výstupní pole 256x256 v souřadnicích Web Mercator
-                                dst_array = np.full((DEM_TILE_SIZE, DEM_TILE_SIZE), nodata, dtype=np.float32)
-                                
-                                # Transformace výstupu: tile bbox ve Web Mercator (nativní projekce mapy)
-                                dst_transform = from_bounds(
-                                    minx, miny,
-                                    maxx, maxy,
-                                    DEM_TILE_SIZE, DEM_TILE_SIZE
-                                )
-                                
-                                # Reproject: S-JTSK raster -> Web Mercator tile grid
-                                reproject(
-                                    source=rasterio.band(src, 1),
-                                    destination=dst_array,
-                                    src_transform=src.transform,
-                                    src_crs=src.crs,
-                                    dst_transform=dst_transform,
-                                    dst_crs=WEB_MERCATOR,
-                                    resampling=Resampling.bilinear,
-                                    src_nodata=src.nodata if src.nodata is not None else -9999,
-                                    dst_nodata=nodata
-                                )
-                                
-                                # Filtruj extrémní hodnoty a NoData
-                                valid_mask = (dst_array != nodata) & (dst_array > -1000) & (dst_array < 3000)
-                                if valid_mask.any():
-                                    print(f"[DEM] ✅ Použita ATOM cache: {tif_path.name}")
-                                    print(f"      Výšky: {dst_array[valid_mask].min():.1f} - {dst_array[valid_mask].max():.1f} m n.m.")
-                                    
-                                    # Nahraď NoData hodnotou mimo rozsah (pro Terrarium encoding)
-                                    # NoData bude -32768 → dekóduje se zpět jako -32768
-                                    dst_array_clean = dst_array.copy()
-                                    dst_array_clean[~valid_mask] = nodata
-                                    
-                                    if format == "float32":
-                                        buffer = io.BytesIO(dst_array_clean.tobytes(order="C"))
-                                        return Response(
-                                            content=buffer.getvalue(),
-                                            media_type="application/octet-stream",
-                                            headers={
-                                                "Cache-Control": "public, max-age=86400",
-                                                "X-Data-Source": f"ATOM-Real-DMR5G-{tif_path.stem}"
-                                            }
-                                        )
-                                    
-                                    # Terrarium encoding s ošetřením NoData
-                                    # Hodnoty: -1000 až 3000 m → 31768 až 35768 (po shiftu)
-                                    shifted = np.clip(dst_array_clean + 32768.0, 0, 65535)
-                                    r = np.floor(shifted / 256.0)
-                                    g = shifted - r * 256.0
-                                    b = np.floor((shifted - np.floor(shifted)) * 256.0)
-                                    terrarium = np.stack([r, g, b], axis=-1).astype(np.uint8)
-                                    img = Image.fromarray(terrarium, mode="RGB")
-                                    buffer = io.BytesIO()
-                                    img.save(buffer, format="PNG", optimize=True)
-                                    buffer.seek(0)
-                                    return StreamingResponse(
-                                        buffer,
-                                        media_type="image/png",
-                                        headers={
-                                            "Cache-Control": "public, max-age=86400",
-                                            "X-Data-Source": f"ATOM-Real-DMR5G-{tif_path.stem}"
-                                        }
-                                    )
-                    except Exception as e:
-                        # Tento GeoTIFF nepokrývá tile nebo chyba při čtení
-                        print(f"[DEM] ⚠️ Chyba při čtení {tif_path.name}: {e}")
-                        continue
-            
+            if format == tile_codecs.SHUFFLE_FORMAT:
+                # Komprimovaná dlaždice má vlastní cache → zásah bez opakované komprese
+                data, sheets, cache_hit = await run_in_threadpool(
+                    dem_tiles.get_shuffled_dem_tile, z, x, y, nodata, codec
+                )
+            else:
+                tile, sheets, cache_hit = await run_in_threadpool(dem_tiles.get_dem_tile, z, x, y)
+                data = None
+                if tile is not None:
+                    # Redukce přes celou dlaždici jen kvůli logu → jen při DEBUG
+                    if logger.isEnabledFor(logging.DEBUG):
+                        valid_mask = np.isfinite(tile)
+                        if valid_mask.any():
+                            logger.debug("Výšky dlaždice %d/%d/%d: %.1f - %.1f m n.m.", z, x, y,
+                                         tile[valid_mask].min(), tile[valid_mask].max())
+                    # NoData (NaN v cache) → požadovaná hodnota; Terrarium ji dekóduje zpět jako -32768
+                    data = tile_codecs.encode_tile(tile, format, nodata, max_error)
+
+            if data is not None:
+                logger.debug("Dlaždice %d/%d/%d z ATOM cache", z, x, y,
+                             extra={"cache": "HIT" if cache_hit else "MISS", "sheet": sheets[0].name})
+                return Response(
+                    content=data,
+                    media_type=tile_codecs.MEDIA_TYPES[format],
+                    headers={
+                        "Cache-Control": "public, max-age=86400",
+                        "X-Data-Source": f"ATOM-Real-DMR5G-{sheets[0].stem}",
+                        "X-Cache": "HIT" if cache_hit else "MISS",
+                        **codec_headers,
+                    },
+                )
+
             # Pokud jsme nenašli v cache, pokus se stáhnout
-            print(f"[DEM] ATOM cache miss pro tile {z}/{x}/{y}, pokouším se stáhnout...")
+            logger.debug("Dlaždice %d/%d/%d není pokrytá ATOM cache", z, x, y)
             # Toto může trvat dlouho (20 MB + rasterizace), nechť běží na pozadí
             # Pro production by bylo lepší queue systém
-            
+
         except Exception as e:
-            print(f"[DEM] ATOM selhalo: {e}, padám na WMS")
+            logger.warning("ATOM selhalo pro %d/%d/%d, padám na WMS: %s", z, x, y, e)
             # Pokračuj k fallbacku
 
     # Priorita 2: WCS pro skutečná výšková data (může selhat kvůli omezení služby)
@@ -278,7 +321,6 @@ async def get_dem_tile(
             minx_sjtsk, miny_sjtsk = _project_3857_to_sjtsk(minx, miny)
             maxx_sjtsk, maxy_sjtsk = _project_3857_to_sjtsk(maxx, maxy)
             
-            wcs_url = "https://ags.cuzk.gov.cz/arcgis2/services/dmr5g/ImageServer/WCSServer"
             params = {
                 "SERVICE": "WCS",
                 "VERSION": "1.0.0",
@@ -297,8 +339,9 @@ async def get_dem_tile(
                 "Referer": "https://geoportal.cuzk.cz/",
             }
             
-            async with httpx.AsyncClient(timeout=20.0, verify=False) as client:
-                resp = await client.get(wcs_url, params=params, headers=headers_wcs)
+            with metrics.stage("upstream"):
+                async with httpx.AsyncClient(timeout=20.0, verify=False) as client:
+                    resp = await client.get(DMR5G_WCS_URL, params=params, headers=headers_wcs)
                 
             if resp.status_code == 200 and resp.headers.get('content-type', '').startswith('image'):
                 # Zpracování GeoTIFF s výškovými daty
@@ -306,49 +349,26 @@ async def get_dem_tile(
                     with rasterio.open(mem_file) as src:
                         arr = src.read(1).astype(np.float32)
                         
-                        # Ošetření NoData hodnot
+                        # Ošetření NoData hodnot (NaN → při kódování požadovaná hodnota)
                         if src.nodata is not None:
-                            arr[arr == src.nodata] = nodata
+                            arr[arr == src.nodata] = np.nan
                         
                         # DMR 5G je v metrech nad mořem (Bpv - Baltic 1957 height)
                         # Výška ČR se pohybuje cca 100-1600m
-                        
-                        if format == "float32":
-                            buffer = io.BytesIO(arr.tobytes(order="C"))
-                            return Response(
-                                content=buffer.getvalue(),
-                                media_type="application/octet-stream",
-                                headers={
-                                    "Cache-Control": "public, max-age=3600",
-                                    "X-Data-Source": "WCS-Real-Elevation-DMR5G"
-                                }
-                            )
-                        
-                        # Terrarium encoding pro reálná data
-                        shifted = np.clip(arr + 32768.0, 0, 65535)
-                        r = np.floor(shifted / 256.0)
-                        g = shifted - r * 256.0
-                        b = np.floor((shifted - np.floor(shifted)) * 256.0)
-                        terrarium = np.stack([r, g, b], axis=-1).astype(np.uint8)
-                        img = Image.fromarray(terrarium, mode="RGB")
-                        buffer = io.BytesIO()
-                        img.save(buffer, format="PNG", optimize=True)
-                        buffer.seek(0)
-                        return StreamingResponse(
-                            buffer,
-                            media_type="image/png",
+                        return Response(
+                            content=tile_codecs.encode_tile(arr, format, nodata, max_error, codec),
+                            media_type=tile_codecs.MEDIA_TYPES[format],
                             headers={
                                 "Cache-Control": "public, max-age=3600",
-                                "X-Data-Source": "WCS-Real-Elevation-DMR5G"
+                                "X-Data-Source": "WCS-Real-Elevation-DMR5G",
+                                **codec_headers,
                             }
                         )
         except Exception as e:
-            print(f"[DEM] WCS failed, falling back to WMS: {e}")
+            logger.warning("WCS selhalo pro %d/%d/%d, padám na WMS: %s", z, x, y, e)
             # Pokračuj k WMS fallbacku
 
     # FALLBACK: WMS GrayscaleHillshade jako pseudo-DEM (pouze vizuální)
-    wms_url = "https://ags.cuzk.gov.cz/arcgis2/services/dmr5g/ImageServer/WMSServer"
-    
     params = {
         "SERVICE": "WMS",
         "VERSION": "1.3.0",
@@ -367,10 +387,10 @@ async def get_dem_tile(
         "Referer": "https://geoportal.cuzk.cz/",
     }
 
-    async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
-        resp = await client.get(wms_url, params=params, headers=headers)
-        print(f"[DEM] WMS Request URL: {resp.url}")
-        print(f"[DEM] Status: {resp.status_code}")
+    with metrics.stage("upstream"):
+        async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
+            resp = await client.get(DMR5G_WMS_URL, params=params, headers=headers)
+        logger.debug("WMS fallback %d/%d/%d: %s", z, x, y, resp.url, extra={"status": resp.status_code})
 
     if resp.status_code != 200:
         detail = f"ČÚZK WMS error: {resp.status_code}"
@@ -390,36 +410,249 @@ async def get_dem_tile(
         # Normalizace 0-255 na typický výškový rozsah ČR (200-1000m střed)
         arr = 200.0 + (arr / 255.0) * 800.0
 
-    if format == "float32":
-        buffer = io.BytesIO(arr.tobytes(order="C"))
-        return Response(
-            content=buffer.getvalue(),
-            media_type="application/octet-stream",
-            headers={
-                "Cache-Control": "public, max-age=3600",
-                "X-Data-Source": "WMS-Pseudo-Elevation"
-            }
-        )
+    return Response(
+        content=tile_codecs.encode_tile(arr, format, nodata, max_error, codec),
+        media_type=tile_codecs.MEDIA_TYPES[format],
+        headers={
+            "Cache-Control": "public, max-age=3600",
+            "X-Data-Source": "WMS-Pseudo-Elevation",
+            **codec_headers,
+        }
+    )
+
+# Dávka DEM dlaždic: záznam = hlavička <z:u8><x:u32><y:u32><délka:u32> (little-endian) + data;
+# délka 0 = pro dlaždici nejsou v ATOM cache data
+DEM_BATCH_RECORD = struct.Struct("<BIII")
+MAX_DEM_BATCH_TILES = 256
+
+
+class DemTileBatchRequest(BaseModel):
+    """Seznam dlaždic [[z, x, y], ...], nebo zoom + rozsah x_min..x_max, y_min..y_max (včetně)."""
+    tiles: Optional[List[Tuple[int, int, int]]] = None
+    z: Optional[int] = None
+    x_min: Optional[int] = None
+    x_max: Optional[int] = None
+    y_min: Optional[int] = None
+    y_max: Optional[int] = None
+
+    def tile_list(self) -> List[Tuple[int, int, int]]:
+        if self.tiles is not None:
+            tiles = self.tiles
+        elif None not in (self.z, self.x_min, self.x_max, self.y_min, self.y_max):
+            count = (self.x_max - self.x_min + 1) * (self.y_max - self.y_min + 1)
+            if count > MAX_DEM_BATCH_TILES:
+                raise ValueError(f"Maximálně {MAX_DEM_BATCH_TILES} dlaždic v jedné dávce")
+            tiles = [(self.z, x, y) for y in range(self.y_min, self.y_max + 1)
+                     for x in range(self.x_min, self.x_max + 1)]
+        else:
+            raise ValueError("Zadejte tiles, nebo z + x_min, x_max, y_min, y_max")
+
+        if not tiles or len(tiles) > MAX_DEM_BATCH_TILES:
+            raise ValueError(f"Dávka musí obsahovat 1–{MAX_DEM_BATCH_TILES} dlaždic")
+        for z, x, y in tiles:
+            if not (0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                raise ValueError(f"Neplatná dlaždice {z}/{x}/{y}")
+        # Duplicity se vrací jen jednou, pořadí odpovídá požadavku
+        return list(dict.fromkeys(tiles))
+
+
+@app.post("/api/tiles/dem/batch")
+async def get_dem_tiles_batch(
+    request: DemTileBatchRequest,
+    format: str = Query("float32", pattern=tile_codecs.FORMAT_PATTERN),
+    nodata: float = Query(-32768.0, description="Hodnota použitá pro NoData pixely"),
+    max_error: float = Query(tile_codecs.DEFAULT_MAX_ERROR, gt=0, le=100,
+                             description="Max. chyba výšky v metrech (jen format=int16)"),
+    codec: str = Query("deflate", pattern="^(deflate|zstd)$",
+                       description="Komprese pro format=float32-shuffle (zstd jen s balíčkem zstandard)"),
+):
+    """
+    Vrátí více DEM dlaždic z ATOM cache jednou odpovědí.
+
+    Dlaždice se berou z MBTiles archivu / cache dlaždic, chybějící se renderují
+    společně (každý list se čte jednou, sousední dlaždice jednou reprojekcí).
+    Odpověď je binární proud záznamů v pořadí požadavku:
+    <z:u8><x:u32><y:u32><délka:u32> + data zakódovaná jako u /api/tiles/dem (format),
+    délka 0 = bez dat (WCS/WMS fallback se v dávce nepoužívá, dlaždice pod
+    MIN_DEM_ZOOM jsou vždy prázdné).
+    """
+    try:
+        tiles = request.tile_list()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    codec = tile_codecs.shuffle_codec(codec)
+
+    def collect():
+        # Archiv i renderování celé dávky v jednom vlákně poolu – event loop zůstává volný
+        ready = {}
+        for key in tiles:
+            data = _archive_dem_tile(format, *key, nodata, max_error, codec)
+            if data is not None:
+                ready[key] = data
+
+        pending = [t for t in tiles if t not in ready]
+        if not pending:
+            return ready, {}, 0
+        return (ready, *dem_tiles.get_dem_tiles(pending))
+
+    ready, rendered, cache_hits = await run_in_threadpool(collect)
+
+    def stream():
+        for key in tiles:
+            data = ready.get(key)
+            if data is None and rendered.get(key) is not None:
+                data = tile_codecs.encode_tile(rendered[key], format, nodata, max_error, codec)
+            data = data or b""
+            yield DEM_BATCH_RECORD.pack(*key, len(data)) + data
 
-    # Terrarium fallback (RGB 8-bit)
-    shifted = np.clip(arr + 32768.0, 0, 65535)
-    r = np.floor(shifted / 256.0)
-    g = shifted - r * 256.0
-    b = np.floor((shifted - np.floor(shifted)) * 256.0)
-    terrarium = np.stack([r, g, b], axis=-1).astype(np.uint8)
-    img = Image.fromarray(terrarium, mode="RGB")
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG", optimize=True)
-    buffer.seek(0)
     return StreamingResponse(
-        buffer,
+        stream(),
+        media_type="application/octet-stream",
+        headers={
+            "Cache-Control": "public, max-age=86400",
+            "X-Tile-Count": str(len(tiles)),
+            "X-Tiles-Archive": str(len(ready)),
+            "X-Tiles-Cached": str(cache_hits),
+            **({"X-Tile-Codec": codec} if format == tile_codecs.SHUFFLE_FORMAT else {}),
+        },
+    )
+
+
+VIZ_TILE_CACHES = {viz: TileCache(f"viz-{viz}", "png") for viz in viz_tiles.VIZ_SPECS}
+
+
+# Musí být registrováno před obecným /api/tiles/{viz}/...
+@app.get("/api/tiles/mesh/{z}/{x}/{y}")
+async def get_dem_mesh_tile(
+    z: int, x: int, y: int,
+    max_error: Optional[float] = Query(None, gt=0, le=1000,
+                                       description="Max. chyba meshe v metrech (default podle zoomu)"),
+):
+    """
+    Vrátí terénní mesh (RTIN, formát odvozený z quantized-mesh – viz app/terrain_mesh.py)
+    pro DEM dlaždici z ATOM cache. Na rovinách má mesh řádově méně vrcholů než 256x256 grid.
+    """
+    try:
+        mercator_tile_bounds(x, y, z)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if z < dem_tiles.MIN_DEM_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Minimální zoom je {dem_tiles.MIN_DEM_ZOOM}")
+    if max_error is None:
+        max_error = terrain_mesh.default_max_error(z)
+
+    data, cache_hit = await run_in_threadpool(dem_tiles.get_dem_mesh, z, x, y, max_error)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Pro dlaždici nejsou v ATOM cache žádná data")
+
+    _, _, vertices, triangles = terrain_mesh.MESH_HEADER.unpack_from(data)
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={
+            "Cache-Control": "public, max-age=86400",
+            "X-Cache": "HIT" if cache_hit else "MISS",
+            "X-Mesh-Max-Error": f"{max_error:g}",
+            "X-Mesh-Vertices": str(vertices),
+            "X-Mesh-Triangles": str(triangles),
+        },
+    )
+
+
+@app.get("/api/tiles/ndvi/{z}/{x}/{y}")
+async def get_ndvi_tile(
+    z: int, x: int, y: int,
+    date: Optional[str] = Query(None, description="Datum v období (YYYY-MM-DD), default dnes"),
+    period: str = Query("month", pattern="^(month|quarter)$"),
+):
+    """
+    Vrátí RGBA PNG dlaždici NDVI (Sentinel-2) pro období obsahující zadané datum.
+
+    Časové okno se zarovná na celý měsíc / čtvrtletí, dlaždice se cachují
+    na disku (TTL + velikostní limit) a Sentinel Hub se volá jen při miss.
+    """
+    if z < ndvi_tiles.MIN_NDVI_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Minimální zoom je {ndvi_tiles.MIN_NDVI_ZOOM}")
+    try:
+        mercator_tile_bounds(x, y, z)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date() if date else None
+        start, end = ndvi_tiles.snap_period(day, period)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Neplatné datum/období: {exc}")
+
+    variant = ndvi_tiles.period_key(period, start)
+    max_age = ndvi_tiles.period_max_age(end)
+    cache = ndvi_tiles.ndvi_tile_cache
+
+    data = await run_in_threadpool(cache.get, z, x, y, variant=variant, max_age=max_age)
+    cache_status = "HIT"
+    if data is None:
+        cache_status = "MISS"
+        ensure_sentinel_config()
+        try:
+            data = await run_sentinel(ndvi_tiles.fetch_ndvi_tile, z, x, y, start, end, sh_config)
+        except HTTPException:
+            raise
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail=f"Sentinel Hub error: {exc}")
+        await run_in_threadpool(cache.put, z, x, y, data, variant)
+
+    return Response(
+        content=data,
         media_type="image/png",
         headers={
-            "Cache-Control": "public, max-age=3600",
-            "X-Data-Source": "WMS-Pseudo-Elevation"
+            "Cache-Control": f"public, max-age={3600 if max_age else 86400}",
+            "X-Cache": cache_status,
+            "X-NDVI-Period": f"{start.isoformat()}/{end.isoformat()}",
         }
     )
 
+
+@app.get("/api/tiles/{viz}/{z}/{x}/{y}")
+async def get_visualization_tile(viz: str, z: int, x: int, y: int):
+    """
+    Vrátí PNG dlaždici archeologické vizualizace (svf, lrm, openness, hillshade).
+
+    Počítá se z cachovaných DMR 5G listů po dlaždicích s okrajem (bez švů)
+    a s pevným stretchem, takže vrstva se posouvá jako podkladová mapa.
+    Plně pokryté dlaždice se ukládají do diskové cache. Dlaždice bez dat
+    vrací 204 No Content.
+    """
+    if viz not in viz_tiles.VIZ_SPECS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Neznámá vizualizace '{viz}', dostupné: {', '.join(viz_tiles.VIZ_SPECS)}"
+        )
+    if z < viz_tiles.MIN_VIZ_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Minimální zoom je {viz_tiles.MIN_VIZ_ZOOM}")
+    try:
+        mercator_tile_bounds(x, y, z)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    cache = VIZ_TILE_CACHES[viz]
+    data = await run_in_threadpool(cache.get, z, x, y)
+    cache_status = "HIT"
+    if data is None:
+        cache_status = "MISS"
+        rendered = await run_in_threadpool(viz_tiles.render_tile, viz, z, x, y)
+        if rendered is None:
+            return Response(status_code=204)
+        data, complete = rendered
+        # Neúplné dlaždice (okraj pokrytí) se necachují – po stažení dalších listů se dopočítají
+        if complete:
+            await run_in_threadpool(cache.put, z, x, y, data)
+
+    return Response(
+        content=data,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400", "X-Cache": cache_status}
+    )
+
+
 @app.get("/")
 async def root():
     return {
@@ -431,7 +664,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "whitebox": "ready"}
+    return {
+        "status": "ok",
+        "whitebox": "ready",
+        "jobs": {"queued": jobs.job_manager.queue_depth(), "running": jobs.job_manager.running()},
+        "sentinel": sentinel.executor.stats(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Metriky ve formátu Prometheus: doby requestů a fází (sheet_lookup, dataset_read,
+    reproject, encode, upstream, ...) podle route a zdroje dat, zásahy cache.
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.post("/api/atom/download")
 async def download_dmr5g_for_area(lat: float = Query(...), lon: float = Query(...)):
@@ -455,48 +701,162 @@ async def download_dmr5g_for_area(lat: float = Query(...), lon: float = Query(..
             }
         else:
             raise HTTPException(status_code=500, detail="Nepodařilo se stáhnout DMR 5G data")
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Stažení DMR 5G pro %.5f, %.5f selhalo: %s", lat, lon, e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _catalog_entry(row: dict) -> dict:
+    """Záznam katalogu ve tvaru odpovědi /api/atom/cache/list."""
+    return {
+        "filename": row["filename"],
+        "size_mb": row["size_bytes"] / (1024 * 1024),
+        "bbox_sjtsk": {
+            "left": row["min_x"],
+            "bottom": row["min_y"],
+            "right": row["max_x"],
+            "top": row["max_y"]
+        },
+        "dimensions": {"width": row["width"], "height": row["height"]},
+        "resolution": {"x": row["res_x"], "y": row["res_y"]},
+        "crs": row["crs"],
+        "point_count": row["point_count"],
+        "created": row["created"],
+        "modified": row["modified"],
+        "last_access": row["last_access"],
+        "pinned": bool(row["pinned"]),
+    }
+
+
 @app.get("/api/atom/cache/list")
-async def list_cached_geotiffs():
-    """Vypíše cachované GeoTIFF soubory."""
-    geotiff_dir = CACHE_DIR / "geotiff"
-    
-    if not geotiff_dir.exists():
-        return {"cached_files": [], "count": 0}
-    
-    files = []
-    for tif_path in geotiff_dir.glob("*.tif"):
-        try:
-            with rasterio.open(tif_path) as src:
-                bounds = src.bounds
-                files.append({
-                    "filename": tif_path.name,
-                    "size_mb": tif_path.stat().st_size / (1024 * 1024),
-                    "bbox_sjtsk": {
-                        "left": bounds.left,
-                        "bottom": bounds.bottom,
-                        "right": bounds.right,
-                        "top": bounds.top
-                    },
-                    "dimensions": {"width": src.width, "height": src.height},
-                    "crs": str(src.crs)
-                })
-        except Exception:
-            continue
-    
-    return {"cached_files": files, "count": len(files)}
+async def list_cached_geotiffs(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    min_lon: Optional[float] = Query(None),
+    min_lat: Optional[float] = Query(None),
+    max_lon: Optional[float] = Query(None),
+    max_lat: Optional[float] = Query(None),
+):
+    """
+    Vypíše cachované GeoTIFF soubory (z katalogu, stránkovaně).
+
+    Volitelný WGS84 bbox (min_lon, min_lat, max_lon, max_lat) omezí výpis
+    na listy, které ho překrývají.
+    """
+    bbox = None
+    bbox_params = (min_lon, min_lat, max_lon, max_lat)
+    if any(v is not None for v in bbox_params):
+        if any(v is None for v in bbox_params):
+            raise HTTPException(status_code=400, detail="Bbox vyžaduje min_lon, min_lat, max_lon i max_lat.")
+        bbox = dem_cache.wgs84_bounds_to_sjtsk(*bbox_params)
+
+    rows, total = await run_in_threadpool(catalog.query_sheets, bbox, limit, offset)
+    files = [_catalog_entry(row) for row in rows]
+    return {"cached_files": files, "count": len(files), "total": total, "limit": limit, "offset": offset}
+
+
+@app.get("/api/atom/cache/usage")
+async def cache_usage():
+    """Využití disku cache DMR 5G podle typu (ZIP, LAZ, SVF bloky, úlohy, GeoTIFF) a rozpočet."""
+    usage = await run_in_threadpool(cache_manager.usage)
+    return {
+        "usage": usage,
+        "total_bytes": sum(item["bytes"] for item in usage.values()),
+        "budget_bytes": int(cache_manager.CACHE_BUDGET_GB * 1024 ** 3),
+    }
+
+
+@app.post("/api/atom/cache/evict")
+async def evict_cache(budget_gb: Optional[float] = Query(None, ge=0, description="Jednorázově jiný rozpočet (GB)")):
+    """Vynutí úklid cache na rozpočet (osiřelé úlohy → ZIP → LAZ → SVF bloky → studené GeoTIFFy)."""
+    return await run_in_threadpool(cache_manager.enforce_budget, budget_gb)
+
+
+@app.post("/api/atom/cache/pin")
+async def pin_cached_sheets(
+    min_lon: float = Query(...),
+    min_lat: float = Query(...),
+    max_lon: float = Query(...),
+    max_lat: float = Query(...),
+    pinned: bool = Query(True, description="false = odepnout"),
+):
+    """
+    Připne listy překrývající WGS84 bbox – evikce je nikdy nesmaže.
+
+    Určeno pro servírovací uzly s menším diskem, které obsluhují jen určitou oblast.
+    """
+    bbox = dem_cache.wgs84_bounds_to_sjtsk(min_lon, min_lat, max_lon, max_lat)
+    count = await run_in_threadpool(catalog.set_pinned, bbox, pinned)
+    return {"pinned": pinned, "sheets": count}
+
+
+async def fetch_wcs_dem_3857(minx: float, miny: float, maxx: float, maxy: float,
+                             buff: float = 50.0, resolution: float = 2.0,
+                             max_dim: int = 2000) -> bytes:
+    """
+    Stáhne výřez DMR 5G z ČÚZK WCS jako GeoTIFF v EPSG:3857.
+
+    Bbox se rozšíří o buffer (v metrech), aby byla data i pro diagonální linie.
+    Rozměr výstupu odpovídá zhruba zadanému rozlišení, ale je omezen max_dim.
+    """
+    bbox_str = f"{minx-buff},{miny-buff},{maxx+buff},{maxy+buff}"
+
+    width = int((maxx - minx + 2*buff) / resolution)
+    height = int((maxy - miny + 2*buff) / resolution)
+
+    # Cap max size to avoid huge requests
+    if width > max_dim or height > max_dim:
+        scale = max_dim / max(width, height)
+        width = int(width * scale)
+        height = int(height * scale)
+
+    params = {
+        "SERVICE": "WCS",
+        "VERSION": "1.0.0",
+        "REQUEST": "GetCoverage",
+        "COVERAGE": "dmr5g",
+        "BBOX": bbox_str,
+        "CRS": "EPSG:3857",
+        "RESPONSE_CRS": "EPSG:3857",
+        "FORMAT": "GeoTIFF",
+        "WIDTH": width,
+        "HEIGHT": height
+    }
+
+    with metrics.stage("upstream"):
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(DMR5G_WCS_URL, params=params, timeout=30.0)
+
+    if resp.status_code != 200:
+        logger.warning("WCS chyba %d: %s", resp.status_code, resp.text[:200])
+        raise HTTPException(status_code=502, detail="ČÚZK WCS Error")
+
+    return resp.content
+
+
+PROFILE_MAX_POINTS_QUERY = Query(
+    200, ge=10, le=5000,
+    description="Počet bodů vrácených klientovi (profil se zředí algoritmem LTTB)"
+)
+
 
 @app.post("/api/analyze/profile")
-async def get_terrain_profile(geojson: dict):
+async def get_terrain_profile(geojson: dict, max_points: int = PROFILE_MAX_POINTS_QUERY):
     """
     Vypočítá výškový profil pro zadanou GeoJSON LineString.
     Data stahuje dynamicky z ČÚZK WCS (DMR 5G).
+
+    Profil se vzorkuje v plném rozlišení rastru, nad ním se spočítají
+    statistiky (stoupání/klesání, sklon, extrémy) a vzorky se zředí
+    na max_points bodů se zachováním tvaru (LTTB).
     """
+    return await compute_terrain_profile(geojson, max_points)
+
+
+async def compute_terrain_profile(geojson: dict, max_points: int = 200) -> dict:
+    """Výpočet profilu sdílený synchronním endpointem a asynchronními úlohami."""
     try:
         # 1. Parse Geometry
         geom = shape(geojson)
@@ -505,126 +865,208 @@ async def get_terrain_profile(geojson: dict):
 
         # 2. Reproject to EPSG:3857 (Web Mercator) for metric buffer calculations
         #    and WCS compatibility
-        project = pyproj.Transformer.from_crs(WGS84, WEB_MERCATOR, always_xy=True).transform
-        
-        line_3857 = transform(project, geom)
-        
-        # 3. Prepare WCS Request
-        # We need a bounding box around the line
-        minx, miny, maxx, maxy = line_3857.bounds
-        
-        # Add buffer to ensure we have data even for diagonal lines
-        buff = 50 # meters
-        bbox_str = f"{minx-buff},{miny-buff},{maxx+buff},{maxy+buff}"
-        
-        # Calculate resolution (approx 1m usually, but let's ask for what we need)
-        # Width/Height of the image.
-        width = int((maxx - minx + 2*buff) / 2.0) # 2m resolution approx
-        height = int((maxy - miny + 2*buff) / 2.0)
-        
-        # Cap max size to avoid huge requests
-        max_dim = 2000
-        if width > max_dim or height > max_dim:
-             scale = max_dim / max(width, height)
-             width = int(width * scale)
-             height = int(height * scale)
-
-        wcs_url = "https://ags.cuzk.gov.cz/arcgis2/services/dmr5g/ImageServer/WCSServer"
-        params = {
-            "SERVICE": "WCS",
-            "VERSION": "1.0.0",
-            "REQUEST": "GetCoverage",
-            "COVERAGE": "dmr5g",
-            "BBOX": bbox_str,
-            "CRS": "EPSG:3857",
-            "RESPONSE_CRS": "EPSG:3857",
-            "FORMAT": "GeoTIFF",
-            "WIDTH": width,
-            "HEIGHT": height
-        }
-        
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(wcs_url, params=params, timeout=30.0)
-            
-        if resp.status_code != 200:
-            # Debug info
-            print(f"WCS Error: {resp.status_code}, {resp.text[:200]}")
-            raise HTTPException(status_code=502, detail="ČÚZK WCS Error")
-            
+        line_3857 = transform(_project_to_3857, geom)
+
+        # 3. WCS Request - bounding box around the line
+        content = await fetch_wcs_dem_3857(*line_3857.bounds)
+
         # 4. Process GeoTIFF in Memory
-        with io.BytesIO(resp.content) as mem_file:
+        with io.BytesIO(content) as mem_file:
             with rasterio.open(mem_file) as src:
-                # Sample points along the line
+                band = src.read(1)
                 length_m = line_3857.length
-                
-                # Determine number of points based on length (e.g., 1 point per 2 meters)
-                # But cap it to keep graph performant
-                num_points = min(int(length_m / 2), 200) 
-                num_points = max(num_points, 10) # At least 10 points
-                
-                profile_data = []
-                
-                # Interpolate points
-                for i in range(num_points + 1):
-                    fraction = i / num_points
-                    point = line_3857.interpolate(fraction, normalized=True)
-                    
-                    # Sample raster at this point
-                    try:
-                        # index() returns row, col
-                        row, col = src.index(point.x, point.y)
-                        
-                        # Read value safely
-                        window = Window(col, row, 1, 1)
-                        val = src.read(1, window=window)[0][0]
-                        
-                        # Handle NoData (rasterio usually handles this, but explicit check is good)
-                        if val < -1000: # DMR 5G nodata is usually very low negative
-                            val = None
-                        else:
-                            val = float(val)
-                    except Exception:
-                        val = None
-                    
-                    # Get original Lat/Lng for this point
-                    orig_point = geom.interpolate(fraction, normalized=True)
-                        
-                    profile_data.append({
-                        "distance": round(fraction * length_m, 1),
-                        "elevation": round(val, 2) if val is not None else 0,
-                        "lat": orig_point.y,
-                        "lng": orig_point.x
-                    })
-                    
-        return {
-            "length_m": round(length_m, 2),
-            "samples": profile_data
-        }
 
+                # Vzorkování v plném rozlišení rastru (1 bod na pixel)
+                fractions = terrain_profile.profile_fractions(
+                    length_m, step_m=max(abs(src.res[0]), abs(src.res[1])),
+                    max_points=terrain_profile.MAX_FULL_RES_POINTS
+                )
+                with metrics.stage("sample"):
+                    xs, ys = terrain_profile.interpolate_line(line_3857, fractions)
+                    elevations = terrain_profile.sample_elevations(band, src.transform, xs, ys)
+
+        with metrics.stage("profile"):
+            return terrain_profile.build_profile(geom, fractions, elevations, max_points)
+
+    except HTTPException:
+        raise
     except Exception as e:
-        # Log error
-        import traceback
-        traceback.print_exc()
+        logger.exception("Výpočet profilu selhal: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _parse_profile_lines(geojson: dict) -> list[dict]:
+    """
+    Rozloží FeatureCollection nebo MultiLineString na jednotlivé linie.
+
+    Returns:
+        Seznam položek {"index", "id", "properties", "geometry"} nebo {"index", "error"}
+    """
+    items = []
+
+    if geojson.get("type") == "FeatureCollection":
+        for i, feature in enumerate(geojson.get("features") or []):
+            item = {"index": i, "id": feature.get("id"), "properties": feature.get("properties") or {}}
+            try:
+                geom = shape(feature.get("geometry"))
+            except Exception as exc:
+                items.append({**item, "error": f"Neplatná geometrie: {exc}"})
+                continue
+            if geom.geom_type != "LineString" or geom.is_empty:
+                items.append({**item, "error": "Feature musí být LineString"})
+                continue
+            items.append({**item, "geometry": geom})
+        return items
+
+    geom = shape(geojson)
+    if geom.geom_type == "MultiLineString":
+        return [
+            {"index": i, "id": None, "properties": {}, "geometry": part}
+            for i, part in enumerate(geom.geoms)
+        ]
+
+    raise HTTPException(status_code=400, detail="Input must be a FeatureCollection or MultiLineString")
+
+
+@app.post("/api/analyze/profile/batch")
+async def get_terrain_profiles_batch(geojson: dict, max_points: int = PROFILE_MAX_POINTS_QUERY):
+    """
+    Vypočítá výškové profily pro více linií najednou (např. paralelní transekty).
+
+    Vstup je GeoJSON FeatureCollection s LineString prvky nebo MultiLineString.
+    DEM se z WCS stáhne jen jednou pro sjednocený rozsah všech linií, všechny
+    linie se navzorkují jedním vektorizovaným průchodem a výsledky se streamují
+    jako NDJSON – jeden řádek na feature (stejný tvar jako /api/analyze/profile).
+    """
+    try:
+        items = _parse_profile_lines(geojson)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Neplatné GeoJSON: {exc}")
+
+    lines = [item for item in items if "geometry" in item]
+    if not lines:
+        raise HTTPException(status_code=400, detail="Vstup neobsahuje žádnou LineString")
+
+    lines_3857 = [transform(_project_to_3857, item["geometry"]) for item in lines]
+
+    # Sjednocený rozsah všech linií => jeden WCS request
+    bounds = np.array([line.bounds for line in lines_3857])
+    content = await fetch_wcs_dem_3857(
+        bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()
+    )
+
+    try:
+        with io.BytesIO(content) as mem_file:
+            with rasterio.open(mem_file) as src:
+                band = src.read(1)
+                step_m = max(abs(src.res[0]), abs(src.res[1]))
+                fractions = [
+                    terrain_profile.profile_fractions(
+                        line.length, step_m=step_m, max_points=terrain_profile.MAX_FULL_RES_POINTS
+                    )
+                    for line in lines_3857
+                ]
+                with metrics.stage("sample"):
+                    elevations = terrain_profile.sample_lines(band, src.transform, lines_3857, fractions)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Neplatná odpověď WCS: {exc}")
+
+    results = {}
+    for item, fr, elev in zip(lines, fractions, elevations):
+        results[item["index"]] = (fr, elev)
+
+    def iter_profiles():
+        for item in items:
+            header = {"index": item["index"], "id": item["id"], "properties": item["properties"]}
+            if "error" in item:
+                yield json.dumps({**header, "error": item["error"]}) + "\n"
+                continue
+
+            fr, elev = results[item["index"]]
+            with metrics.stage("profile"):
+                profile = terrain_profile.build_profile(item["geometry"], fr, elev, max_points)
+            yield json.dumps({**header, **profile}) + "\n"
+
+    return StreamingResponse(iter_profiles(), media_type="application/x-ndjson")
+
 @app.post("/api/analyze/sky-view-factor")
-async def calculate_sky_view_factor(bbox: BBoxRequest):
+async def calculate_sky_view_factor(
+    bbox: BBoxRequest,
+    directions: int = Query(16, ge=4, le=64, description="Počet směrů horizontového skenu"),
+    radius: float = Query(10.0, gt=0, le=500, description="Poloměr hledání horizontu v metrech"),
+    output: str = Query("png", pattern="^(png|geotiff)$"),
+    clip: float = PNG_CLIP_QUERY,
+    vmin: Optional[float] = PNG_VMIN_QUERY,
+    vmax: Optional[float] = PNG_VMAX_QUERY,
+):
     """
     Vypočítá Sky-View Factor pro daný bounding box.
     Sky-View Factor je hlavní metoda pro vizualizaci terénu v lese (vidí skrz stromy).
+
+    DEM se skládá z lokální ATOM cache (GeoTIFF listy DMR 5G, S-JTSK) a SVF
+    se počítá jen pro potřebné okno + okraj o poloměru horizontu. Výsledek se
+    cachuje po blocích pevné mřížky podle parametrů – opakované a překrývající
+    se dotazy znovu použijí už spočítané bloky.
+
+    PNG se normalizuje percentilovým ořezem (clip), nebo pevným stretchem
+    vmin/vmax – ten zaručí stejný kontrast napříč sousedními výřezy. Použitý
+    rozsah vrací hlavička X-Stretch.
     """
+    stretch = _fixed_stretch(vmin, vmax)
+    if bbox.min_lon >= bbox.max_lon or bbox.min_lat >= bbox.max_lat:
+        raise HTTPException(status_code=400, detail="Neplatný bounding box.")
+
+    left, bottom, right, top = dem_cache.wgs84_bounds_to_sjtsk(
+        bbox.min_lon, bbox.min_lat, bbox.max_lon, bbox.max_lat
+    )
+
     try:
-        # TODO: Stáhnout DMR 5G data pro bbox z ČÚZK Atom služby
-        # Pro MVP použijeme mock data nebo stáhneme skutečná data
-        
-        # Prozatím vracíme mock response
-        return {
-            "status": "processing",
-            "bbox": bbox.dict(),
-            "message": "Sky-View Factor calculation endpoint ready. Data download from ČÚZK needs to be implemented."
+        arr, arr_transform, info = await run_in_threadpool(
+            svf_cache.sky_view_factor_bbox, left, bottom, right, top,
+            n_directions=directions, radius_m=radius,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except LookupError as exc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{exc}. Stáhněte je přes POST /api/atom/download."
+        )
+
+    headers = {
+        "X-SVF-Chunks": str(info["chunks"]),
+        "X-SVF-Chunks-Reused": str(info["reused"]),
+    }
+
+    if output == "geotiff":
+        with rasterio.MemoryFile() as memfile:
+            with memfile.open(
+                driver="GTiff", height=arr.shape[0], width=arr.shape[1], count=1,
+                dtype=rasterio.float32, crs="EPSG:5514", transform=arr_transform,
+                nodata=np.nan, compress="deflate", predictor=3,
+            ) as dst:
+                dst.write(arr, 1)
+            data = memfile.read()
+        return Response(
+            content=data,
+            media_type="image/tiff",
+            headers={**headers, "Content-Disposition": "attachment; filename=sky_view_factor.tif"}
+        )
+
+    with metrics.stage("encode"):
+        image, stretch = raster_render.stretch_array_to_uint8(arr, stretch, clip)
+        buffer = raster_render.png_buffer(image)
+    return StreamingResponse(
+        buffer,
+        media_type="image/png",
+        headers={
+            **headers,
+            "X-Stretch": stretch.header(),
+            "Content-Disposition": "inline; filename=sky_view_factor.png",
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
 
 @app.get("/api/analyze/ndvi")
 async def calculate_ndvi(
@@ -639,7 +1081,24 @@ async def calculate_ndvi(
     """
     Vygeneruje NDVI (Normalized Difference Vegetation Index) mosaiku pro zadaný bounding box
     pomocí Sentinel-2 (Sentinel Hub API). Výstupem je PNG heatmapa.
+
+    Stahování běží v omezeném poolu mimo event loop (SENTINEL_MAX_CONCURRENCY,
+    SENTINEL_TIMEOUT); při plné frontě vrací 503, při vypršení limitu 504.
     """
+    data_bytes = await run_sentinel(
+        fetch_ndvi_png, min_lon, min_lat, max_lon, max_lat, from_date, to_date, resolution
+    )
+
+    return StreamingResponse(
+        io.BytesIO(data_bytes),
+        media_type="image/png",
+        headers={"Content-Disposition": "inline; filename=ndvi.png"}
+    )
+
+
+def fetch_ndvi_png(min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+                   from_date: str = None, to_date: str = None, resolution: int = 40) -> bytes:
+    """Stáhne NDVI PNG ze Sentinel Hub (blokující volání)."""
     ensure_sentinel_config()
 
     try:
@@ -661,29 +1120,154 @@ async def calculate_ndvi(
     request = SentinelHubRequest(
         evalscript=NDVI_EVALSCRIPT,
         input_data=[
-            SentinelHubRequest.InputData(
+            SentinelHubRequest.input_data(
                 data_collection=DataCollection.SENTINEL2_L2A,
                 time_interval=(from_date, to_date),
                 mosaicking_order="mostRecent"
             )
         ],
-        responses=[SentinelHubRequest.OutputResponse("default", MimeType.PNG)],
+        responses=[SentinelHubRequest.output_response("default", MimeType.PNG)],
         bbox=bbox,
         size=dims,
         config=sh_config,
     )
 
     try:
-        data_bytes = request.get_data(decode_data=False)[0]
+        with metrics.stage("upstream"):
+            # decode_data=False vrací DownloadResponse – PNG je v .content
+            data_bytes = request.get_data(decode_data=False)[0].content
     except Exception as exc:
         if "SentinelHub" in str(type(exc).__name__):
             raise HTTPException(status_code=502, detail=f"Sentinel Hub error: {exc}")
         raise HTTPException(status_code=500, detail=str(exc))
 
+    return data_bytes
+
+async def _band_source_call(fn, *args):
+    """Volání zdroje pásem přes Sentinel executor; chyby upstreamu → 502."""
+    try:
+        return await run_sentinel(fn, *args)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Chyba zdroje pásem: {exc}")
+
+
+@app.get("/api/analyze/vegetation")
+async def vegetation_composite(
+    min_lon: float = Query(...),
+    min_lat: float = Query(...),
+    max_lon: float = Query(...),
+    max_lat: float = Query(...),
+    from_date: str = Query(..., description="ISO datum od (YYYY-MM-DD)"),
+    to_date: str = Query(..., description="ISO datum do (YYYY-MM-DD)"),
+    index: str = Query("ndvi", description="ndvi | savi | evi2 | msavi2"),
+    stat: str = Query("median", description="median | mean | min | max | range | std | count | anomaly"),
+    scene_date: Optional[str] = Query(None, description="Scéna pro stat=anomaly (default poslední)"),
+    resolution: float = Query(10.0, ge=10, le=200, description="Velikost pixelu v metrech"),
+    max_cloud_cover: float = Query(60.0, ge=0, le=100),
+    output: str = Query("png", pattern="^(png|geotiff)$"),
+    clip: float = PNG_CLIP_QUERY,
+    vmin: Optional[float] = PNG_VMIN_QUERY,
+    vmax: Optional[float] = PNG_VMAX_QUERY,
+):
+    """
+    Multitemporální vegetační index (Sentinel-2) pro detekci porostových příznaků.
+
+    Surová pásma B04/B08 se pro každou scénu stáhnou jen jednou a cachují
+    (data_cache/sentinel_bands/); index a časová statistika přes všechny
+    scény v období se počítá lokálně. Jiný index či statistika nad stejným
+    výřezem a obdobím už Sentinel Hub nevolá (kromě seznamu scén).
+    """
+    stretch = _fixed_stretch(vmin, vmax)
+    if index not in vegetation.INDICES:
+        raise HTTPException(status_code=400, detail=f"Neznámý index, dostupné: {', '.join(vegetation.INDICES)}")
+    if stat not in vegetation.TEMPORAL_STATS:
+        raise HTTPException(
+            status_code=400, detail=f"Neznámá statistika, dostupné: {', '.join(vegetation.TEMPORAL_STATS)}"
+        )
+    try:
+        grid = vegetation.make_grid(min_lon, min_lat, max_lon, max_lat, resolution)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    source = vegetation.band_source(sh_config)
+    if isinstance(source, vegetation.SentinelHubBandSource):
+        ensure_sentinel_config()
+
+    days = await _band_source_call(source.list_scenes, grid, from_date, to_date, max_cloud_cover)
+    if not days:
+        raise HTTPException(status_code=404, detail="V zadaném období nejsou žádné scény.")
+    limit = vegetation.max_scenes(grid)
+    if len(days) > limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Období obsahuje {len(days)} scén (pro tento výřez max {limit}), zkraťte ho nebo zmenšete výřez."
+        )
+
+    scene_index = None
+    if stat == "anomaly" and scene_date:
+        if scene_date not in days:
+            raise HTTPException(status_code=400, detail=f"Scéna {scene_date} není v období: {', '.join(days)}")
+        scene_index = days.index(scene_date)
+
+    # Cachované scény se čtou z disku, ostatní se stahují přes Sentinel pool – nejvýše
+    # tolik najednou, kolik má pool vláken, jinak by dlouhé období přeplnilo frontu (503)
+    # a zdrželo NDVI dlaždice sdílející pool
+    slots = asyncio.Semaphore(sentinel.executor.max_workers)
+    cached = [False] * len(days)
+    # Index každé scény jde rovnou do stacku a její pásma se hned uvolní (4 B na pixel a scénu)
+    stack = np.empty((len(days), grid.height, grid.width), dtype=np.float32)
+
+    def store_index(i: int, scene) -> None:
+        stack[i] = vegetation.index_stack(*scene, index)
+
+    async def load_scene(i: int, day: str):
+        scene = None
+        if vegetation.is_scene_cached(source, grid, day):
+            scene = await run_in_threadpool(vegetation.read_cached_scene, source, grid, day)
+            cached[i] = scene is not None
+        if scene is None:
+            async with slots:
+                scene = await _band_source_call(vegetation.load_scene, source, grid, day)
+        await run_in_threadpool(store_index, i, scene)
+
+    await asyncio.gather(*(load_scene(i, day) for i, day in enumerate(days)))
+
+    with metrics.stage("compute"):
+        result = await run_in_threadpool(vegetation.temporal_statistic, stack, stat, scene_index)
+    del stack
+    headers = {
+        "X-Scenes": ",".join(days),
+        "X-Scenes-Cached": str(sum(cached)),
+    }
+
+    if output == "geotiff":
+        with metrics.stage("encode"), rasterio.MemoryFile() as memfile:
+            with memfile.open(
+                driver="GTiff", height=grid.height, width=grid.width, count=1,
+                dtype=rasterio.float32, crs="EPSG:4326", transform=grid.transform,
+                nodata=np.nan, compress="deflate", predictor=3,
+            ) as dst:
+                dst.write(result, 1)
+            data = memfile.read()
+        return Response(
+            content=data,
+            media_type="image/tiff",
+            headers={**headers, "Content-Disposition": f"attachment; filename={index}_{stat}.tif"}
+        )
+
+    with metrics.stage("encode"):
+        image, stretch = raster_render.stretch_array_to_uint8(result, stretch, clip)
+        buffer = raster_render.png_buffer(image)
     return StreamingResponse(
-        io.BytesIO(data_bytes),
+        buffer,
         media_type="image/png",
-        headers={"Content-Disposition": "inline; filename=ndvi.png"}
+        headers={
+            **headers,
+            "X-Stretch": stretch.header(),
+            "Content-Disposition": f"inline; filename={index}_{stat}.png",
+        }
     )
 
 @app.get("/api/tools/list")
@@ -705,81 +1289,289 @@ async def sky_view_factor_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def compute_svf_upload(dem_path: Path, svf_path: Path, engine: str, azimuth_interval: float,
+                       altitude: float, radius: float, write_geotiff: bool) -> Optional[np.ndarray]:
+    """
+    Spočítá SVF pro DEM na disku (blokující, volat mimo event loop).
+
+    Returns:
+        SVF pole pro engine=native, None pro WhiteboxTools (výsledek je v svf_path).
+        GeoTIFF v svf_path existuje vždy, když write_geotiff=True.
+    """
+    if engine == "native":
+        try:
+            with rasterio.open(dem_path) as src:
+                dem = src.read(1)
+                dem_profile = src.profile
+                res = abs(src.res[0])
+                dem_nodata = src.nodata
+        except Exception as exc:
+            raise HTTPException(status_code=400, detail=f"Nelze načíst GeoTIFF: {exc}")
+
+        arr = svf.sky_view_factor(
+            dem, res,
+            n_directions=max(4, round(360.0 / azimuth_interval)),
+            radius_m=radius,
+            nodata=dem_nodata,
+        )
+        if write_geotiff:
+            svf.write_geotiff(svf_path, arr, dem_profile)
+        return arr
+
+    try:
+        wbt.sky_view_factor(
+            str(dem_path),
+            str(svf_path),
+            azimuth_interval=azimuth_interval,
+            altitude=altitude,
+            full_mode=True
+        )
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"WhiteboxTools error: {exc}")
+    return None
+
+
+def svf_png_image(arr: Optional[np.ndarray], svf_path: Path,
+                  stretch: Optional[raster_render.Stretch] = None,
+                  clip: float = raster_render.DEFAULT_CLIP_PERCENT):
+    """
+    PNG normalizace SVF (in-place, resp. po oknech z výstupu WhiteboxTools).
+
+    Returns:
+        (uint8 obraz, použitý stretch)
+    """
+    if arr is not None:
+        return raster_render.stretch_array_to_uint8(arr, stretch, clip)
+    with rasterio.open(svf_path) as src:
+        return raster_render.normalize_dataset_to_uint8(src, stretch=stretch, clip_percent=clip)
+
+
 @app.post("/api/analyze/sky-view-factor/upload")
 async def sky_view_factor_from_upload(
     file: UploadFile = File(...),
     azimuth_interval: float = 15.0,
     altitude: float = 45.0,
-    output: str = "png"
+    radius: float = Query(10.0, gt=0, le=500, description="Poloměr hledání horizontu v metrech"),
+    engine: str = Query("native", pattern="^(native|whitebox)$"),
+    output: str = "png",
+    clip: float = PNG_CLIP_QUERY,
+    vmin: Optional[float] = PNG_VMIN_QUERY,
+    vmax: Optional[float] = PNG_VMAX_QUERY,
 ):
     """
     Přijme DEM (GeoTIFF) jako vstup a vrátí Sky-View Factor raster.
     Návratový formát může být PNG (default) nebo GeoTIFF.
+
+    engine=native počítá SVF in-process (vektorizované horizontové skeny,
+    dlaždice s překryvem v process poolu), engine=whitebox volá WhiteboxTools.
+    Počet směrů skenu = 360 / azimuth_interval.
+
+    PNG se normalizuje percentilovým ořezem ze streamovaného histogramu
+    (clip), nebo pevným stretchem vmin/vmax; použitý rozsah vrací X-Stretch.
     """
+    stretch = _fixed_stretch(vmin, vmax)
     if not file.filename.lower().endswith((".tif", ".tiff")):
         raise HTTPException(status_code=400, detail="Očekávám GeoTIFF (.tif/.tiff)")
+    if azimuth_interval <= 0 or azimuth_interval > 90:
+        raise HTTPException(status_code=400, detail="azimuth_interval musí být v rozsahu (0, 90]")
 
-    temp_dir = tempfile.mkdtemp(prefix="svf_")
+    temp_dir = tempfile.mkdtemp(prefix="svf_", dir=SVF_TMP_DIR)
+    streaming_from_temp = False
     try:
         dem_path = Path(temp_dir) / "input_dem.tif"
         svf_path = Path(temp_dir) / "svf.tif"
 
-        # Uložení uploadovaného DEM
-        with dem_path.open("wb") as dst:
-            content = await file.read()
-            dst.write(content)
+        # Uložení uploadovaného DEM po částech (celý soubor se nedrží v paměti)
+        async with aiofiles.open(dem_path, "wb") as dst:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await dst.write(chunk)
 
         # Výpočet Sky-View Factoru
-        try:
-            wbt.sky_view_factor(
-                str(dem_path),
-                str(svf_path),
-                azimuth_interval=azimuth_interval,
-                altitude=altitude,
-                full_mode=True
-            )
-        except Exception as exc:
-            raise HTTPException(status_code=500, detail=f"WhiteboxTools error: {exc}")
+        arr = await run_in_threadpool(
+            compute_svf_upload, dem_path, svf_path, engine,
+            azimuth_interval, altitude, radius, output.lower() == "geotiff"
+        )
 
         if output.lower() == "geotiff":
-            with svf_path.open("rb") as src:
-                data = src.read()
-            return StreamingResponse(
-                io.BytesIO(data),
+            # Streamuje se přímo ze souboru, temp adresář se smaže po odeslání
+            streaming_from_temp = True
+            return FileResponse(
+                svf_path,
                 media_type="image/tiff",
-                headers={"Content-Disposition": "attachment; filename=sky_view_factor.tif"}
+                filename="sky_view_factor.tif",
+                background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
             )
 
-        # Výchozí PNG normalizace
-        with rasterio.open(svf_path) as src:
-            arr = src.read(1)
-
-        arr = np.nan_to_num(arr, nan=0.0)
-        arr_min = float(arr.min())
-        arr_max = float(arr.max())
-        if arr_max - arr_min == 0:
-            norm = np.zeros_like(arr, dtype=np.uint8)
-        else:
-            norm = ((arr - arr_min) / (arr_max - arr_min) * 255).astype(np.uint8)
-
-        image = Image.fromarray(norm)
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-
+        image, stretch = await run_in_threadpool(svf_png_image, arr, svf_path, stretch, clip)
         return StreamingResponse(
-            buffer,
+            raster_render.png_buffer(image),
             media_type="image/png",
-            headers={"Content-Disposition": "attachment; filename=sky_view_factor.png"}
+            headers={
+                "X-Stretch": stretch.header(),
+                "Content-Disposition": "attachment; filename=sky_view_factor.png",
+            }
         )
     finally:
         # Clean up temp directory
-        try:
-            for item in Path(temp_dir).glob("*"):
-                item.unlink(missing_ok=True)
-            Path(temp_dir).rmdir()
-        except Exception:
-            pass
+        if not streaming_from_temp:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _job_response(job: jobs.Job, deduplicated: bool) -> JSONResponse:
+    """Odpověď na odeslání úlohy (202 Accepted) s odkazy pro polling a výsledek."""
+    return JSONResponse(
+        status_code=202,
+        content={
+            **job.to_dict(),
+            "deduplicated": deduplicated,
+            "status_url": f"/api/jobs/{job.job_id}",
+            "result_url": f"/api/jobs/{job.job_id}/result",
+        },
+    )
+
+
+@app.post("/api/jobs/sky-view-factor/upload")
+async def submit_sky_view_factor_job(
+    file: UploadFile = File(...),
+    azimuth_interval: float = 15.0,
+    altitude: float = 45.0,
+    radius: float = Query(10.0, gt=0, le=500, description="Poloměr hledání horizontu v metrech"),
+    engine: str = Query("native", pattern="^(native|whitebox)$"),
+    output: str = Query("png", pattern="^(png|geotiff)$"),
+    clip: float = PNG_CLIP_QUERY,
+    vmin: Optional[float] = PNG_VMIN_QUERY,
+    vmax: Optional[float] = PNG_VMAX_QUERY,
+):
+    """
+    Asynchronní varianta /api/analyze/sky-view-factor/upload.
+
+    Upload se při ukládání hashuje; identický DEM se stejnými parametry
+    dostane stejné ID úlohy a výpočet se nespouští znovu.
+    """
+    stretch = _fixed_stretch(vmin, vmax)
+    if not file.filename.lower().endswith((".tif", ".tiff")):
+        raise HTTPException(status_code=400, detail="Očekávám GeoTIFF (.tif/.tiff)")
+    if azimuth_interval <= 0 or azimuth_interval > 90:
+        raise HTTPException(status_code=400, detail="azimuth_interval musí být v rozsahu (0, 90]")
+
+    jobs.JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    incoming = jobs.JOBS_DIR / f".upload_{uuid.uuid4().hex}.tif"
+    digest = hashlib.sha256()
+    async with aiofiles.open(incoming, "wb") as dst:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            await dst.write(chunk)
+
+    params = {
+        "azimuth_interval": azimuth_interval, "altitude": altitude,
+        "radius": radius, "engine": engine, "output": output,
+        "clip": clip, "vmin": vmin, "vmax": vmax,
+    }
+    job_id = jobs.hash_job("sky-view-factor", params, digest.hexdigest())
+
+    existing = jobs.job_manager.get(job_id)
+    if existing and existing.status != "failed":
+        incoming.unlink(missing_ok=True)
+        return _job_response(existing, True)
+
+    dem_path = jobs.JOBS_DIR / job_id / "input_dem.tif"
+    dem_path.parent.mkdir(parents=True, exist_ok=True)
+    incoming.replace(dem_path)
+
+    async def run(job: jobs.Job) -> jobs.JobResult:
+        svf_path = job.workdir / "sky_view_factor.tif"
+        arr = await run_in_threadpool(
+            compute_svf_upload, dem_path, svf_path, engine,
+            azimuth_interval, altitude, radius, output == "geotiff"
+        )
+        if output == "geotiff":
+            result = jobs.JobResult(path=svf_path, media_type="image/tiff", filename=svf_path.name)
+        else:
+            png_path = job.workdir / "sky_view_factor.png"
+            image, _ = await run_in_threadpool(svf_png_image, arr, svf_path, stretch, clip)
+            png_path.write_bytes(raster_render.png_buffer(image).getvalue())
+            svf_path.unlink(missing_ok=True)
+            result = jobs.JobResult(path=png_path, media_type="image/png", filename=png_path.name)
+        dem_path.unlink(missing_ok=True)
+        return result
+
+    return _job_response(*jobs.job_manager.submit("sky-view-factor", job_id, run))
+
+
+@app.post("/api/jobs/profile")
+async def submit_profile_job(geojson: dict, max_points: int = PROFILE_MAX_POINTS_QUERY):
+    """Asynchronní varianta /api/analyze/profile (deduplikace podle geometrie a parametrů)."""
+    job_id = jobs.hash_job("profile", {"geojson": geojson, "max_points": max_points})
+
+    async def run(job: jobs.Job) -> jobs.JobResult:
+        return jobs.JobResult(data=await compute_terrain_profile(geojson, max_points))
+
+    return _job_response(*jobs.job_manager.submit("profile", job_id, run))
+
+
+@app.post("/api/jobs/ndvi")
+async def submit_ndvi_job(
+    min_lon: float = Query(...),
+    min_lat: float = Query(...),
+    max_lon: float = Query(...),
+    max_lat: float = Query(...),
+    from_date: str = Query(None, description="ISO datum od (YYYY-MM-DD)"),
+    to_date: str = Query(None, description="ISO datum do (YYYY-MM-DD)"),
+    resolution: int = Query(40, description="Velikost pixelu v metrech (default 40 m)"),
+):
+    """Asynchronní varianta /api/analyze/ndvi."""
+    ensure_sentinel_config()
+
+    # Výchozí období se doplní předem, aby se stejné dotazy hashovaly stejně
+    if not to_date:
+        to_date = datetime.utcnow().date().isoformat()
+    if not from_date:
+        from_date = (datetime.utcnow().date() - timedelta(days=60)).isoformat()
+
+    params = {
+        "bbox": [min_lon, min_lat, max_lon, max_lat],
+        "from_date": from_date, "to_date": to_date, "resolution": resolution,
+    }
+    job_id = jobs.hash_job("ndvi", params)
+
+    async def run(job: jobs.Job) -> jobs.JobResult:
+        data_bytes = await run_sentinel(
+            fetch_ndvi_png, min_lon, min_lat, max_lon, max_lat, from_date, to_date, resolution
+        )
+        png_path = job.workdir / "ndvi.png"
+        png_path.write_bytes(data_bytes)
+        return jobs.JobResult(path=png_path, media_type="image/png", filename=png_path.name)
+
+    return _job_response(*jobs.job_manager.submit("ndvi", job_id, run))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Stav úlohy (queued | running | done | failed)."""
+    job = jobs.job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Úloha neexistuje nebo její výsledek již expiroval")
+    return {
+        **job.to_dict(),
+        "result_url": f"/api/jobs/{job.job_id}/result" if job.status == "done" else None,
+    }
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Výsledek hotové úlohy (JSON nebo soubor)."""
+    job = jobs.job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Úloha neexistuje nebo její výsledek již expiroval")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Úloha ještě není hotová (stav: {job.status})")
+
+    result = job.result
+    if result.path is not None:
+        return FileResponse(result.path, media_type=result.media_type, filename=result.filename)
+    return result.data
 
 
 @app.get("/api/debug/tile-coords/{z}/{x}/{y}")
@@ -789,35 +1581,27 @@ async def debug_tile_coords(z: int, x: int, y: int):
     minx_sjtsk, miny_sjtsk = _project_3857_to_sjtsk(minx, miny)
     maxx_sjtsk, maxy_sjtsk = _project_3857_to_sjtsk(maxx, maxy)
     
-    # Zkontroluj, které GeoTIFFy máme v cache
-    geotiff_dir = CACHE_DIR / "geotiff"
-    available_tiffs = []
-    
-    if geotiff_dir.exists():
-        for tif_path in list(geotiff_dir.glob("*.tif"))[:10]:  # Prvních 10
-            try:
-                with rasterio.open(tif_path) as src:
-                    bounds = src.bounds
-                    overlaps = not (
-                        maxx_sjtsk < bounds.left or
-                        minx_sjtsk > bounds.right or
-                        maxy_sjtsk < bounds.bottom or
-                        miny_sjtsk > bounds.top
-                    )
-                    available_tiffs.append({
-                        "file": tif_path.name,
-                        "bounds_sjtsk": {
-                            "left": float(bounds.left),
-                            "bottom": float(bounds.bottom),
-                            "right": float(bounds.right),
-                            "top": float(bounds.top)
-                        },
-                        "crs": str(src.crs),
-                        "overlaps": overlaps
-                    })
-            except:
-                pass
-    
+    # Listy překrývající dlaždici (z katalogu)
+    bbox_sjtsk = (
+        min(minx_sjtsk, maxx_sjtsk), min(miny_sjtsk, maxy_sjtsk),
+        max(minx_sjtsk, maxx_sjtsk), max(miny_sjtsk, maxy_sjtsk),
+    )
+    rows, overlapping = await run_in_threadpool(catalog.query_sheets, bbox_sjtsk, 10)
+    available_tiffs = [
+        {
+            "file": row["filename"],
+            "bounds_sjtsk": {
+                "left": row["min_x"],
+                "bottom": row["min_y"],
+                "right": row["max_x"],
+                "top": row["max_y"]
+            },
+            "crs": row["crs"],
+            "overlaps": True
+        }
+        for row in rows
+    ]
+
     return {
         "tile": {"z": z, "x": x, "y": y},
         "mercator_bbox": {
@@ -829,5 +1613,6 @@ async def debug_tile_coords(z: int, x: int, y: int):
             "maxx": float(maxx_sjtsk), "maxy": float(maxy_sjtsk)
         },
         "available_geotiffs_sample": available_tiffs,
-        "total_geotiffs": len(list(geotiff_dir.glob("*.tif"))) if geotiff_dir.exists() else 0
+        "overlapping_geotiffs": overlapping,
+        "total_geotiffs": await run_in_threadpool(catalog.sheet_count)
     }
@@ -0,0 +1,157 @@
+"""
+MBTiles archiv DEM dlaždic (SQLite, https://github.com/mapbox/mbtiles-spec).
+
+Standardní tabulka `tiles` obsahuje Terrarium PNG (čitelné i běžnými
+MBTiles servery / MapLibre nástroji), vedle ní `tiles_float32` se
+syrovými float32 dlaždicemi pro GPU shader. Řádky jsou podle specifikace
+v TMS schématu (osa y odspodu).
+
+Archiv vytváří scripts/export_mbtiles.py; server z něj odpovídá na
+/api/tiles/dem jedním indexovaným čtením bez převzorkování rastru.
+Archiv je snímek v čase exportu a má přednost před ATOM cache, proto
+obsahuje jen dlaždice plně pokryté daty – okrajové dlaždice se renderují
+z listů a po stažení sousedních listů se doplní. Změněné listy se do
+archivu promítnou až novým exportem.
+"""
+
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from app import metrics
+from app.atom_downloader import CACHE_DIR
+
+DEM_MBTILES_PATH = Path(os.getenv("DEM_MBTILES_PATH", str(CACHE_DIR.parent / "tiles" / "dem.mbtiles")))
+
+TILE_TABLES = {"terrarium": "tiles", "float32": "tiles_float32"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS {table} (
+    zoom_level  INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row    INTEGER NOT NULL,
+    tile_data   BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS {table}_index ON {table} (zoom_level, tile_column, tile_row);
+"""
+
+
+def _tms_row(z: int, y: int) -> int:
+    return (1 << z) - 1 - y
+
+
+class MBTilesWriter:
+    """
+    Zápis archivu do dočasného souboru; na místo se přesune až v close(),
+    takže server nikdy nečte rozepsaný archiv.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path: Path, metadata: Dict[str, str]):
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.tmp_path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        for table in TILE_TABLES.values():
+            self.conn.executescript(_SCHEMA.format(table=table))
+        self.conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", metadata.items())
+        self._pending = 0
+
+    def put(self, fmt: str, z: int, x: int, y: int, data: bytes) -> None:
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {TILE_TABLES[fmt]} VALUES (?, ?, ?, ?)",
+            (z, x, _tms_row(z, y), sqlite3.Binary(data)),
+        )
+        self._pending += 1
+        if self._pending >= self.BATCH_SIZE:
+            self.conn.commit()
+            self._pending = 0
+
+    def set_metadata(self, name: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?)", (name, value))
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        self.conn.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.conn.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "MBTilesWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class MBTilesReader:
+    """
+    Čtení dlaždic z archivu (read-only, jedno spojení na vlákno).
+
+    Po nahrazení souboru novým exportem se spojení otevřou znovu.
+    """
+
+    def __init__(self, path: Path = DEM_MBTILES_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if getattr(self._local, "version", None) != version:
+            if getattr(self._local, "conn", None) is not None:
+                self._local.conn.close()
+            self._local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.version = version
+        return self._local.conn
+
+    def available(self) -> bool:
+        return self.path.exists()
+
+    def mtime(self) -> Optional[float]:
+        """Čas posledního exportu archivu (None = archiv neexistuje)."""
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def get(self, fmt: str, z: int, x: int, y: int) -> Optional[bytes]:
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            with metrics.stage("archive_read"):
+                row = conn.execute(
+                    f"SELECT tile_data FROM {TILE_TABLES[fmt]} "
+                    "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                    (z, x, _tms_row(z, y)),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        metrics.cache_lookup(f"{self.path.name}.{fmt}", "hit" if row else "miss")
+        return bytes(row[0]) if row else None
+
+    def metadata(self) -> Dict[str, str]:
+        conn = self._connection()
+        if conn is None:
+            return {}
+        return dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+
+
+dem_archive = MBTilesReader()
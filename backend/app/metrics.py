@@ -0,0 +1,306 @@
+"""
+Metriky latence a cache ve formátu Prometheus (text exposition 0.0.4).
+
+Bez závislosti na prometheus_client – histogramy a čítače jsou jednoduché
+struktury pod zámkem, /metrics je vyrenderuje do textu. Gauge může místo
+set() dostat callback (set_function), který se vyhodnotí až při renderu –
+tak se exportují délky front, které si vlastní modul drží sám.
+
+Fáze zpracování se měří kontextovým manažerem stage():
+
+    with metrics.stage("reproject"):
+        ...
+
+Během HTTP requestu se doby fází sčítají do trasování requestu (ContextVar,
+sdílené i s run_in_threadpool) a MetricsMiddleware je po odpovědi zapíše do
+histogramu earcheo_stage_seconds s labely route, stage a source (hodnota
+hlavičky X-Data-Source) a zároveň je pošle klientovi v hlavičce Server-Timing.
+Mimo request (joby, skripty) se fáze zapisují hned s route="background".
+Vlastní thread pooly (mimo run_in_threadpool) musí úlohu spustit přes
+contextvars.copy_context().run, jinak fáze z vlákna do trasování nedojdou.
+Dobu změřenou jinak než blokem (čekání ve frontě) zapíše record_stage().
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+# Sekundy; horní buckety pokrývají stahování ATOM listů a výpočty SVF
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Zdroje, které mají na konci název listu (ATOM-Real-DMR5G-PRAH62) – list by
+# v labelu neomezeně zvětšoval počet časových řad
+PER_SHEET_SOURCES = ("ATOM-Real-DMR5G",)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotónní čítač."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Histogram s pevnými buckety (kumulativní podle specifikace Prometheus)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Počty na bucket (nekumulativní, poslední = +Inf), součet
+        self._counts: Dict[LabelValues, list] = {}
+        self._sums: Dict[LabelValues, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self):
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), self._counts[key]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(self._sums[key])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(_Metric):
+    """Okamžitá hodnota – nastavená přes set(), nebo čtená callbackem při renderu."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._functions.pop(key, None)
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values.pop(key, None)
+            self._functions[key] = function
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        with self._lock:
+            function = self._functions.get(key)
+            return float(function()) if function else self._values.get(key, 0.0)
+
+    def _samples(self):
+        values = dict(self._values)
+        values.update((key, function()) for key, function in self._functions.items())
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+REGISTRY: list = []
+
+REQUEST_SECONDS = Histogram(
+    "earcheo_request_seconds", "Celková doba HTTP requestu",
+    ["route", "method", "status", "source"],
+)
+STAGE_SECONDS = Histogram(
+    "earcheo_stage_seconds", "Doba fáze zpracování (součet za request)",
+    ["route", "stage", "source"],
+)
+CACHE_LOOKUPS = Counter(
+    "earcheo_cache_lookups_total", "Dotazy do cache podle výsledku (hit / miss / expired)",
+    ["cache", "result"],
+)
+# Callbacky registrují moduly front (app/sentinel.py, app/jobs.py)
+QUEUE_DEPTH = Gauge("earcheo_queue_depth", "Požadavky čekající ve frontě", ["queue"])
+QUEUE_RUNNING = Gauge("earcheo_queue_running", "Právě zpracovávané požadavky", ["queue"])
+
+
+def render() -> str:
+    """Všechny metriky v textovém formátu Prometheus."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def cache_lookup(cache: str, result: str) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result=result)
+
+
+class RequestTrace:
+    """Součty dob fází jednoho requestu (plní se i z worker vláken)."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        with self._lock:
+            items = list(self.stages.items())
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in items]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("earcheo_request_trace", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Zapíše dobu fáze do trasování requestu (mimo request rovnou do histogramu)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+    else:
+        STAGE_SECONDS.observe(seconds, route="background", stage=name, source="")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Změří dobu bloku jako fázi name (i když blok skončí výjimkou)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def source_label(value: str) -> str:
+    """Hodnota X-Data-Source jako label (bez názvu listu)."""
+    for prefix in PER_SHEET_SOURCES:
+        if value.startswith(prefix):
+            return prefix
+    return value
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: trasování requestu, hlavička Server-Timing a zápis
+    histogramů po dokončení odpovědi.
+
+    U streamovaných odpovědí obsahuje Server-Timing jen fáze do odeslání
+    hlaviček; histogramy dostanou celý request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        status, source = 500, ""
+
+        async def send_with_timing(message):
+            nonlocal status, source
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                for key, value in headers:
+                    if key.lower() == b"x-data-source":
+                        source = source_label(value.decode("latin-1"))
+                timing = trace.server_timing(time.perf_counter() - start)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                # Frontend běží na jiném originu – bez toho prohlížeč Server-Timing neukáže
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, route=route_path, method=scope["method"],
+                                    status=str(status), source=source)
+            for name, seconds in trace.stages.items():
+                STAGE_SECONDS.observe(seconds, route=route_path, stage=name, source=source)
@@ -0,0 +1,107 @@
+"""
+XYZ dlaždice NDVI ze Sentinel-2 (Sentinel Hub Process API).
+
+Časové okno se zarovnává na pevná období (měsíc, čtvrtletí), takže
+dlaždice stejného období jsou sdílené mezi uživateli i při posunu mapy
+a Sentinel Hub se volá jen při miss v diskové cache. Uzavřená období
+se drží po NDVI_TILE_TTL, aktuální (ještě neuzavřené) období se
+obnovuje častěji, protože přibývají nové scény.
+"""
+
+import os
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from sentinelhub import BBox, CRS, DataCollection, MimeType, SentinelHubRequest, SHConfig
+
+from app import metrics
+from app.tile_cache import TileCache
+from app.tile_grid import mercator_tile_bounds
+
+TILE_SIZE = 256
+# Sentinel-2 má 10 m pixel, při menším zoomu by dlaždice pokryla příliš velké území
+MIN_NDVI_ZOOM = 8
+PERIODS = ("month", "quarter")
+
+NDVI_TILE_TTL = float(os.getenv("NDVI_TILE_TTL", str(30 * 24 * 3600)))
+NDVI_OPEN_PERIOD_TTL = float(os.getenv("NDVI_OPEN_PERIOD_TTL", str(6 * 3600)))
+NDVI_TILE_CACHE_MB = float(os.getenv("NDVI_TILE_CACHE_MB", "512"))
+
+# Stejná barevná škála jako NDVI_EVALSCRIPT v main.py, navíc alfa z dataMask
+NDVI_TILE_EVALSCRIPT = """
+//VERSION=3
+function setup() {
+  return {
+    input: [{bands: ["B08","B04","dataMask"]}],
+    output: {bands: 4, sampleType: "UINT8"}
+  };
+}
+function evaluatePixel(sample) {
+  let ndvi = (sample.B08 - sample.B04) / (sample.B08 + sample.B04);
+  let normalized = (ndvi + 1.0) / 2.0;
+  return [
+    255 * normalized,
+    ndvi > 0 ? 255 * normalized : 0,
+    ndvi < 0 ? 255 * Math.abs(ndvi) : 0,
+    255 * sample.dataMask
+  ];
+}
+"""
+
+ndvi_tile_cache = TileCache(
+    "ndvi", "png", ttl=NDVI_TILE_TTL, max_bytes=int(NDVI_TILE_CACHE_MB * 1024 * 1024)
+)
+
+
+def snap_period(day: Optional[date], period: str = "month") -> Tuple[date, date]:
+    """
+    Zarovná datum na pevné období.
+
+    Returns:
+        (první den, poslední den) období obsahujícího day (default dnes)
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Neznámé období '{period}', dostupné: {', '.join(PERIODS)}")
+    day = day or date.today()
+
+    if period == "month":
+        start = day.replace(day=1)
+        months = 1
+    else:
+        start = day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+        months = 3
+
+    month_index = start.month - 1 + months
+    next_start = date(start.year + month_index // 12, month_index % 12 + 1, 1)
+    return start, next_start - timedelta(days=1)
+
+
+def period_key(period: str, start: date) -> str:
+    """Podadresář cache pro dané období, např. month-2025-06-01."""
+    return f"{period}-{start.isoformat()}"
+
+
+def period_max_age(end: date) -> Optional[float]:
+    """Kratší TTL pro období, které ještě neskončilo (None = výchozí TTL cache)."""
+    return NDVI_OPEN_PERIOD_TTL if end >= date.today() else None
+
+
+def fetch_ndvi_tile(z: int, x: int, y: int, start: date, end: date, config: SHConfig) -> bytes:
+    """Stáhne RGBA PNG dlaždici NDVI pro dané období (blokující volání)."""
+    minx, miny, maxx, maxy = mercator_tile_bounds(x, y, z)
+    request = SentinelHubRequest(
+        evalscript=NDVI_TILE_EVALSCRIPT,
+        input_data=[
+            SentinelHubRequest.input_data(
+                data_collection=DataCollection.SENTINEL2_L2A,
+                time_interval=(start.isoformat(), end.isoformat()),
+                mosaicking_order="mostRecent",
+            )
+        ],
+        responses=[SentinelHubRequest.output_response("default", MimeType.PNG)],
+        bbox=BBox(bbox=[minx, miny, maxx, maxy], crs=CRS.POP_WEB),
+        size=(TILE_SIZE, TILE_SIZE),
+        config=config,
+    )
+    with metrics.stage("upstream"):
+        return request.get_data(decode_data=False)[0].content
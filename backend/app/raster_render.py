@@ -0,0 +1,206 @@
+"""
+Převod analytických rastrů (SVF, ...) na 8bit obrázky.
+
+Normalizace pracuje in-place nad polem, které už volající vlastní,
+nebo po blocích (oknech) přímo z datasetu – velké rastry tak nevytváří
+několik float kopií o velikosti celého rastru.
+
+Rozsah stretche se určuje percentilovým ořezem ze streamovaného
+histogramu (plněného po oknech), takže jednotlivé odlehlé pixely
+nezničí kontrast a paměť zůstává omezená. Alternativně lze předat
+pevný stretch (Stretch), který se použije shodně pro všechny dlaždice.
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HISTOGRAM_BINS = 16384
+# Výchozí ořez (procenta na každé straně rozdělení)
+DEFAULT_CLIP_PERCENT = 1.0
+# Počet řádků jednoho bloku při průchodu polem v paměti
+ARRAY_BLOCK_ROWS = 512
+
+
+@dataclass(frozen=True)
+class Stretch:
+    """Lineární stretch hodnot vmin..vmax na 0..255."""
+    vmin: float
+    vmax: float
+
+    def header(self) -> str:
+        return f"{self.vmin:.6g},{self.vmax:.6g}"
+
+
+class StreamingHistogram:
+    """
+    Histogram s pevným rozsahem plněný postupně po blocích.
+
+    NaN a hodnoty mimo rozsah se ignorují. Percentily se dopočítávají
+    lineární interpolací uvnitř binu (přesnost = šířka binu).
+    """
+
+    def __init__(self, lo: float, hi: float, bins: int = HISTOGRAM_BINS):
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def update(self, block: np.ndarray) -> None:
+        values = block[np.isfinite(block)]
+        if values.size == 0 or self.hi <= self.lo:
+            return
+        idx = ((values - self.lo) * (self.bins / (self.hi - self.lo))).astype(np.int64)
+        np.clip(idx, 0, self.bins - 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.bins)
+
+    def percentile(self, q: float) -> float:
+        """Hodnota q-tého percentilu (0..100); 0 a 100 vrací hranice rozsahu."""
+        total = self.total
+        if total == 0 or self.hi <= self.lo:
+            return self.lo
+        if q <= 0:
+            return self.lo
+        if q >= 100:
+            return self.hi
+
+        cdf = np.cumsum(self.counts)
+        target = q / 100.0 * total
+        i = int(np.searchsorted(cdf, target, side="left"))
+        below = cdf[i - 1] if i > 0 else 0
+        frac = (target - below) / self.counts[i]
+        return float(self.lo + (i + frac) * (self.hi - self.lo) / self.bins)
+
+    def stretch(self, clip_percent: float = DEFAULT_CLIP_PERCENT) -> Stretch:
+        return Stretch(self.percentile(clip_percent), self.percentile(100.0 - clip_percent))
+
+
+def iter_array_blocks(arr: np.ndarray, rows: int = ARRAY_BLOCK_ROWS) -> Iterator[np.ndarray]:
+    """Pohledy (bez kopie) na pásy řádků 2D pole."""
+    for start in range(0, arr.shape[0], rows):
+        yield arr[start:start + rows]
+
+
+def _iter_dataset_blocks(src, band: int) -> Iterator[Tuple[object, np.ndarray]]:
+    """(okno, float32 blok) pásma; NoData datasetu (např. -32768 z WhiteboxTools) → NaN."""
+    nodata = src.nodatavals[band - 1]
+    for _, window in src.block_windows(band):
+        block = src.read(band, window=window).astype(np.float32, copy=False)
+        if nodata is not None and not np.isnan(nodata):
+            block[block == np.float32(nodata)] = np.nan
+        yield window, block
+
+
+def _blocks_min_max(blocks) -> Tuple[float, float]:
+    vmin, vmax = np.inf, -np.inf
+    for block in blocks:
+        values = block[np.isfinite(block)]
+        if values.size:
+            vmin = min(vmin, float(values.min()))
+            vmax = max(vmax, float(values.max()))
+    if vmin > vmax:
+        return 0.0, 0.0
+    return vmin, vmax
+
+
+def array_stretch(arr: np.ndarray, clip_percent: float = DEFAULT_CLIP_PERCENT) -> Stretch:
+    """Percentilový stretch pole v paměti (NaN se ignorují), bez kopie celého pole."""
+    lo, hi = _blocks_min_max(iter_array_blocks(arr))
+    hist = StreamingHistogram(lo, hi)
+    for block in iter_array_blocks(arr):
+        hist.update(block)
+    return hist.stretch(clip_percent)
+
+
+def dataset_min_max(src, band: int = 1) -> Tuple[float, float]:
+    """Globální min/max pásma spočítané po blocích datasetu (NaN a NoData se ignorují)."""
+    return _blocks_min_max(block for _, block in _iter_dataset_blocks(src, band))
+
+
+def dataset_stretch(src, band: int = 1, clip_percent: float = DEFAULT_CLIP_PERCENT) -> Stretch:
+    """
+    Percentilový stretch pásma datasetu.
+
+    Dva průchody přes bloky (rozsah histogramu, pak plnění) – v paměti je
+    vždy jen jeden blok a histogram.
+    """
+    lo, hi = dataset_min_max(src, band)
+    hist = StreamingHistogram(lo, hi)
+    for _, block in _iter_dataset_blocks(src, band):
+        hist.update(block)
+    return hist.stretch(clip_percent)
+
+
+def normalize_to_uint8(arr: np.ndarray, vmin: Optional[float] = None,
+                       vmax: Optional[float] = None) -> np.ndarray:
+    """
+    Lineárně roztáhne float pole do 0–255.
+
+    POZOR: pole se upravuje in-place (NaN → 0, posun a škálování);
+    jedinou novou alokací je výsledné uint8 pole.
+    """
+    np.nan_to_num(arr, copy=False, nan=0.0)
+    if vmin is None:
+        vmin = float(arr.min())
+    if vmax is None:
+        vmax = float(arr.max())
+
+    if vmax - vmin == 0:
+        return np.zeros(arr.shape, dtype=np.uint8)
+
+    arr -= vmin
+    arr *= 255.0 / (vmax - vmin)
+    np.clip(arr, 0, 255, out=arr)
+    return arr.astype(np.uint8)
+
+
+def stretch_array_to_uint8(arr: np.ndarray, stretch: Optional[Stretch] = None,
+                           clip_percent: float = DEFAULT_CLIP_PERCENT) -> Tuple[np.ndarray, Stretch]:
+    """
+    Normalizuje pole (in-place) pevným, nebo percentilovým stretchem.
+
+    Returns:
+        (uint8 obraz, použitý stretch)
+    """
+    if stretch is None:
+        stretch = array_stretch(arr, clip_percent)
+    return normalize_to_uint8(arr, stretch.vmin, stretch.vmax), stretch
+
+
+def normalize_dataset_to_uint8(src, band: int = 1, stretch: Optional[Stretch] = None,
+                               clip_percent: float = DEFAULT_CLIP_PERCENT) -> Tuple[np.ndarray, Stretch]:
+    """
+    Normalizuje pásmo datasetu do uint8 po oknech.
+
+    Bez pevného stretche se rozsah určí z histogramu (viz dataset_stretch);
+    v paměti je najednou jen uint8 výstup a jeden blok vstupu. NoData
+    datasetu se zobrazí jako 0 (stejně jako NaN).
+
+    Returns:
+        (uint8 obraz, použitý stretch)
+    """
+    if stretch is None:
+        stretch = dataset_stretch(src, band, clip_percent)
+    out = np.zeros((src.height, src.width), dtype=np.uint8)
+    if stretch.vmax - stretch.vmin == 0:
+        return out, stretch
+
+    for window, block in _iter_dataset_blocks(src, band):
+        rows, cols = window.toslices()
+        out[rows, cols] = normalize_to_uint8(block, stretch.vmin, stretch.vmax)
+    return out, stretch
+
+
+def png_buffer(image: np.ndarray) -> io.BytesIO:
+    """Zakóduje uint8 pole (grayscale) do PNG bufferu připraveného ke streamování."""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
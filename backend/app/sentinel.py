@@ -0,0 +1,149 @@
+"""
+Spouštění blokujících volání Sentinel Hub mimo event loop.
+
+SentinelHubRequest.get_data je synchronní a trvá jednotky sekund – volaný
+přímo v async endpointu by zablokoval celý worker (včetně servírování DEM
+dlaždic). Volání proto běží ve vlastním thread poolu s omezeným počtem
+souběžných požadavků, omezenou frontou a časovým limitem.
+
+Stav fronty (čekající / běžící / odmítnuté / timeouty) vrací stats()
+a je vidět v /health. Volání běží v kontextu requestu – čekání ve frontě
+se zapíše jako fáze "queue" a fáze měřené uvnitř volání (upstream) se
+dostanou do trasování requestu (app/metrics.py).
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app import metrics
+
+# Max. počet souběžných requestů na Sentinel Hub
+SENTINEL_MAX_CONCURRENCY = int(os.getenv("SENTINEL_MAX_CONCURRENCY", "4"))
+# Max. počet požadavků čekajících ve frontě, další se odmítnou (503)
+SENTINEL_MAX_QUEUE = int(os.getenv("SENTINEL_MAX_QUEUE", "32"))
+# Celkový limit na jeden požadavek včetně čekání ve frontě (s)
+SENTINEL_TIMEOUT = float(os.getenv("SENTINEL_TIMEOUT", "90"))
+# Timeout jednoho HTTP volání a počet pokusů uvnitř sentinelhub klienta
+SENTINEL_HTTP_TIMEOUT = float(os.getenv("SENTINEL_HTTP_TIMEOUT", "30"))
+SENTINEL_HTTP_ATTEMPTS = int(os.getenv("SENTINEL_HTTP_ATTEMPTS", "2"))
+
+
+class SentinelBusyError(RuntimeError):
+    """Fronta požadavků na Sentinel Hub je plná."""
+
+
+class SentinelTimeoutError(TimeoutError):
+    """Požadavek na Sentinel Hub nestihl doběhnout v časovém limitu."""
+
+
+def configure_timeouts(config) -> None:
+    """
+    Nastaví timeouty HTTP klienta sentinelhub (SHConfig).
+
+    asyncio.wait_for vlákno nepřeruší – bez HTTP timeoutu by zaseknutý
+    request držel slot v poolu i po vypršení limitu endpointu.
+    """
+    config.download_timeout_seconds = SENTINEL_HTTP_TIMEOUT
+    config.max_download_attempts = SENTINEL_HTTP_ATTEMPTS
+
+
+class SentinelExecutor:
+    """Thread pool s omezenou frontou a počítadly pro blokující volání Sentinel Hub."""
+
+    def __init__(self, max_workers: int = SENTINEL_MAX_CONCURRENCY,
+                 max_queue: int = SENTINEL_MAX_QUEUE, timeout: float = SENTINEL_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="sentinel"
+            )
+        return self._executor
+
+    def _call(self, fn: Callable, args: tuple, kwargs: dict, submitted: float) -> Any:
+        metrics.record_stage("queue", time.perf_counter() - submitted)
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def _on_done(self, future: Future) -> None:
+        # Zrušeno ještě ve frontě (timeout) – _call se nespustil
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Spustí blokující fn(*args, **kwargs) v poolu a počká na výsledek.
+
+        Raises:
+            SentinelBusyError: fronta je plná
+            SentinelTimeoutError: výsledek nedorazil do timeout sekund
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SentinelBusyError(
+                    f"Fronta Sentinel Hub požadavků je plná ({self.queued}/{self.max_queue})"
+                )
+            self.queued += 1
+
+        # Kopie kontextu → fáze měřené ve vlákně patří do trasování requestu
+        context = contextvars.copy_context()
+        future = self._get_executor().submit(
+            context.run, self._call, fn, args, kwargs, time.perf_counter()
+        )
+        future.add_done_callback(self._on_done)
+
+        limit = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), limit)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise SentinelTimeoutError(f"Sentinel Hub neodpověděl do {limit:g} s")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "max_concurrency": self.max_workers,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+executor = SentinelExecutor()
+metrics.QUEUE_DEPTH.set_function(lambda: executor.queued, queue="sentinel")
+metrics.QUEUE_RUNNING.set_function(lambda: executor.running, queue="sentinel")
@@ -0,0 +1,231 @@
+"""
+Nativní výpočet Sky-View Factoru (SVF) a openness nad DEM.
+
+SVF podle Zakšek et al. (2011): pro každý pixel se v n směrech hledá
+maximální výškový úhel horizontu γ_i do vzdálenosti radius a
+
+    SVF = 1 - (1/n) * Σ sin(γ_i)
+
+Horizontové skeny jsou vektorizované – pro každý krok ve směru se
+posune celé pole najednou. Velké rastry se zpracují po dlaždicích
+s překryvem (halo = radius) paralelně v process poolu, takže výsledek
+je shodný s výpočtem nad celým rastrem a nemá švy.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import rasterio
+
+# Velikost jádra dlaždice (bez halo) pro paralelní zpracování
+SVF_TILE_SIZE = int(os.getenv("SVF_TILE_SIZE", "512"))
+# Počet procesů (default = počet jader)
+SVF_WORKERS = int(os.getenv("SVF_WORKERS", str(os.cpu_count() or 1)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Lazy inicializace sdíleného process poolu."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=SVF_WORKERS)
+    return _pool
+
+
+def horizon_offsets(n_directions: int, radius_px: int) -> List[List[Tuple[int, int, float]]]:
+    """
+    Vrátí pro každý směr seznam pixelových posunů (drow, dcol, vzdálenost v px).
+
+    Směr 0 je sever, úhly rostou po směru hodinových ručiček.
+    Duplicitní posuny (zaokrouhlení na stejný pixel) se vynechají.
+    """
+    directions = []
+    for i in range(n_directions):
+        azimuth = 2.0 * math.pi * i / n_directions
+        sin_a, cos_a = math.sin(azimuth), math.cos(azimuth)
+        steps = []
+        seen = set()
+        for step in range(1, radius_px + 1):
+            dcol = int(round(step * sin_a))
+            drow = int(round(-step * cos_a))
+            if (drow, dcol) in seen or (drow, dcol) == (0, 0):
+                continue
+            seen.add((drow, dcol))
+            steps.append((drow, dcol, math.hypot(drow, dcol)))
+        directions.append(steps)
+    return directions
+
+
+def _iter_max_tangents(padded: np.ndarray, halo: int, res: float,
+                       offsets: List[List[Tuple[int, int, float]]], floor: float):
+    """
+    Pro každý směr vrací pole maximálního tangens výškového úhlu horizontu.
+
+    floor je počáteční hodnota maxima (0 = horizont nejníže v rovině, -inf =
+    i záporné úhly). Vrácené pole je sdílený buffer – platí jen do další iterace.
+    """
+    height = padded.shape[0] - 2 * halo
+    width = padded.shape[1] - 2 * halo
+    center = padded[halo:halo + height, halo:halo + width]
+
+    max_tan = np.empty((height, width), dtype=np.float32)
+    tmp = np.empty((height, width), dtype=np.float32)
+
+    with np.errstate(invalid="ignore"):
+        for steps in offsets:
+            max_tan.fill(floor)
+            for drow, dcol, dist_px in steps:
+                shifted = padded[halo + drow:halo + drow + height, halo + dcol:halo + dcol + width]
+                np.subtract(shifted, center, out=tmp)
+                tmp /= dist_px * res
+                np.fmax(max_tan, tmp, out=max_tan)
+            yield max_tan
+
+
+def _svf_block(padded: np.ndarray, halo: int, res: float,
+               offsets: List[List[Tuple[int, int, float]]]) -> np.ndarray:
+    """
+    Spočítá SVF pro jádro bloku (padded bez okraje šířky halo).
+
+    Neplatné pixely jsou v padded jako -inf – do horizontu nepřispívají,
+    a ve výsledku mají hodnotu NaN.
+    """
+    center = padded[halo:padded.shape[0] - halo, halo:padded.shape[1] - halo]
+    sin_sum = np.zeros(center.shape, dtype=np.float32)
+    tmp = np.empty(center.shape, dtype=np.float32)
+
+    with np.errstate(invalid="ignore"):
+        for max_tan in _iter_max_tangents(padded, halo, res, offsets, floor=0.0):
+            # sin(atan(t)) = t / sqrt(1 + t^2)
+            np.multiply(max_tan, max_tan, out=tmp)
+            tmp += 1.0
+            np.sqrt(tmp, out=tmp)
+            np.divide(max_tan, tmp, out=tmp)
+            sin_sum += tmp
+
+    svf = 1.0 - sin_sum / len(offsets)
+    svf[~np.isfinite(center)] = np.nan
+    return svf
+
+
+def _openness_block(padded: np.ndarray, halo: int, res: float,
+                    offsets: List[List[Tuple[int, int, float]]]) -> np.ndarray:
+    """
+    Pozitivní openness (Yokoyama et al. 2002) ve stupních pro jádro bloku.
+
+    Průměr zenitových úhlů (90° - výškový úhel horizontu) přes všechny směry.
+    """
+    center = padded[halo:padded.shape[0] - halo, halo:padded.shape[1] - halo]
+    zenith_sum = np.zeros(center.shape, dtype=np.float32)
+
+    with np.errstate(invalid="ignore"):
+        for max_tan in _iter_max_tangents(padded, halo, res, offsets, floor=-np.inf):
+            zenith_sum += 90.0 - np.degrees(np.arctan(max_tan))
+
+    openness = zenith_sum / len(offsets)
+    openness[~np.isfinite(center) | ~np.isfinite(openness)] = np.nan
+    return openness
+
+
+_BLOCK_FUNCTIONS = {"svf": _svf_block, "openness": _openness_block}
+
+
+def _block_task(args) -> np.ndarray:
+    """Wrapper pro ProcessPoolExecutor.map (jeden argument)."""
+    kind, block_args = args
+    return _BLOCK_FUNCTIONS[kind](*block_args)
+
+
+def _horizon_tiled(kind: str, dem: np.ndarray, res: float, n_directions: int,
+                   radius_m: float, nodata: Optional[float], tile_size: Optional[int],
+                   parallel: bool) -> np.ndarray:
+    """Společné dlaždicové zpracování horizontových metod (SVF, openness)."""
+    if n_directions < 1:
+        raise ValueError("n_directions must be positive")
+
+    radius_px = max(1, int(round(radius_m / res)))
+    offsets = horizon_offsets(n_directions, radius_px)
+    tile_size = tile_size or SVF_TILE_SIZE
+
+    data = dem.astype(np.float32, copy=True)
+    if nodata is not None:
+        data[data == nodata] = -np.inf
+    data[np.isnan(data)] = -np.inf
+    padded = np.pad(data, radius_px, mode="constant", constant_values=-np.inf)
+    del data
+
+    height, width = dem.shape
+    tiles = [
+        (row, col, min(tile_size, height - row), min(tile_size, width - col))
+        for row in range(0, height, tile_size)
+        for col in range(0, width, tile_size)
+    ]
+
+    tasks = [
+        (kind, (padded[row:row + h + 2 * radius_px, col:col + w + 2 * radius_px], radius_px, res, offsets))
+        for row, col, h, w in tiles
+    ]
+
+    # Malé rastry (jedna dlaždice) počítáme bez režie process poolu
+    if len(tiles) > 1 and parallel and SVF_WORKERS > 1:
+        blocks = _get_pool().map(_block_task, tasks)
+    else:
+        blocks = map(_block_task, tasks)
+
+    result = np.empty((height, width), dtype=np.float32)
+    for (row, col, h, w), block in zip(tiles, blocks):
+        result[row:row + h, col:col + w] = block
+    return result
+
+
+def sky_view_factor(dem: np.ndarray, res: float, n_directions: int = 16,
+                    radius_m: float = 10.0, nodata: Optional[float] = None,
+                    tile_size: Optional[int] = None, parallel: bool = True) -> np.ndarray:
+    """
+    Vypočítá Sky-View Factor pro DEM.
+
+    Args:
+        dem: 2D pole výšek
+        res: Velikost pixelu v metrech
+        n_directions: Počet směrů horizontového skenu
+        radius_m: Poloměr hledání horizontu v metrech
+        nodata: Hodnota NoData ve vstupu (NaN je vždy neplatné)
+        tile_size: Velikost jádra dlaždice (default SVF_TILE_SIZE)
+        parallel: Zpracovat dlaždice v process poolu
+
+    Returns:
+        float32 pole SVF (0..1), NoData jako NaN
+    """
+    return _horizon_tiled("svf", dem, res, n_directions, radius_m, nodata, tile_size, parallel)
+
+
+def positive_openness(dem: np.ndarray, res: float, n_directions: int = 16,
+                      radius_m: float = 10.0, nodata: Optional[float] = None,
+                      tile_size: Optional[int] = None, parallel: bool = True) -> np.ndarray:
+    """
+    Vypočítá pozitivní openness (stupně) – parametry stejné jako sky_view_factor.
+
+    Returns:
+        float32 pole openness (0..180°), NoData jako NaN
+    """
+    return _horizon_tiled("openness", dem, res, n_directions, radius_m, nodata, tile_size, parallel)
+
+
+def write_geotiff(path: Path, arr: np.ndarray, profile: dict) -> Path:
+    """Zapíše float32 výsledek analýzy se stejnou georeferencí jako vstupní DEM."""
+    out_profile = profile.copy()
+    out_profile.update(
+        driver="GTiff", dtype=rasterio.float32, count=1,
+        nodata=np.nan, compress="deflate", predictor=3,
+    )
+    out_profile.pop("blockxsize", None)
+    out_profile.pop("blockysize", None)
+    out_profile.pop("tiled", None)
+    with rasterio.open(path, "w", **out_profile) as dst:
+        dst.write(arr.astype(np.float32, copy=False), 1)
+    return path
@@ -0,0 +1,213 @@
+"""
+Sky-View Factor nad lokální cache DMR 5G s cachováním výsledků.
+
+SVF se počítá a ukládá po čtvercových blocích (chunk) pevné mřížky
+v S-JTSK. Klíčem bloku je jeho index v mřížce a parametry výpočtu
+(rozlišení, počet směrů, poloměr). Dotaz na libovolný bbox se složí
+z bloků – překrývající se a opakované dotazy tak znovu použijí už
+spočítané bloky a dopočítají jen chybějící.
+
+Chybějící bloky se počítají najednou nad jedním DEM oknem rozšířeným
+o poloměr horizontu, takže na hranicích bloků nevznikají švy. Souběžné
+výpočty se zamykají po blocích – čeká se jen na request, který počítá
+některý ze stejných bloků se stejnými parametry.
+
+Bloky zabírají místo v data_cache/dmr5g a maže je rozpočet cache
+(app/cache_manager.py).
+"""
+
+import math
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from rasterio.transform import from_origin
+
+from app import dem_cache, metrics, svf
+from app.atom_downloader import CACHE_DIR
+
+SVF_CACHE_DIR = CACHE_DIR / "svf"
+
+# Velikost bloku v pixelech (při 5 m = 1,28 km)
+CHUNK_SIZE = 256
+# Maximální velikost dotazu v pixelech (na stranu)
+MAX_QUERY_PX = 4096
+
+# Zámky bloků: (klíč parametrů, col, row) → [zámek, počet čekajících/držitelů]
+_chunk_locks: Dict[Tuple[str, int, int], list] = {}
+_chunk_locks_guard = threading.Lock()
+
+
+def params_key(res: float, n_directions: int, radius_m: float) -> str:
+    """Název adresáře s bloky pro danou kombinaci parametrů."""
+    return f"r{res:g}_d{n_directions}_R{radius_m:g}"
+
+
+def chunk_range(left: float, bottom: float, right: float, top: float,
+                res: float) -> Tuple[int, int, int, int]:
+    """Rozsah indexů bloků (col_min, row_min, col_max, row_max) pokrývající bbox."""
+    size_m = CHUNK_SIZE * res
+    return (
+        math.floor(left / size_m), math.floor(-top / size_m),
+        math.ceil(right / size_m) - 1, math.ceil(-bottom / size_m) - 1,
+    )
+
+
+def chunk_bounds(col: int, row: int, res: float) -> Tuple[float, float, float, float]:
+    """Bounds bloku v S-JTSK (left, bottom, right, top). Řádky rostou směrem na jih."""
+    size_m = CHUNK_SIZE * res
+    left = col * size_m
+    top = -row * size_m
+    return left, top - size_m, left + size_m, top
+
+
+def _chunk_path(key: str, col: int, row: int) -> Path:
+    return SVF_CACHE_DIR / key / f"{col}_{row}.npy"
+
+
+@contextmanager
+def _locked_chunks(key: str, chunks: List[Tuple[int, int]]) -> Iterator[None]:
+    """
+    Zamkne bloky pro výpočet.
+
+    Zámky se berou v seřazeném pořadí (bez deadlocku mezi překrývajícími
+    se dotazy) a po uvolnění posledním uživatelem se ze slovníku odstraní.
+    """
+    ids = sorted((key, col, row) for col, row in chunks)
+    with _chunk_locks_guard:
+        entries = []
+        for chunk_id in ids:
+            entry = _chunk_locks.setdefault(chunk_id, [threading.Lock(), 0])
+            entry[1] += 1
+            entries.append(entry)
+
+    acquired = []
+    try:
+        for entry in entries:
+            entry[0].acquire()
+            acquired.append(entry)
+        yield
+    finally:
+        for entry in reversed(acquired):
+            entry[0].release()
+        with _chunk_locks_guard:
+            for chunk_id, entry in zip(ids, entries):
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del _chunk_locks[chunk_id]
+
+
+def _load_valid_chunks(key: str, chunks: List[Tuple[int, int]],
+                       newest_sheet_mtime: float) -> Dict[Tuple[int, int], np.ndarray]:
+    """Načte bloky z disku; bloky starší než nejnovější list jsou neplatné."""
+    loaded = {}
+    for col, row in chunks:
+        path = _chunk_path(key, col, row)
+        try:
+            if path.stat().st_mtime < newest_sheet_mtime:
+                continue
+            loaded[(col, row)] = np.load(path)
+        except (OSError, ValueError):
+            continue
+    return loaded
+
+
+def _compute_chunks(key: str, missing: List[Tuple[int, int]], res: float,
+                    n_directions: int, radius_m: float,
+                    sheets: List[Path]) -> Dict[Tuple[int, int], np.ndarray]:
+    """Spočítá chybějící bloky jedním výpočtem nad společným oknem + margin."""
+    cols = [c for c, _ in missing]
+    rows = [r for _, r in missing]
+    left, _, _, top = chunk_bounds(min(cols), min(rows), res)
+    _, bottom, right, _ = chunk_bounds(max(cols), max(rows), res)
+
+    margin_px = max(1, int(math.ceil(radius_m / res)))
+    margin = margin_px * res
+    dem, _ = dem_cache.read_dem_window(
+        left - margin, bottom - margin, right + margin, top + margin, res, sheets
+    )
+    with metrics.stage("svf"):
+        result = svf.sky_view_factor(dem, res, n_directions=n_directions, radius_m=radius_m)
+    result = result[margin_px:-margin_px, margin_px:-margin_px]
+
+    out_dir = SVF_CACHE_DIR / key
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    computed = {}
+    for col, row in missing:
+        r0 = (row - min(rows)) * CHUNK_SIZE
+        c0 = (col - min(cols)) * CHUNK_SIZE
+        block = np.ascontiguousarray(result[r0:r0 + CHUNK_SIZE, c0:c0 + CHUNK_SIZE])
+        # Zápis přes dočasný soubor, aby souběžný čtenář neviděl poloviční blok
+        tmp_path = out_dir / f".{col}_{row}.tmp.npy"
+        np.save(tmp_path, block)
+        tmp_path.replace(_chunk_path(key, col, row))
+        computed[(col, row)] = block
+    return computed
+
+
+def sky_view_factor_bbox(left: float, bottom: float, right: float, top: float,
+                         res: float = dem_cache.DEFAULT_RESOLUTION, n_directions: int = 16,
+                         radius_m: float = 10.0) -> Tuple[np.ndarray, "rasterio.Affine", dict]:
+    """
+    Vrátí SVF pro rozsah v S-JTSK složený z cachovaných bloků.
+
+    Returns:
+        (float32 pole SVF, affine transformace, info o cache)
+
+    Raises:
+        ValueError: pokud je rozsah příliš velký
+        LookupError: pokud pro rozsah nejsou v cache žádná DMR 5G data
+    """
+    if (right - left) / res > MAX_QUERY_PX or (top - bottom) / res > MAX_QUERY_PX:
+        raise ValueError(f"Oblast je příliš velká (max {MAX_QUERY_PX} px na stranu při {res:g} m)")
+
+    margin = math.ceil(radius_m / res) * res
+    sheets = dem_cache.find_sheets(left - margin, bottom - margin, right + margin, top + margin)
+    if not sheets:
+        raise LookupError("Pro zadanou oblast nejsou v cache žádná DMR 5G data")
+    newest_sheet_mtime = 0.0
+    for path in sheets:
+        try:
+            newest_sheet_mtime = max(newest_sheet_mtime, path.stat().st_mtime)
+        except OSError:
+            # List smazaný mimo proces – read_dem_window ho odebere z katalogu
+            continue
+
+    key = params_key(res, n_directions, radius_m)
+    col_min, row_min, col_max, row_max = chunk_range(left, bottom, right, top, res)
+    chunks = [(c, r) for r in range(row_min, row_max + 1) for c in range(col_min, col_max + 1)]
+
+    blocks = _load_valid_chunks(key, chunks, newest_sheet_mtime)
+    reused = len(blocks)
+    missing = [ch for ch in chunks if ch not in blocks]
+    if missing:
+        with _locked_chunks(key, missing):
+            # Mezitím je mohl spočítat jiný request
+            blocks.update(_load_valid_chunks(key, missing, newest_sheet_mtime))
+            missing = [ch for ch in chunks if ch not in blocks]
+            if missing:
+                blocks.update(_compute_chunks(key, missing, res, n_directions, radius_m, sheets))
+    metrics.CACHE_LOOKUPS.inc(len(chunks) - len(missing), cache="svf", result="hit")
+    metrics.CACHE_LOOKUPS.inc(len(missing), cache="svf", result="miss")
+
+    # Složení mozaiky bloků a oříznutí na požadovaný bbox
+    mosaic = np.empty(((row_max - row_min + 1) * CHUNK_SIZE, (col_max - col_min + 1) * CHUNK_SIZE),
+                      dtype=np.float32)
+    for (col, row), block in blocks.items():
+        r0 = (row - row_min) * CHUNK_SIZE
+        c0 = (col - col_min) * CHUNK_SIZE
+        mosaic[r0:r0 + CHUNK_SIZE, c0:c0 + CHUNK_SIZE] = block
+
+    mosaic_left, _, _, mosaic_top = chunk_bounds(col_min, row_min, res)
+    c0 = int(math.floor((left - mosaic_left) / res))
+    r0 = int(math.floor((mosaic_top - top) / res))
+    width = max(1, int(round((right - left) / res)))
+    height = max(1, int(round((top - bottom) / res)))
+    result = mosaic[r0:r0 + height, c0:c0 + width]
+
+    transform = from_origin(mosaic_left + c0 * res, mosaic_top - r0 * res, res, res)
+    info = {"chunks": len(chunks), "reused": reused, "computed": len(chunks) - reused}
+    return result, transform, info
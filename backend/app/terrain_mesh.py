@@ -0,0 +1,190 @@
+"""
+Terénní mesh (RTIN) z DEM dlaždice.
+
+Right-Triangulated Irregular Network podle Martini (mapbox/martini):
+mřížka (2^k + 1)^2 výšek se hierarchicky dělí na pravoúhlé trojúhelníky
+a trojúhelník se dělí dál jen tam, kde by lineární interpolace přes jeho
+přeponu měla chybu větší než max_error. Na rovinách tak zbyde pár velkých
+trojúhelníků místo 2 x 256^2.
+
+max_error je přibližná mez (Martiniho metrika): chyba se měří jen ve
+středech přepon hierarchie, ne ve všech bodech mřížky uvnitř trojúhelníku.
+Skutečná odchylka meshe od mřížky proto může max_error překročit – na
+syntetickém terénu až zhruba o polovinu.
+
+Výpočet chyb i extrakce meshe běží po úrovních hierarchie (16 úrovní pro
+257 x 257) – každá úroveň je jedna vektorizovaná NumPy operace, žádná
+rekurze v Pythonu. Souřadnice trojúhelníků všech úrovní závisí jen na
+velikosti mřížky a jsou cachované.
+
+Výstupní binární formát je odvozený z Cesium quantized-mesh (bez ECEF
+hlavičky, okrajových indexů a rozšíření), little-endian:
+
+    float32 min_height, float32 max_height, uint32 vertex_count, uint32 triangle_count
+    uint16[vertex_count] u, v, height   – zig-zag delta kódování, rozsah 0..32767
+                                          (u zleva, v zdola, výška v rozsahu min..max)
+    uint16/uint32[triangle_count * 3]   – indexy s high-water-mark kódováním
+                                          (uint32, pokud vertex_count > 65536)
+"""
+
+import struct
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+GRID_SIZE = 257
+QUANTIZED_MAX = 32767
+
+# Výchozí tolerance podle zoomu: 0.5 m na z15, s každým zoomem níž dvojnásobná
+DEFAULT_ERROR_Z15 = 0.5
+MIN_MAX_ERROR = 0.05
+
+MESH_HEADER = struct.Struct("<ffII")
+
+
+def default_max_error(z: int) -> float:
+    """Výchozí tolerance meshe v metrech pro daný zoom."""
+    return max(MIN_MAX_ERROR, DEFAULT_ERROR_Z15 * 2.0 ** (15 - z))
+
+
+def _children(a: np.ndarray, b: np.ndarray, c: np.ndarray, m: np.ndarray):
+    """Dceřiné trojúhelníky (a, b, c) s pravým úhlem v c: (c, a, m) a (b, c, m)."""
+    return np.concatenate([c, b]), np.concatenate([a, c]), np.concatenate([m, m])
+
+
+@lru_cache(maxsize=4)
+def triangle_levels(grid_size: int = GRID_SIZE) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Všechny dělitelné trojúhelníky hierarchie po úrovních.
+
+    Vrcholy jsou pole (n, 2) souřadnic (x, y) v mřížce, c je vrchol
+    s pravým úhlem, a-b přepona. Úroveň 0 jsou dva trojúhelníky celé dlaždice,
+    poslední úroveň trojúhelníky s přeponou délky 2.
+    """
+    tile = grid_size - 1
+    if tile & (tile - 1):
+        raise ValueError("Velikost mřížky musí být 2^k + 1")
+    a = np.array([[0, 0], [tile, tile]])
+    b = np.array([[tile, tile], [0, 0]])
+    c = np.array([[tile, 0], [0, tile]])
+
+    levels = []
+    while np.abs(a[0] - c[0]).sum() > 1:
+        levels.append((a, b, c))
+        m = (a + b) // 2
+        a, b, c = _children(a, b, c, m)
+    return levels
+
+
+def _flat(points: np.ndarray, grid_size: int) -> np.ndarray:
+    return points[:, 1] * grid_size + points[:, 0]
+
+
+def compute_errors(heights: np.ndarray) -> np.ndarray:
+    """
+    Chyba aproximace pro každý vrchol mřížky (středy přepon), zdola nahoru.
+
+    Chyba trojúhelníku zahrnuje i chyby jeho potomků (ve středech jejich
+    přepon), takže dělení shora dolů je konzistentní – výsledná chyba
+    meshe je ale jen přibližně omezená (viz hlavička modulu).
+    """
+    grid_size = heights.shape[0]
+    flat_heights = heights.ravel().astype(np.float32)
+    errors = np.zeros(grid_size * grid_size, dtype=np.float32)
+    levels = triangle_levels(grid_size)
+
+    for depth in range(len(levels) - 1, -1, -1):
+        a, b, c = levels[depth]
+        ia, ib = _flat(a, grid_size), _flat(b, grid_size)
+        im = _flat((a + b) // 2, grid_size)
+        err = np.abs((flat_heights[ia] + flat_heights[ib]) / 2 - flat_heights[im])
+        if depth < len(levels) - 1:
+            # Středy přepon obou potomků (c, a) a (b, c)
+            err = np.maximum(err, errors[_flat((c + a) // 2, grid_size)])
+            err = np.maximum(err, errors[_flat((b + c) // 2, grid_size)])
+        np.maximum.at(errors, im, err)
+    return errors
+
+
+def extract_mesh(errors: np.ndarray, max_error: float,
+                 grid_size: int = GRID_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mesh, ve kterém žádný střed přepony nepřekročí max_error (přibližná mez chyby).
+
+    Returns:
+        (vrcholy (n, 2) v mřížce, trojúhelníky (t, 3) jako indexy do vrcholů)
+    """
+    a, b, c = triangle_levels(grid_size)[0]
+    emitted = []
+    while len(a):
+        m = (a + b) // 2
+        split = (np.abs(a - c).sum(axis=1) > 1) & (errors[_flat(m, grid_size)] > max_error)
+        emitted.append(np.stack([_flat(a[~split], grid_size), _flat(b[~split], grid_size),
+                                 _flat(c[~split], grid_size)], axis=1))
+        a, b, c = _children(a[split], b[split], c[split], m[split])
+
+    corners = np.concatenate(emitted)
+    used, triangles = np.unique(corners, return_inverse=True)
+    vertices = np.stack([used % grid_size, used // grid_size], axis=1)
+    return vertices, triangles.reshape(-1, 3)
+
+
+def _zigzag_delta(values: np.ndarray) -> np.ndarray:
+    delta = np.diff(values.astype(np.int32), prepend=0)
+    return ((delta << 1) ^ (delta >> 31)).astype(np.uint16)
+
+
+def _high_water_mark(triangles: np.ndarray) -> np.ndarray:
+    """Kódování indexů z quantized-mesh: code = highest - index (highest = dosud max. index + 1)."""
+    indices = triangles.ravel()
+    highest = np.maximum.accumulate(indices)
+    # Index je nový právě tehdy, když je roven dosavadnímu maximu + 1
+    previous_highest = np.concatenate([[0], highest[:-1] + 1])
+    return (previous_highest - indices).astype(np.uint32)
+
+
+def _order_vertices(vertices: np.ndarray, triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Přečísluje vrcholy v pořadí prvního použití (podmínka high-water-mark kódování)."""
+    flat = triangles.ravel()
+    _, first = np.unique(flat, return_index=True)
+    order = np.argsort(first)
+    remap = np.empty(len(vertices), dtype=np.int64)
+    remap[order] = np.arange(len(vertices))
+    return vertices[order], remap[triangles]
+
+
+def encode_mesh(heights: np.ndarray, vertices: np.ndarray, triangles: np.ndarray) -> bytes:
+    """Zakóduje mesh do binárního formátu popsaného v hlavičce modulu."""
+    vertices, triangles = _order_vertices(vertices, triangles)
+    tile = heights.shape[0] - 1
+    z = heights[vertices[:, 1], vertices[:, 0]].astype(np.float64)
+    min_h, max_h = float(z.min()), float(z.max())
+
+    u = np.rint(vertices[:, 0] / tile * QUANTIZED_MAX)
+    # Řádky mřížky jsou od severu, v quantized-mesh roste v k severu
+    v = np.rint((tile - vertices[:, 1]) / tile * QUANTIZED_MAX)
+    span = max_h - min_h
+    h = np.rint((z - min_h) / span * QUANTIZED_MAX) if span > 0 else np.zeros_like(z)
+
+    index_dtype = np.uint16 if len(vertices) <= 65536 else np.uint32
+    parts = [
+        MESH_HEADER.pack(min_h, max_h, len(vertices), len(triangles)),
+        _zigzag_delta(u).tobytes(),
+        _zigzag_delta(v).tobytes(),
+        _zigzag_delta(h).tobytes(),
+        _high_water_mark(triangles).astype(index_dtype).tobytes(),
+    ]
+    return b"".join(parts)
+
+
+def build_mesh(heights: np.ndarray, max_error: float) -> Tuple[bytes, int, int]:
+    """
+    RTIN mesh z mřížky výšek (GRID_SIZE x GRID_SIZE, bez NaN).
+
+    Returns:
+        (zakódovaný mesh, počet vrcholů, počet trojúhelníků)
+    """
+    errors = compute_errors(heights)
+    vertices, triangles = extract_mesh(errors, max_error, heights.shape[0])
+    return encode_mesh(heights, vertices, triangles), len(vertices), len(triangles)
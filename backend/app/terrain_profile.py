@@ -0,0 +1,264 @@
+"""
+Výškové profily nad DEM rastrem.
+
+Vzorkování je vektorizované (NumPy + shapely 2): body všech linií se
+interpolují najednou a z rastru se čtou jedním indexováním, místo
+čtení okna 1x1 pixel pro každý vzorek zvlášť.
+
+Statistiky (stoupání/klesání, sklon, extrémy) se počítají nad profilem
+v plném rozlišení rastru a teprve potom se profil zředí algoritmem LTTB
+(Largest-Triangle-Three-Buckets) na počet bodů požadovaný klientem.
+LTTB zachovává tvar křivky, takže příkopy a valy v grafu nezmizí.
+
+Vzdálenosti (a z nich sklony) jsou geodetické na elipsoidu WGS84 –
+délky ve Web Mercatoru jsou v ČR natažené 1/cos(lat), tj. cca 1,55x.
+Web Mercator slouží jen k rozmístění vzorků nad rastrem WCS.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyproj
+import shapely
+from affine import Affine
+
+# DMR 5G NoData bývá velmi nízké záporné číslo
+NODATA_THRESHOLD = -1000.0
+
+# Limit počtu vzorků profilu v plném rozlišení (ochrana proti extrémně dlouhým liniím)
+MAX_FULL_RES_POINTS = 20000
+
+_GEOD = pyproj.Geod(ellps="WGS84")
+
+
+def profile_fractions(length_m: float, step_m: float = 2.0,
+                      max_points: int = 200, min_points: int = 10) -> np.ndarray:
+    """
+    Vrátí normalizované pozice (0..1) vzorků podél linie.
+
+    Args:
+        length_m: Délka linie v metrech
+        step_m: Požadovaný krok vzorkování v metrech
+        max_points: Horní limit počtu intervalů
+        min_points: Dolní limit počtu intervalů
+
+    Returns:
+        Pole pozic délky num_points + 1 (včetně obou koncových bodů)
+    """
+    num_points = min(int(length_m / step_m), max_points)
+    num_points = max(num_points, min_points)
+    return np.linspace(0.0, 1.0, num_points + 1)
+
+
+def interpolate_line(line, fractions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vektorizovaně interpoluje body na linii, vrací pole (xs, ys)."""
+    points = shapely.line_interpolate_point(line, fractions, normalized=True)
+    coords = shapely.get_coordinates(points)
+    return coords[:, 0], coords[:, 1]
+
+
+def geodesic_distances(lngs: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """
+    Kumulativní geodetické vzdálenosti (m) podél bodů linie ve WGS84.
+
+    Returns:
+        Pole stejné délky jako lngs, první prvek 0
+    """
+    if len(lngs) < 2:
+        return np.zeros(len(lngs))
+    _, _, segments = _GEOD.inv(lngs[:-1], lats[:-1], lngs[1:], lats[1:])
+    return np.concatenate(([0.0], np.cumsum(segments)))
+
+
+def sample_elevations(band: np.ndarray, transform: Affine,
+                      xs: np.ndarray, ys: np.ndarray,
+                      nodata: Optional[float] = None) -> np.ndarray:
+    """
+    Navzorkuje rastr v bodech (xs, ys) metodou nearest pixel.
+
+    Body mimo rastr a NoData pixely vrací jako NaN.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    inv = ~transform
+    cols = np.floor(inv.a * xs + inv.b * ys + inv.c).astype(np.int64)
+    rows = np.floor(inv.d * xs + inv.e * ys + inv.f).astype(np.int64)
+
+    height, width = band.shape
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+
+    values = np.full(len(cols), np.nan, dtype=np.float64)
+    values[inside] = band[rows[inside], cols[inside]]
+
+    invalid = values < NODATA_THRESHOLD
+    if nodata is not None:
+        invalid |= values == nodata
+    values[invalid] = np.nan
+    return values
+
+
+def sample_lines(band: np.ndarray, transform: Affine, lines: List,
+                 fractions: List[np.ndarray], nodata: Optional[float] = None) -> List[np.ndarray]:
+    """
+    Navzorkuje více linií jedním průchodem nad rastrem.
+
+    Body všech linií se spojí do jednoho pole, navzorkují najednou
+    a výsledek se rozdělí zpět podle linií.
+    """
+    if not lines:
+        return []
+
+    xs_parts, ys_parts = [], []
+    for line, fr in zip(lines, fractions):
+        xs, ys = interpolate_line(line, fr)
+        xs_parts.append(xs)
+        ys_parts.append(ys)
+
+    values = sample_elevations(band, transform, np.concatenate(xs_parts), np.concatenate(ys_parts), nodata)
+    offsets = np.cumsum([len(fr) for fr in fractions])[:-1]
+    return np.split(values, offsets)
+
+
+def profile_statistics(distances: np.ndarray,
+                       elevations: np.ndarray) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Spočítá statistiky profilu vektorizovaně nad všemi vzorky.
+
+    NoData vzorky (NaN) se přeskakují – rozdíly se počítají mezi sousedními
+    platnými vzorky.
+
+    Returns:
+        (stats, series) – souhrnné hodnoty a řady pro každý vzorek
+        (slope_pct, cum_ascent, cum_descent)
+    """
+    n = len(elevations)
+    valid = ~np.isnan(elevations)
+    slope_pct = np.full(n, np.nan)
+    cum_ascent = np.zeros(n)
+    cum_descent = np.zeros(n)
+
+    if valid.sum() < 2:
+        stats = {
+            "ascent_m": 0.0, "descent_m": 0.0,
+            "min": None, "max": None,
+            "max_slope_pct": None, "mean_slope_pct": None,
+            "valid_ratio": float(valid.mean()) if n else 0.0,
+        }
+        return stats, {"slope_pct": slope_pct, "cum_ascent": cum_ascent, "cum_descent": cum_descent}
+
+    idx = np.flatnonzero(valid)
+    d = distances[idx]
+    z = elevations[idx]
+
+    dz = np.diff(z)
+    dd = np.diff(d)
+    gain = np.concatenate(([0.0], np.cumsum(np.where(dz > 0, dz, 0.0))))
+    loss = np.concatenate(([0.0], np.cumsum(np.where(dz < 0, -dz, 0.0))))
+
+    # Kumulativní řady se pro NoData vzorky přenesou z posledního platného vzorku
+    carry = np.maximum.accumulate(np.where(valid, np.arange(n), 0))
+    pos = np.searchsorted(idx, carry)
+    cum_ascent = gain[pos]
+    cum_descent = loss[pos]
+    cum_ascent[:idx[0]] = 0.0
+    cum_descent[:idx[0]] = 0.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope_pct[idx] = np.gradient(z, d) * 100.0
+        seg_slope = np.abs(np.where(dd > 0, dz / dd, 0.0)) * 100.0
+
+    i_min = idx[np.argmin(z)]
+    i_max = idx[np.argmax(z)]
+    stats = {
+        "ascent_m": round(float(gain[-1]), 2),
+        "descent_m": round(float(loss[-1]), 2),
+        "min": {"elevation": round(float(elevations[i_min]), 2), "distance": round(float(distances[i_min]), 1)},
+        "max": {"elevation": round(float(elevations[i_max]), 2), "distance": round(float(distances[i_max]), 1)},
+        "max_slope_pct": round(float(seg_slope.max()), 2),
+        "mean_slope_pct": round(float(np.abs(dz).sum() / max(d[-1] - d[0], 1e-9) * 100.0), 2),
+        "valid_ratio": round(float(valid.mean()), 4),
+    }
+    return stats, {"slope_pct": slope_pct, "cum_ascent": cum_ascent, "cum_descent": cum_descent}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets – vybere n_out indexů zachovávajících tvar křivky.
+
+    První a poslední bod se ponechají vždy. NaN hodnoty y se pro výběr
+    nahradí lineární interpolací ze sousedních platných bodů.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    valid = ~np.isnan(y)
+    if valid.any() and not valid.all():
+        y = np.interp(x, x[valid], y[valid])
+    elif not valid.any():
+        y = np.zeros(n)
+
+    # Hranice bucketů pro vnitřní body (první a poslední bod jsou pevné)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_start, nxt_end = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def build_profile(line_wgs84, fractions: np.ndarray,
+                  elevations: np.ndarray, max_points: int) -> Dict:
+    """
+    Sestaví odpověď profilu: statistiky z plného rozlišení + LTTB zředěné vzorky.
+
+    Args:
+        line_wgs84: linie ve WGS84 (lon, lat)
+        fractions: normalizované pozice vzorků (viz profile_fractions)
+        elevations: výšky ve vzorcích (NaN = bez dat)
+        max_points: počet intervalů zředěného profilu
+    """
+    lngs, lats = interpolate_line(line_wgs84, fractions)
+    distances = geodesic_distances(lngs, lats)
+    stats, series = profile_statistics(distances, elevations)
+    indices = lttb_indices(distances, elevations, max_points + 1)
+
+    return {
+        "length_m": round(float(_GEOD.geometry_length(line_wgs84)), 2),
+        "stats": stats,
+        "full_resolution_points": len(fractions),
+        "samples": build_samples(lngs[indices], lats[indices], distances[indices], elevations[indices],
+                                 {name: values[indices] for name, values in series.items()}),
+    }
+
+
+def build_samples(lngs: np.ndarray, lats: np.ndarray, distances: np.ndarray,
+                  elevations: np.ndarray, series: Optional[Dict[str, np.ndarray]] = None) -> List[dict]:
+    """Sestaví seznam vzorků profilu ve formátu API (distance, elevation, lat, lng, ...)."""
+    distances = np.round(distances, 1)
+    elev = np.where(np.isnan(elevations), 0.0, np.round(elevations, 2))
+
+    samples = [
+        {"distance": float(d), "elevation": float(e), "lat": float(lat), "lng": float(lng)}
+        for d, e, lat, lng in zip(distances, elev, lats, lngs)
+    ]
+    for name, values in (series or {}).items():
+        rounded = np.round(values, 2)
+        for sample, value in zip(samples, rounded):
+            sample[name] = None if np.isnan(value) else float(value)
+    return samples
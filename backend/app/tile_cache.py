@@ -0,0 +1,149 @@
+"""
+Disková cache vyrenderovaných dlaždic (XYZ).
+
+Dlaždice se ukládají jako soubory <root>/<layer>[/<variant>]/<z>/<x>/<y>.<ext>.
+Zápis je atomický (dočasný soubor + rename), takže souběžné requesty
+nikdy nečtou rozepsanou dlaždici.
+
+Volitelně:
+- ttl: dlaždice starší než ttl sekund (podle mtime = času zápisu) se
+  považují za neplatné a při čtení se smažou
+- max_bytes: velikostní limit vrstvy; po překročení se mažou nejdéle
+  nepoužité dlaždice (LRU podle atime, které get() při zásahu obnovuje)
+"""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from app import metrics
+from app.atom_downloader import CACHE_DIR
+
+TILE_CACHE_DIR = CACHE_DIR.parent / "tiles"
+# Po překročení limitu se maže až pod tento podíl, aby se neuklízelo při každém zápisu
+EVICT_TARGET_RATIO = 0.9
+
+
+class TileCache:
+    """Jednoduchá souborová cache dlaždic pro jednu vrstvu."""
+
+    def __init__(self, layer: str, ext: str, root: Path = TILE_CACHE_DIR,
+                 ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.layer = layer
+        self.ext = ext
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def metrics_name(self) -> str:
+        """Název cache v metrikách (vrstva + přípona, v jedné vrstvě může být víc formátů)."""
+        return f"{self.layer}.{self.ext}"
+
+    @property
+    def layer_dir(self) -> Path:
+        return self.root / self.layer
+
+    def path(self, z: int, x: int, y: int, variant: Optional[str] = None) -> Path:
+        base = self.layer_dir / variant if variant else self.layer_dir
+        return base / str(z) / str(x) / f"{y}.{self.ext}"
+
+    def get(self, z: int, x: int, y: int, variant: Optional[str] = None,
+            max_age: Optional[float] = None) -> Optional[bytes]:
+        """
+        Načte dlaždici z cache.
+
+        Args:
+            max_age: přísnější TTL pro tento dotaz (např. pro neuzavřené období)
+        """
+        path = self.path(z, x, y, variant)
+        try:
+            stat = path.stat()
+        except OSError:
+            metrics.cache_lookup(self.metrics_name, "miss")
+            return None
+
+        now = time.time()
+        limit = min(a for a in (self.ttl, max_age, float("inf")) if a is not None)
+        if now - stat.st_mtime > limit:
+            self._remove(path, stat.st_size)
+            metrics.cache_lookup(self.metrics_name, "expired")
+            return None
+
+        try:
+            data = path.read_bytes()
+            if self.max_bytes is not None:
+                os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            metrics.cache_lookup(self.metrics_name, "miss")
+            return None
+        metrics.cache_lookup(self.metrics_name, "hit")
+        return data
+
+    def put(self, z: int, x: int, y: int, data: bytes, variant: Optional[str] = None) -> Path:
+        path = self.path(z, x, y, variant)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            previous = path.stat().st_size
+        except OSError:
+            previous = 0
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        if self.max_bytes is not None:
+            with self._lock:
+                if self._size is not None:
+                    self._size += len(data) - previous
+            self._evict_if_needed()
+        return path
+
+    def __contains__(self, zxy) -> bool:
+        return self.path(*zxy).exists()
+
+    def size_bytes(self) -> int:
+        """Aktuální velikost vrstvy na disku (při prvním volání se spočítá skenem)."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(st.st_size for _, st in self._scan())
+            return self._size
+
+    def _scan(self):
+        for path in self.layer_dir.rglob(f"*.{self.ext}"):
+            try:
+                yield path, path.stat()
+            except OSError:
+                continue
+
+    def _remove(self, path: Path, size: int) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _evict_if_needed(self) -> None:
+        if self.max_bytes is None or self.size_bytes() <= self.max_bytes:
+            return
+
+        with self._lock:
+            # Přesný přepočet – vrstvu mohl mezitím měnit i jiný proces
+            entries = sorted(self._scan(), key=lambda item: item[1].st_atime)
+            total = sum(st.st_size for _, st in entries)
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            for path, st in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= st.st_size
+            self._size = total
@@ -0,0 +1,223 @@
+"""
+Kódování DEM dlaždic pro klienta.
+
+Formáty (parametr format u /api/tiles/dem):
+
+- float32  – syrový little-endian float32 buffer (NoData = hodnota nodata)
+- terrarium – Terrarium RGB PNG (výška = R*256 + G + B/256 - 32768)
+- webp     – totéž Terrarium RGB jako bezeztrátový WebP (menší než PNG)
+- float32-shuffle – bezeztrátově komprimovaný float32 (codec deflate, nebo
+             zstd, pokud je nainstalovaný balíček zstandard):
+
+    char[4] "DS32", uint8 codec (0 = deflate, 1 = zstd), uint8 0, uint16 width, uint16 height
+    codec(bajtové roviny)  – bity float32 XOR levý soused v řádku, rozdělené
+                             po bajtech (nejdřív všechny nejnižší bajty, ...,
+                             nakonec nejvyšší); NoData = hodnota nodata
+- int16    – kvantizované výšky s max. chybou max_error (default 5 mm =
+             centimetrový krok; navíc jen zaokrouhlení float32),
+             horizontální prediktor + deflate:
+
+    char[4] "DQ16", uint16 width, uint16 height, float64 offset, float64 step
+    zlib(uint16[height][width])  – rozdíl proti levému sousedovi (mod 2^16),
+                                   po sečtení v řádku: 0 = NoData,
+                                   k >= 1 → výška offset + (k - 1) * step
+
+Terrarium se skládá bez float64 mezivýsledků: výška * 256 posunutá
+o 32768 * 256 je jako big-endian uint32 přímo sekvence bajtů 0, R, G, B.
+"""
+
+import io
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from app import metrics
+
+try:
+    import zstandard
+except ImportError:  # volitelné – bez něj jen deflate
+    zstandard = None
+
+TERRARIUM_NODATA = -32768.0
+
+# zlib úroveň PNG: 6 má stejnou velikost jako původní optimize=True (= 9) při třetinovém čase
+PNG_COMPRESS_LEVEL = 6
+# Bezeztrátový WebP: method/quality určují úsilí enkodéru, ne kvalitu
+WEBP_METHOD = 1
+WEBP_QUALITY = 50
+
+QUANTIZED_MAGIC = b"DQ16"
+QUANTIZED_HEADER = struct.Struct("<4sHHdd")
+QUANTIZED_MAX = 65535
+DEFAULT_MAX_ERROR = 0.005
+QUANTIZED_ZLIB_LEVEL = 1
+
+SHUFFLE_FORMAT = "float32-shuffle"
+SHUFFLE_MAGIC = b"DS32"
+SHUFFLE_HEADER = struct.Struct("<4sBxHH")
+SHUFFLE_CODECS = {"deflate": 0, "zstd": 1}
+SHUFFLE_ZLIB_LEVEL = 6
+SHUFFLE_ZSTD_LEVEL = 9
+
+MEDIA_TYPES = {
+    "float32": "application/octet-stream",
+    SHUFFLE_FORMAT: "application/octet-stream",
+    "terrarium": "image/png",
+    "webp": "image/webp",
+    "int16": "application/octet-stream",
+}
+FORMAT_PATTERN = f"^({'|'.join(MEDIA_TYPES)})$"
+
+
+def with_nodata(tile: np.ndarray, nodata: float) -> np.ndarray:
+    """Nahradí NaN hodnotou NoData požadovanou klientem."""
+    return np.where(np.isfinite(tile), tile, np.float32(nodata)).astype(np.float32, copy=False)
+
+
+def float32_raw(tile: np.ndarray, nodata: float = TERRARIUM_NODATA) -> bytes:
+    return with_nodata(tile, nodata).astype("<f4", copy=False).tobytes(order="C")
+
+
+def shuffle_codec(requested: str) -> str:
+    """Použitelný codec pro float32-shuffle (zstd bez balíčku zstandard → deflate)."""
+    return "zstd" if requested == "zstd" and zstandard is not None else "deflate"
+
+
+def float32_shuffled(tile: np.ndarray, nodata: float = TERRARIUM_NODATA, codec: str = "deflate") -> bytes:
+    """
+    Zakóduje výšky do formátu float32-shuffle (viz hlavička modulu).
+
+    Sousední výšky sdílejí znaménko, exponent i horní bity mantisy, takže po
+    XOR s levým sousedem jsou horní bajtové roviny téměř nulové a dobře se komprimují.
+    """
+    codec = shuffle_codec(codec)
+    bits = with_nodata(tile, nodata).astype("<f4", copy=False).view("<u4")
+    height, width = bits.shape
+    xored = bits.copy()
+    xored[:, 1:] ^= bits[:, :-1]
+    planes = xored.view(np.uint8).reshape(-1, 4).T.tobytes()
+    if codec == "zstd":
+        payload = zstandard.ZstdCompressor(level=SHUFFLE_ZSTD_LEVEL).compress(planes)
+    else:
+        payload = zlib.compress(planes, SHUFFLE_ZLIB_LEVEL)
+    return SHUFFLE_HEADER.pack(SHUFFLE_MAGIC, SHUFFLE_CODECS[codec], width, height) + payload
+
+
+def decode_float32_shuffled(data: bytes) -> np.ndarray:
+    """Dekóduje formát float32-shuffle zpět na float32 výšky."""
+    magic, codec, width, height = SHUFFLE_HEADER.unpack_from(data)
+    if magic != SHUFFLE_MAGIC:
+        raise ValueError("Neplatná hlavička float32-shuffle dlaždice")
+    payload = data[SHUFFLE_HEADER.size:]
+    if codec == SHUFFLE_CODECS["zstd"]:
+        if zstandard is None:
+            raise ValueError("Dlaždice je komprimovaná zstd, balíček zstandard není nainstalovaný")
+        planes = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        planes = zlib.decompress(payload)
+    xored = np.frombuffer(planes, dtype=np.uint8).reshape(4, -1).T.copy().view("<u4").reshape(height, width)
+    bits = np.bitwise_xor.accumulate(xored, axis=1)
+    return bits.view("<f4")
+
+
+def terrarium_image(tile: np.ndarray, nodata: float = TERRARIUM_NODATA) -> Image.Image:
+    """
+    Terrarium RGB obrázek z výšek.
+
+    NoData se zakóduje jako hodnota nodata (default -32768 → RGB 0,0,0).
+    """
+    # np.where vždy vrací novou matici → dál se pracuje na místě
+    scaled = with_nodata(tile, nodata)
+    scaled += np.float32(32768.0)
+    np.clip(scaled, 0, 65535, out=scaled)
+    # Násobení mocninou dvou je ve float32 přesné, astype ořízne dolů (hodnoty jsou >= 0)
+    scaled *= np.float32(256.0)
+    packed = np.ascontiguousarray(scaled.astype(">u4"))
+    height, width = tile.shape
+    return Image.frombuffer("RGB", (width, height), packed, "raw", "XRGB", 0, 1)
+
+
+def terrarium_png(tile: np.ndarray, nodata: float = TERRARIUM_NODATA,
+                  compress_level: int = PNG_COMPRESS_LEVEL) -> bytes:
+    """
+    Zakóduje výšky do Terrarium RGB PNG.
+
+    Args:
+        compress_level: zlib úroveň 0–9 (1 = nejrychlejší, 9 = nejmenší)
+    """
+    buffer = io.BytesIO()
+    terrarium_image(tile, nodata).save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def terrarium_webp(tile: np.ndarray, nodata: float = TERRARIUM_NODATA, method: int = WEBP_METHOD) -> bytes:
+    """Zakóduje výšky do Terrarium RGB jako bezeztrátový WebP."""
+    buffer = io.BytesIO()
+    terrarium_image(tile, nodata).save(buffer, format="WEBP", lossless=True, method=method, quality=WEBP_QUALITY)
+    return buffer.getvalue()
+
+
+def quantized_int16(tile: np.ndarray, max_error: float = DEFAULT_MAX_ERROR) -> bytes:
+    """
+    Zakóduje výšky do kvantizovaného formátu int16 (viz hlavička modulu).
+
+    Krok je 2 * max_error; pokud by se rozsah výšek dlaždice do 16 bitů
+    nevešel, krok se zvětší (skutečný krok je v hlavičce).
+    """
+    valid = np.isfinite(tile)
+    height, width = tile.shape
+    if not valid.any():
+        codes = np.zeros(tile.shape, dtype=np.uint16)
+        offset, step = 0.0, 2.0 * max_error
+    else:
+        offset = float(tile[valid].min())
+        span = float(tile[valid].max()) - offset
+        step = max(2.0 * max_error, span / (QUANTIZED_MAX - 1))
+        codes = np.zeros(tile.shape, dtype=np.uint16)
+        # Kód 0 je vyhrazený pro NoData
+        np.rint((tile - offset) / step + 1.0, out=codes, where=valid, casting="unsafe")
+
+    deltas = np.diff(codes, axis=1, prepend=np.uint16(0))
+    return (
+        QUANTIZED_HEADER.pack(QUANTIZED_MAGIC, width, height, offset, step)
+        + zlib.compress(deltas.astype("<u2", copy=False).tobytes(), QUANTIZED_ZLIB_LEVEL)
+    )
+
+
+def decode_quantized_int16(data: bytes) -> np.ndarray:
+    """Dekóduje formát int16 zpět na float32 výšky (NoData = NaN)."""
+    magic, width, height, offset, step = QUANTIZED_HEADER.unpack_from(data)
+    if magic != QUANTIZED_MAGIC:
+        raise ValueError("Neplatná hlavička int16 dlaždice")
+    deltas = np.frombuffer(zlib.decompress(data[QUANTIZED_HEADER.size:]), dtype="<u2").reshape(height, width)
+    codes = np.cumsum(deltas, axis=1, dtype=np.uint16)
+    tile = (offset + (codes.astype(np.float64) - 1.0) * step).astype(np.float32)
+    tile[codes == 0] = np.nan
+    return tile
+
+
+def encode_tile(tile: np.ndarray, format: str, nodata: float = TERRARIUM_NODATA,
+                max_error: float = DEFAULT_MAX_ERROR, codec: str = "deflate") -> bytes:
+    """
+    Zakóduje DEM dlaždici (NoData = NaN) do požadovaného formátu.
+
+    Args:
+        format: klíč z MEDIA_TYPES
+        nodata: hodnota NoData pro float32 / Terrarium (int16 má vlastní kód)
+        max_error: max. chyba výšky v metrech pro int16
+        codec: komprese pro float32-shuffle (deflate / zstd)
+    """
+    with metrics.stage("encode"):
+        if format == "float32":
+            return float32_raw(tile, nodata)
+        if format == SHUFFLE_FORMAT:
+            return float32_shuffled(tile, nodata, codec)
+        if format == "terrarium":
+            return terrarium_png(tile, nodata)
+        if format == "webp":
+            return terrarium_webp(tile, nodata)
+        if format == "int16":
+            return quantized_int16(tile, max_error)
+    raise ValueError(f"Neznámý formát dlaždice: {format}")
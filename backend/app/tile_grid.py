@@ -0,0 +1,46 @@
+"""
+Mřížka XYZ dlaždic (Web Mercator, EPSG:3857).
+"""
+
+import math
+from typing import Iterator
+
+import pyproj
+
+_project_to_3857 = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True).transform
+
+
+def mercator_tile_bounds(x: int, y: int, z: int) -> tuple[float, float, float, float]:
+    """
+    Vrátí bounding box dlaždice v souřadnicích EPSG:3857.
+    """
+    if z < 0:
+        raise ValueError("Zoom level must be non-negative")
+    n = 2 ** z
+    if not (0 <= x < n and 0 <= y < n):
+        raise ValueError(f"Tile {z}/{x}/{y} is out of range (x, y < {n})")
+    lon_min = x / n * 360.0 - 180.0
+    lon_max = (x + 1) / n * 360.0 - 180.0
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    minx, miny = _project_to_3857(lon_min, lat_min)
+    maxx, maxy = _project_to_3857(lon_max, lat_max)
+    return minx, miny, maxx, maxy
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> tuple[int, int]:
+    """Vrátí x, y dlaždice obsahující bod WGS84 na daném zoomu."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bounds(west: float, south: float, east: float, north: float, z: int) -> Iterator[tuple[int, int]]:
+    """Dlaždice (x, y) překrývající bbox ve WGS84 na daném zoomu."""
+    min_x, min_y = lonlat_to_tile(west, north, z)
+    max_x, max_y = lonlat_to_tile(east, south, z)
+    for x in range(min_x, max_x + 1):
+        for y in range(min_y, max_y + 1):
+            yield x, y
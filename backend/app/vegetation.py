@@ -0,0 +1,338 @@
+"""
+Multitemporální vegetační indexy z lokálně cachovaných pásem Sentinel-2.
+
+Místo hotové obarvené mozaiky (NDVI_EVALSCRIPT) se pro každou scénu jednou
+stáhnou surové odrazivosti B04 (red) a B08 (NIR) s maskou mraků a uloží se
+do .npz cache. Indexy (NDVI, SAVI, EVI2, ...), časové statistiky (medián,
+rozpětí max-min, ...) a anomálie jednotlivých scén se pak počítají
+vektorizovaně nad polem (scény, řádky, sloupce) – nová varianta indexu ani
+statistiky nevyžaduje další request na Sentinel Hub.
+
+Zdroj pásem je zaměnitelný:
+- SentinelHubBandSource – Catalog API (seznam scén) + Process API (pásma)
+- LocalBandSource – adresář GeoTIFFů <YYYY-MM-DD>*.tif (B04, B08[, maska]),
+  lokální náhrada Sentinel Hubu pro testování a offline provoz
+  (proměnná BAND_SOURCE_DIR)
+"""
+
+import hashlib
+import os
+import re
+import uuid
+import warnings
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS as RioCRS
+from rasterio.transform import from_bounds
+from rasterio.warp import Resampling, reproject
+from sentinelhub import BBox, CRS, DataCollection, MimeType, SentinelHubCatalog, SentinelHubRequest
+
+from app import metrics
+from app.atom_downloader import CACHE_DIR
+
+BAND_CACHE_DIR = CACHE_DIR.parent / "sentinel_bands"
+BAND_SOURCE_DIR = os.getenv("BAND_SOURCE_DIR")
+# Bbox se zarovnává na tuto mřížku (stupně), aby se cache sdílela mezi podobnými dotazy
+GRID_STEP_DEG = 0.001
+# Limit Sentinel Hub Process API na rozměr výstupu
+MAX_GRID_PX = 2500
+MAX_SCENES = int(os.getenv("VEGETATION_MAX_SCENES", "60"))
+# Max. součet pixelů všech scén jednoho kompozitu (Mpx) – stack indexu (float32)
+# a pracovní kopie mediánu drží zhruba 8 B na pixel a scénu
+MAX_COMPOSITE_MPX = float(os.getenv("VEGETATION_MAX_COMPOSITE_MPX", "64"))
+
+WGS84 = RioCRS.from_epsg(4326)
+
+# Surové odrazivosti + maska platných pixelů (bez mraků, stínů a sněhu podle SCL)
+BANDS_EVALSCRIPT = """
+//VERSION=3
+function setup() {
+  return {
+    input: [{bands: ["B04", "B08", "SCL", "dataMask"]}],
+    output: {bands: 3, sampleType: "FLOAT32"}
+  };
+}
+function evaluatePixel(sample) {
+  let cloudy = [3, 8, 9, 10, 11].includes(sample.SCL);
+  let valid = sample.dataMask == 1 && !cloudy ? 1 : 0;
+  return [sample.B04, sample.B08, valid];
+}
+"""
+
+
+@dataclass(frozen=True)
+class BandGrid:
+    """Pevná mřížka výřezu ve WGS84, na kterou se stahují všechny scény."""
+    bbox: Tuple[float, float, float, float]
+    width: int
+    height: int
+
+    @property
+    def transform(self):
+        return from_bounds(*self.bbox, self.width, self.height)
+
+    @property
+    def key(self) -> str:
+        raw = ",".join(f"{v:.6f}" for v in self.bbox) + f":{self.width}x{self.height}"
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def make_grid(min_lon: float, min_lat: float, max_lon: float, max_lat: float,
+              resolution: float = 10.0) -> BandGrid:
+    """
+    Zarovná bbox na mřížku GRID_STEP_DEG a spočítá rozměr rastru pro dané rozlišení (m).
+
+    Raises:
+        ValueError: neplatný bbox nebo příliš velký výstup
+    """
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise ValueError("Neplatný bounding box.")
+
+    step = GRID_STEP_DEG
+    bbox = (
+        np.floor(min_lon / step) * step, np.floor(min_lat / step) * step,
+        np.ceil(max_lon / step) * step, np.ceil(max_lat / step) * step,
+    )
+    bbox = tuple(round(float(v), 6) for v in bbox)
+
+    mid_lat = np.radians((bbox[1] + bbox[3]) / 2)
+    width = int(round((bbox[2] - bbox[0]) * 111_320 * np.cos(mid_lat) / resolution))
+    height = int(round((bbox[3] - bbox[1]) * 110_540 / resolution))
+    if max(width, height) > MAX_GRID_PX:
+        raise ValueError(f"Výřez je při rozlišení {resolution} m příliš velký (max {MAX_GRID_PX} px).")
+    return BandGrid(bbox, max(width, 1), max(height, 1))
+
+
+# --- Zdroje pásem ---------------------------------------------------------
+
+class LocalBandSource:
+    """
+    Lokální náhrada Sentinel Hubu: GeoTIFFy <YYYY-MM-DD>*.tif v adresáři.
+
+    Pásma: 1 = B04, 2 = B08, volitelně 3 = maska platných pixelů (0/1).
+    Soubory mohou být v libovolném CRS, na mřížku se převzorkují.
+    """
+    name = "local"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _files(self) -> Dict[str, Path]:
+        files = {}
+        for path in sorted(self.directory.glob("*.tif")):
+            match = re.match(r"(\d{4}-\d{2}-\d{2})", path.name)
+            if match:
+                files.setdefault(match.group(1), path)
+        return files
+
+    def list_scenes(self, grid: BandGrid, from_date: str, to_date: str,
+                    max_cloud_cover: float = 100.0) -> List[str]:
+        return [day for day in self._files() if from_date <= day <= to_date]
+
+    def fetch_bands(self, grid: BandGrid, day: str) -> Tuple[np.ndarray, np.ndarray]:
+        path = self._files()[day]
+        out = []
+        with rasterio.open(path) as src:
+            for band in (1, 2):
+                dst = np.full((grid.height, grid.width), np.nan, dtype=np.float32)
+                reproject(
+                    source=rasterio.band(src, band), destination=dst,
+                    dst_transform=grid.transform, dst_crs=WGS84,
+                    resampling=Resampling.bilinear, dst_nodata=np.nan,
+                )
+                out.append(dst)
+            if src.count >= 3:
+                mask = np.zeros((grid.height, grid.width), dtype=np.float32)
+                reproject(
+                    source=rasterio.band(src, 3), destination=mask,
+                    dst_transform=grid.transform, dst_crs=WGS84,
+                    resampling=Resampling.nearest, dst_nodata=0,
+                )
+                out[0][mask < 0.5] = np.nan
+                out[1][mask < 0.5] = np.nan
+        return out[0], out[1]
+
+
+class SentinelHubBandSource:
+    """Sentinel-2 L2A přes Catalog API (seznam scén) a Process API (surová pásma)."""
+    name = "sentinelhub"
+
+    def __init__(self, config):
+        self.config = config
+
+    def list_scenes(self, grid: BandGrid, from_date: str, to_date: str,
+                    max_cloud_cover: float = 100.0) -> List[str]:
+        catalog = SentinelHubCatalog(config=self.config)
+        with metrics.stage("upstream"):
+            # search() stránkuje líně – požadavky běží až při iteraci
+            results = list(catalog.search(
+                DataCollection.SENTINEL2_L2A,
+                bbox=BBox(bbox=list(grid.bbox), crs=CRS.WGS84),
+                time=(from_date, to_date),
+                filter=f"eo:cloud_cover <= {max_cloud_cover}",
+                fields={"include": ["properties.datetime"], "exclude": []},
+            ))
+        return sorted({item["properties"]["datetime"][:10] for item in results})
+
+    def fetch_bands(self, grid: BandGrid, day: str) -> Tuple[np.ndarray, np.ndarray]:
+        request = SentinelHubRequest(
+            evalscript=BANDS_EVALSCRIPT,
+            input_data=[
+                SentinelHubRequest.input_data(
+                    data_collection=DataCollection.SENTINEL2_L2A,
+                    time_interval=(day, day),
+                    mosaicking_order="leastCC",
+                )
+            ],
+            responses=[SentinelHubRequest.output_response("default", MimeType.TIFF)],
+            bbox=BBox(bbox=list(grid.bbox), crs=CRS.WGS84),
+            size=(grid.width, grid.height),
+            config=self.config,
+        )
+        with metrics.stage("upstream"):
+            data = request.get_data()[0]
+        data = data.astype(np.float32, copy=False)
+        b04, b08, valid = data[..., 0], data[..., 1], data[..., 2]
+        b04[valid < 0.5] = np.nan
+        b08[valid < 0.5] = np.nan
+        return b04, b08
+
+
+def max_scenes(grid: BandGrid) -> int:
+    """Max. počet scén kompozitu pro mřížku (MAX_SCENES a paměťový limit MAX_COMPOSITE_MPX)."""
+    by_memory = int(MAX_COMPOSITE_MPX * 1e6 // (grid.width * grid.height))
+    return max(1, min(MAX_SCENES, by_memory))
+
+
+def band_source(config=None):
+    """Zdroj pásem podle konfigurace (BAND_SOURCE_DIR = lokální adresář)."""
+    if BAND_SOURCE_DIR:
+        return LocalBandSource(Path(BAND_SOURCE_DIR))
+    return SentinelHubBandSource(config)
+
+
+# --- Cache scén -----------------------------------------------------------
+
+def scene_cache_path(source_name: str, grid: BandGrid, day: str) -> Path:
+    return BAND_CACHE_DIR / source_name / grid.key / f"{day}.npz"
+
+
+def is_scene_cached(source, grid: BandGrid, day: str) -> bool:
+    return scene_cache_path(source.name, grid, day).exists()
+
+
+def read_cached_scene(source, grid: BandGrid, day: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Vrátí (B04, B08) scény z cache, nebo None.
+
+    Poškozený soubor (useknutý zápis, neplatný zip) se smaže a bere se jako miss.
+    """
+    path = scene_cache_path(source.name, grid, day)
+    try:
+        with np.load(path) as cached:
+            return cached["B04"], cached["B08"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        path.unlink(missing_ok=True)
+        return None
+
+
+def load_scene(source, grid: BandGrid, day: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vrátí (B04, B08) scény na mřížce – z cache, jinak stáhne a uloží (blokující).
+    """
+    cached = read_cached_scene(source, grid, day)
+    if cached is not None:
+        return cached
+
+    path = scene_cache_path(source.name, grid, day)
+    b04, b08 = source.fetch_bands(grid, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.npz")
+    np.savez_compressed(tmp_path, B04=b04, B08=b08)
+    os.replace(tmp_path, path)
+    return b04, b08
+
+
+# --- Indexy a statistiky --------------------------------------------------
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = num / den
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+INDICES: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "ndvi": lambda red, nir: _ratio(nir - red, nir + red),
+    # Soil-Adjusted VI (L = 0.5) – méně citlivý na odkrytou půdu
+    "savi": lambda red, nir: _ratio(1.5 * (nir - red), nir + red + 0.5),
+    # Dvoupásmový EVI (Jiang 2008) – nesaturuje v husté vegetaci
+    "evi2": lambda red, nir: _ratio(2.5 * (nir - red), nir + 2.4 * red + 1.0),
+    "msavi2": lambda red, nir: (
+        (2 * nir + 1 - np.sqrt(np.maximum((2 * nir + 1) ** 2 - 8 * (nir - red), 0))) / 2
+    ),
+}
+
+
+def index_stack(red: np.ndarray, nir: np.ndarray, index: str = "ndvi") -> np.ndarray:
+    """Index pro celý stack (scény, řádky, sloupce) najednou; NaN = maska."""
+    if index not in INDICES:
+        raise ValueError(f"Neznámý index '{index}', dostupné: {', '.join(INDICES)}")
+    return INDICES[index](red, nir).astype(np.float32, copy=False)
+
+
+TEMPORAL_STATS = ("median", "mean", "min", "max", "range", "std", "count", "anomaly")
+
+
+def temporal_statistic(stack: np.ndarray, stat: str, scene: Optional[int] = None) -> np.ndarray:
+    """
+    Časová statistika přes osu scén (NaN se ignorují).
+
+    range = max - min (typický projev porostových příznaků mezi termíny),
+    anomaly = hodnota scény `scene` (default poslední) minus medián všech scén.
+    """
+    if stat not in TEMPORAL_STATS:
+        raise ValueError(f"Neznámá statistika '{stat}', dostupné: {', '.join(TEMPORAL_STATS)}")
+
+    with warnings.catch_warnings():
+        # Pixely bez jediné platné scény → NaN (RuntimeWarning "All-NaN slice")
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if stat == "median":
+            result = np.nanmedian(stack, axis=0)
+        elif stat == "mean":
+            result = np.nanmean(stack, axis=0)
+        elif stat == "min":
+            result = np.nanmin(stack, axis=0)
+        elif stat == "max":
+            result = np.nanmax(stack, axis=0)
+        elif stat == "range":
+            result = np.nanmax(stack, axis=0) - np.nanmin(stack, axis=0)
+        elif stat == "std":
+            result = np.nanstd(stack, axis=0)
+        elif stat == "count":
+            result = np.isfinite(stack).sum(axis=0)
+        else:
+            idx = stack.shape[0] - 1 if scene is None else scene
+            result = stack[idx] - np.nanmedian(stack, axis=0)
+    return result.astype(np.float32, copy=False)
+
+
+def composite(scenes: List[Tuple[np.ndarray, np.ndarray]], index: str = "ndvi",
+              stat: str = "median", scene: Optional[int] = None) -> np.ndarray:
+    """
+    Z (B04, B08) jednotlivých scén spočítá index a jeho časovou statistiku.
+
+    Drží najednou pásma i index všech scén – endpoint proto počítá index
+    po scénách rovnou do stacku a volá jen temporal_statistic.
+    """
+    red = np.stack([b04 for b04, _ in scenes])
+    nir = np.stack([b08 for _, b08 in scenes])
+    return temporal_statistic(index_stack(red, nir, index), stat, scene)
+
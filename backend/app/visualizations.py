@@ -0,0 +1,77 @@
+"""
+Archeologické vizualizace reliéfu nad DEM (NumPy, bez dalších závislostí).
+
+- Local Relief Model (LRM): DEM minus vyhlazený (průměrovaný) DEM
+- Multi-directional hillshade: vážený průměr stínování z více azimutů
+- Sky-View Factor a openness: viz app/svf.py
+
+Všechny funkce berou DEM s NaN pro NoData a vrací float32 pole stejného
+tvaru, NoData zůstává NaN.
+"""
+
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+def mean_filter(dem: np.ndarray, radius_px: int) -> np.ndarray:
+    """
+    Průměr ve čtvercovém okně (2r+1)^2 přes integrální obraz; NaN se ignorují.
+
+    Složitost nezávisí na velikosti okna.
+    """
+    valid = np.isfinite(dem)
+    values = np.where(valid, dem, 0.0).astype(np.float64)
+
+    def window_sum(arr: np.ndarray) -> np.ndarray:
+        padded = np.pad(arr, radius_px, mode="constant")
+        integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float64)
+        np.cumsum(np.cumsum(padded, axis=0), axis=1, out=integral[1:, 1:])
+        k = 2 * radius_px + 1
+        return integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+
+    counts = window_sum(valid.astype(np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = window_sum(values) / counts
+    return mean.astype(np.float32)
+
+
+def local_relief_model(dem: np.ndarray, res: float, radius_m: float = 25.0) -> np.ndarray:
+    """
+    Local Relief Model – odchylka terénu od trendu (Hesse 2010, zjednodušeně).
+
+    Kladné hodnoty = valy, mohyly; záporné = příkopy, úvozy.
+    """
+    radius_px = max(1, int(round(radius_m / res)))
+    lrm = dem.astype(np.float32) - mean_filter(dem, radius_px)
+    lrm[~np.isfinite(dem)] = np.nan
+    return lrm
+
+
+def multidirectional_hillshade(dem: np.ndarray, res: float, altitude: float = 45.0,
+                               azimuths: Sequence[float] = (225.0, 270.0, 315.0, 360.0),
+                               weights: Sequence[float] = (0.25, 0.25, 0.25, 0.25),
+                               z_factor: float = 1.0) -> np.ndarray:
+    """
+    Vícesměrné stínování (0..1) – průměr hillshade z několika azimutů.
+    """
+    dz_dy, dz_dx = np.gradient(dem.astype(np.float32) * z_factor, res)
+    slope = np.arctan(np.hypot(dz_dx, dz_dy))
+    # Orientace svahu (kam svah "hledí") ve směru hodinových ručiček od severu;
+    # řádky rastru rostou na jih, proto severní gradient = -dz_dy
+    aspect = np.arctan2(-dz_dx, dz_dy)
+
+    zenith = math.radians(90.0 - altitude)
+    cos_z, sin_z = math.cos(zenith), math.sin(zenith)
+    cos_slope = np.cos(slope)
+    sin_slope = np.sin(slope)
+
+    shade = np.zeros(dem.shape, dtype=np.float32)
+    for azimuth, weight in zip(azimuths, weights):
+        az = math.radians(azimuth)
+        shade += weight * (cos_z * cos_slope + sin_z * sin_slope * np.cos(az - aspect))
+
+    np.clip(shade / sum(weights), 0.0, 1.0, out=shade)
+    shade[~np.isfinite(dem)] = np.nan
+    return shade
@@ -0,0 +1,137 @@
+"""
+XYZ dlaždice archeologických vizualizací z cachovaných listů DMR 5G.
+
+Pro každou dlaždici se z lokální cache sestaví DEM okno v S-JTSK pokrývající
+dlaždici + okraj (halo) potřebný pro danou metodu, vizualizace se spočítá
+v nativním rozlišení DEM a teprve výsledek se převzorkuje do mřížky Web
+Mercator. Díky halo jsou hodnoty na hranách sousedních dlaždic shodné
+a ve vrstvě nevznikají švy.
+"""
+
+import io
+import math
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from rasterio.crs import CRS as RioCRS
+from rasterio.transform import from_bounds
+from rasterio.warp import Resampling, reproject, transform_bounds
+
+from app import dem_cache, metrics, raster_render, svf, visualizations
+from app.tile_grid import mercator_tile_bounds
+
+TILE_SIZE = 256
+# Pod tímto zoomem by dlaždice pokrývala příliš mnoho listů
+MIN_VIZ_ZOOM = 12
+# Poloměr horizontu pro SVF / openness (při 5 m DEM = 10 px)
+VIZ_RADIUS_M = 50.0
+VIZ_DIRECTIONS = 16
+LRM_RADIUS_M = 50.0
+
+WEB_MERCATOR = RioCRS.from_epsg(3857)
+SJTSK = RioCRS.from_epsg(5514)
+
+
+@dataclass(frozen=True)
+class VizSpec:
+    """Definice vizualizace: výpočet, potřebný okraj a pevný stretch pro všechny dlaždice."""
+    compute: Callable[[np.ndarray, float], np.ndarray]
+    halo_m: float
+    stretch: raster_render.Stretch
+
+
+VIZ_SPECS = {
+    "svf": VizSpec(
+        compute=lambda dem, res: svf.sky_view_factor(dem, res, VIZ_DIRECTIONS, VIZ_RADIUS_M, parallel=False),
+        halo_m=VIZ_RADIUS_M, stretch=raster_render.Stretch(0.75, 1.0),
+    ),
+    "openness": VizSpec(
+        compute=lambda dem, res: svf.positive_openness(dem, res, VIZ_DIRECTIONS, VIZ_RADIUS_M, parallel=False),
+        halo_m=VIZ_RADIUS_M, stretch=raster_render.Stretch(75.0, 95.0),
+    ),
+    "lrm": VizSpec(
+        compute=lambda dem, res: visualizations.local_relief_model(dem, res, LRM_RADIUS_M),
+        halo_m=LRM_RADIUS_M, stretch=raster_render.Stretch(-1.0, 1.0),
+    ),
+    "hillshade": VizSpec(
+        compute=lambda dem, res: visualizations.multidirectional_hillshade(dem, res),
+        halo_m=2 * dem_cache.DEFAULT_RESOLUTION, stretch=raster_render.Stretch(0.0, 1.0),
+    ),
+}
+
+
+def encode_grayscale_alpha(values: np.ndarray, stretch: raster_render.Stretch) -> bytes:
+    """Pevný lineární stretch do 0–255 + alfa kanál (NoData průhledná) → PNG."""
+    la = np.empty(values.shape + (2,), dtype=np.uint8)
+    la[..., 1] = np.where(np.isfinite(values), 255, 0)
+    # normalize_to_uint8 mění pole in-place – hodnoty dlaždice už nejsou potřeba
+    np.nan_to_num(values, copy=False, nan=stretch.vmin)
+    la[..., 0] = raster_render.normalize_to_uint8(values, stretch.vmin, stretch.vmax)
+
+    buffer = io.BytesIO()
+    Image.fromarray(la, mode="LA").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_tile_values(viz: str, z: int, x: int, y: int,
+                       res: float = dem_cache.DEFAULT_RESOLUTION) -> Optional[np.ndarray]:
+    """
+    Spočítá hodnoty vizualizace pro dlaždici z/x/y (float32 256x256, NoData = NaN).
+
+    Returns:
+        None, pokud pro dlaždici nejsou v cache žádná data
+    """
+    spec = VIZ_SPECS[viz]
+    minx, miny, maxx, maxy = mercator_tile_bounds(x, y, z)
+    left, bottom, right, top = transform_bounds(WEB_MERCATOR, SJTSK, minx, miny, maxx, maxy, densify_pts=21)
+
+    # Okno zarovnané na mřížku DEM, aby sousední dlaždice počítaly nad stejnými pixely
+    halo = math.ceil(spec.halo_m / res) * res + res
+    left = math.floor((left - halo) / res) * res
+    bottom = math.floor((bottom - halo) / res) * res
+    right = math.ceil((right + halo) / res) * res
+    top = math.ceil((top + halo) / res) * res
+
+    sheets = dem_cache.find_sheets(left, bottom, right, top)
+    if not sheets:
+        return None
+
+    dem, dem_transform = dem_cache.read_dem_window(left, bottom, right, top, res, sheets)
+    if not np.isfinite(dem).any():
+        return None
+
+    with metrics.stage("compute"):
+        values = spec.compute(dem, res).astype(np.float32, copy=False)
+
+    tile = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    with metrics.stage("reproject"):
+        reproject(
+            source=values,
+            destination=tile,
+            src_transform=dem_transform,
+            src_crs=SJTSK,
+            dst_transform=from_bounds(minx, miny, maxx, maxy, TILE_SIZE, TILE_SIZE),
+            dst_crs=WEB_MERCATOR,
+            resampling=Resampling.bilinear,
+            src_nodata=np.nan,
+            dst_nodata=np.nan,
+        )
+    return tile
+
+
+def render_tile(viz: str, z: int, x: int, y: int) -> Optional[Tuple[bytes, bool]]:
+    """
+    Vyrenderuje PNG dlaždici vizualizace.
+
+    Returns:
+        (PNG, complete) – complete=False pokud dlaždice není celá pokrytá daty;
+        None pokud pro dlaždici nejsou data vůbec
+    """
+    values = render_tile_values(viz, z, x, y)
+    if values is None:
+        return None
+    complete = bool(np.isfinite(values).all())
+    with metrics.stage("encode"):
+        return encode_grayscale_alpha(values, VIZ_SPECS[viz].stretch), complete
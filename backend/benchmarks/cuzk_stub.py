@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Lokální náhrada služeb ČÚZK pro zátěžové testy (bez sítě).
+
+Obsluhuje:
+
+- /atom/DMR5G-SJTSK.xml       – hlavní ATOM feed s mřížkou syntetických listů
+- /atom/dataset/{id}.xml      – dataset feed listu s odkazem na ZIP
+- /atom/laz/{id}.zip          – ZIP se syntetickým LAZ (vygeneruje se při prvním stažení)
+- /wms                        – GetMap: šedotónový PNG hillshade
+- /wcs                        – GetCoverage: float32 GeoTIFF v požadovaném BBOX/CRS
+
+Listy tvoří mřížku rows x cols čtverců SHEET_SIZE_M v S-JTSK od
+benchmarks.synthetic.SJTSK_ORIGIN (okolí Prahy). Chování služeb se řídí
+přepínači (a za běhu přes POST /_stub/config, JSON se stejnými klíči):
+
+- latency_ms / jitter_ms – umělá latence každé odpovědi (normální rozdělení)
+- error_rate             – podíl odpovědí 503
+- throttle_rate          – podíl odpovědí 429 s Retry-After
+
+GET /_stub/stats vrací počty a percentily doby obsluhy podle služby a statusu.
+
+Backend se na stub přepne proměnnými prostředí:
+
+    CUZK_ATOM_FEED_URL=http://127.0.0.1:8765/atom/DMR5G-SJTSK.xml
+    CUZK_WMS_URL=http://127.0.0.1:8765/wms
+    CUZK_WCS_URL=http://127.0.0.1:8765/wcs
+
+Použití:
+    python benchmarks/cuzk_stub.py [--port 8765] [--latency-ms 50] [--error-rate 0.01] [--throttle-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import io
+import random
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pyproj
+import rasterio
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from PIL import Image
+from rasterio.crs import CRS as RioCRS
+from rasterio.transform import from_bounds
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic import SJTSK_ORIGIN, synthetic_dem, write_synthetic_laz  # noqa: E402
+
+SHEET_SIZE_M = 2500.0
+SHEET_RES = 5.0
+SHEET_PREFIX = "CZ-CUZK-DMR5G-SJTSK_STUB"
+
+# Okna pro percentily ve statistikách (posledních N odpovědí na službu)
+STATS_WINDOW = 10000
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    rows: int = 4
+    cols: int = 4
+    points: int = 50_000
+
+
+config = StubConfig()
+app = FastAPI(title="ČÚZK stub")
+
+_stats_lock = threading.Lock()
+_counts: Dict[Tuple[str, int], int] = defaultdict(int)
+_durations: Dict[str, List[float]] = defaultdict(list)
+
+
+def service_name(path: str) -> str:
+    """Služba podle cesty (klíč statistik)."""
+    if path.startswith("/atom/dataset/"):
+        return "dataset_feed"
+    if path.startswith("/atom/laz/"):
+        return "laz_zip"
+    if path.startswith("/atom/"):
+        return "atom_feed"
+    return path.strip("/") or "root"
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Umělá latence, 503 a 429 podle config; mimo /_stub/ se měří do statistik."""
+    if request.url.path.startswith("/_stub/"):
+        return await call_next(request)
+
+    start = time.perf_counter()
+    delay = random.gauss(config.latency_ms, config.jitter_ms) / 1000.0
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    roll = random.random()
+    if roll < config.throttle_rate:
+        response = Response("Too Many Requests", status_code=429, headers={"Retry-After": "1"})
+    elif roll < config.throttle_rate + config.error_rate:
+        response = Response("Service Unavailable", status_code=503)
+    else:
+        response = await call_next(request)
+
+    service = service_name(request.url.path)
+    with _stats_lock:
+        _counts[(service, response.status_code)] += 1
+        durations = _durations[service]
+        durations.append(time.perf_counter() - start)
+        if len(durations) > STATS_WINDOW:
+            del durations[: len(durations) - STATS_WINDOW]
+    return response
+
+
+# --- ATOM ---------------------------------------------------------------------------------------
+
+def sheet_ids() -> List[str]:
+    return [f"{SHEET_PREFIX}{row:02d}{col:02d}" for row in range(config.rows) for col in range(config.cols)]
+
+
+def sheet_origin(sheet_id: str) -> Tuple[float, float]:
+    """Levý horní roh listu v S-JTSK."""
+    code = sheet_id[len(SHEET_PREFIX):]
+    row, col = int(code[:2]), int(code[2:])
+    return SJTSK_ORIGIN[0] + col * SHEET_SIZE_M, SJTSK_ORIGIN[1] - row * SHEET_SIZE_M
+
+
+def _check_sheet(sheet_id: str) -> None:
+    if sheet_id not in sheet_ids():
+        raise HTTPException(status_code=404, detail=f"List {sheet_id} neexistuje")
+
+
+def sheet_polygon(sheet_id: str) -> str:
+    """Obrys listu jako georss:polygon (lat lon ..., uzavřený)."""
+    to_wgs84 = pyproj.Transformer.from_crs(5514, 4326, always_xy=True)
+    left, top = sheet_origin(sheet_id)
+    corners = [(left, top), (left + SHEET_SIZE_M, top), (left + SHEET_SIZE_M, top - SHEET_SIZE_M),
+               (left, top - SHEET_SIZE_M), (left, top)]
+    points = [to_wgs84.transform(x, y) for x, y in corners]
+    return " ".join(f"{lat:.6f} {lon:.6f}" for lon, lat in points)
+
+
+def _feed(title: str, entries: str) -> Response:
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:georss="http://www.georss.org/georss"'
+        ' xmlns:inspire_dls="http://inspire.ec.europa.eu/schemas/inspire_dls/1.0">\n'
+        f"<title>{title}</title>\n{entries}</feed>\n"
+    )
+    return Response(xml, media_type="application/atom+xml")
+
+
+@app.get("/atom/DMR5G-SJTSK.xml")
+def atom_feed(request: Request):
+    base = str(request.base_url).rstrip("/")
+    entries = "".join(
+        "<entry>"
+        f"<title>DMR 5G {sheet_id[len(SHEET_PREFIX):]}</title>"
+        f"<inspire_dls:spatial_dataset_identifier_code>{sheet_id}</inspire_dls:spatial_dataset_identifier_code>"
+        f"<georss:polygon>{sheet_polygon(sheet_id)}</georss:polygon>"
+        f'<link rel="alternate" href="{base}/atom/dataset/{sheet_id}.xml" type="application/atom+xml"/>'
+        "<updated>2025-01-01T00:00:00Z</updated>"
+        "</entry>\n"
+        for sheet_id in sheet_ids()
+    )
+    return _feed("DMR 5G (stub)", entries)
+
+
+@app.get("/atom/dataset/{sheet_id}.xml")
+def dataset_feed(sheet_id: str, request: Request):
+    _check_sheet(sheet_id)
+    base = str(request.base_url).rstrip("/")
+    entry = (
+        f"<entry><title>{sheet_id}</title>"
+        f'<link rel="alternate" href="{base}/atom/laz/{sheet_id}.zip" type="application/zip"/>'
+        "</entry>\n"
+    )
+    return _feed(sheet_id, entry)
+
+
+@lru_cache(maxsize=64)
+def _laz_zip(sheet_id: str, points: int) -> bytes:
+    """ZIP s LAZ listu (deterministický podle pořadí listu)."""
+    seed = sheet_ids().index(sheet_id)
+    size = int(SHEET_SIZE_M / SHEET_RES)
+    dem = synthetic_dem(size, SHEET_RES, seed=seed)
+    # Stejný název jako u ČÚZK: poslední část ID listu
+    laz_name = f"{sheet_id.split('_')[-1]}.laz"
+    with tempfile.TemporaryDirectory(prefix="cuzk_stub_") as tmp:
+        laz_path = write_synthetic_laz(Path(tmp) / laz_name, dem, SHEET_RES, points,
+                                       origin=sheet_origin(sheet_id), seed=seed)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+            zf.write(laz_path, laz_name)
+    return buffer.getvalue()
+
+
+@app.get("/atom/laz/{sheet_id}.zip")
+def laz_zip(sheet_id: str):
+    _check_sheet(sheet_id)
+    return Response(_laz_zip(sheet_id, config.points), media_type="application/zip")
+
+
+# --- WMS / WCS ----------------------------------------------------------------------------------
+
+def _params(request: Request) -> Dict[str, str]:
+    # OGC parametry nerozlišují velikost písmen
+    return {key.upper(): value for key, value in request.query_params.items()}
+
+
+@lru_cache(maxsize=16)
+def _heights(width: int, height: int) -> np.ndarray:
+    size = max(width, height)
+    return synthetic_dem(size, 1.0)[:height, :width] + 20.0
+
+
+@app.get("/wms")
+def wms(request: Request):
+    params = _params(request)
+    width, height = int(params.get("WIDTH", 256)), int(params.get("HEIGHT", 256))
+    heights = _heights(width, height)
+    gy, gx = np.gradient(heights)
+    shade = np.clip(128 + 400 * (gx - gy), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(shade, mode="L").save(buffer, format="PNG", compress_level=1)
+    return Response(buffer.getvalue(), media_type="image/png")
+
+
+@app.get("/wcs")
+def wcs(request: Request):
+    params = _params(request)
+    width, height = int(params.get("WIDTH", 256)), int(params.get("HEIGHT", 256))
+    try:
+        left, bottom, right, top = map(float, params["BBOX"].split(","))
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Chybí nebo je neplatný BBOX")
+    crs = params.get("RESPONSE_CRS") or params.get("CRS", "EPSG:5514")
+
+    profile = dict(driver="GTiff", width=width, height=height, count=1, dtype="float32",
+                   crs=RioCRS.from_string(crs), transform=from_bounds(left, bottom, right, top, width, height),
+                   nodata=-32768.0)
+    with rasterio.MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(_heights(width, height), 1)
+        data = memfile.read()
+    return Response(data, media_type="image/tiff")
+
+
+# --- Řízení stubu -------------------------------------------------------------------------------
+
+@app.get("/_stub/config")
+def get_config():
+    return asdict(config)
+
+
+@app.post("/_stub/config")
+async def set_config(request: Request):
+    """Změní chování stubu za běhu (JSON s libovolnou podmnožinou klíčů StubConfig)."""
+    changes = await request.json()
+    for key, value in changes.items():
+        if not hasattr(config, key):
+            raise HTTPException(status_code=400, detail=f"Neznámý klíč {key}")
+        setattr(config, key, type(getattr(config, key))(value))
+    return asdict(config)
+
+
+@app.get("/_stub/stats")
+def get_stats():
+    with _stats_lock:
+        counts = dict(_counts)
+        durations = {service: np.array(values) for service, values in _durations.items()}
+    services = {}
+    for service, values in durations.items():
+        statuses = {str(status): n for (name, status), n in counts.items() if name == service}
+        services[service] = {
+            "requests": sum(statuses.values()),
+            "statuses": statuses,
+            "p50_ms": float(np.percentile(values, 50) * 1000),
+            "p99_ms": float(np.percentile(values, 99) * 1000),
+        }
+    return JSONResponse(services)
+
+
+@app.post("/_stub/reset")
+def reset_stats():
+    with _stats_lock:
+        _counts.clear()
+        _durations.clear()
+    return {"reset": True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokální stub služeb ČÚZK (ATOM, WMS, WCS)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Průměrná latence odpovědi")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Směrodatná odchylka latence")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Podíl odpovědí 503 (0–1)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Podíl odpovědí 429 (0–1)")
+    parser.add_argument("--rows", type=int, default=4, help="Počet řad listů")
+    parser.add_argument("--cols", type=int, default=4, help="Počet sloupců listů")
+    parser.add_argument("--points", type=int, default=50_000, help="Počet bodů LAZ na list")
+    args = parser.parse_args()
+
+    for key in asdict(config):
+        setattr(config, key, getattr(args, key))
+
+    base = f"http://{args.host}:{args.port}"
+    print("🧪 ČÚZK stub – backend přepněte proměnnými:")
+    print(f"   CUZK_ATOM_FEED_URL={base}/atom/DMR5G-SJTSK.xml")
+    print(f"   CUZK_WMS_URL={base}/wms")
+    print(f"   CUZK_WCS_URL={base}/wcs", flush=True)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Mikrobenchmarky kritických cest backendu na syntetických datech.
+
+Sady (--suites):
+
+- rasterize – rasterize_laz_to_geotiff nad syntetickým LAZ (body/s)
+- dem_tile  – dem_tiles.get_dem_tile z ATOM cache: cold = render z listu,
+              warm = zásah cache dlaždic (dlaždice/s)
+- encode    – kódování DEM dlaždice do všech formátů tile_codecs (dlaždice/s)
+- profile   – vzorkování a sestavení výškového profilu (vzorky/s)
+- svf       – nativní Sky-View Factor (Mpx/s)
+
+Čas je medián z --repeat běhů, špička paměti (tracemalloc) z jednoho
+dalšího běhu – tracemalloc výrazně zpomaluje, do časů se nezapočítává.
+Paměť vidí jen hlavní proces (SVF počítá bloky v process poolu).
+
+Data, katalog i cache dlaždic jsou v dočasném adresáři, skutečná ATOM
+cache se nepoužívá. Výsledky se ukládají jako JSON do benchmarks/results/
+a --baseline je porovná s dřívějším během.
+
+Použití:
+    python benchmarks/hot_paths.py [--suites rasterize,encode] [--repeat 3]
+                                   [--baseline last | PATH]
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pyproj
+from rasterio.transform import from_origin
+from shapely.geometry import LineString
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app import atom_downloader, catalog, dem_tiles, svf, terrain_profile, tile_codecs  # noqa: E402
+from app.tile_grid import tiles_in_bounds  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    SJTSK_ORIGIN, synthetic_dem, write_sjtsk_geotiff, write_synthetic_laz,
+)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Rozlišení listů DMR 5G z rasterizéru
+SHEET_RES = 5.0
+# Levý dolní roh rastru profilu v EPSG:3857 (okolí Prahy)
+PROFILE_ORIGIN_3857 = (1_600_000.0, 6_440_000.0)
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+@contextmanager
+def isolated_cache(root: Path) -> Iterator[Path]:
+    """Přesměruje katalog listů a cache DEM dlaždic do root (po skončení vrátí původní)."""
+    saved = (catalog.GEOTIFF_DIR, catalog.CATALOG_PATH, dem_tiles.dem_tile_cache.root)
+    (root / "geotiff").mkdir(parents=True, exist_ok=True)
+    catalog.GEOTIFF_DIR = root / "geotiff"
+    catalog.CATALOG_PATH = root / "catalog.sqlite"
+    dem_tiles.dem_tile_cache.root = root / "tiles"
+    try:
+        yield root
+    finally:
+        catalog.GEOTIFF_DIR, catalog.CATALOG_PATH, dem_tiles.dem_tile_cache.root = saved
+
+
+def measure(run: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Změří run (setup se volá před každým během a do času se nepočítá).
+
+    Returns:
+        {"seconds": medián, "min_seconds", "peak_mb": špička alokací během run}
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "peak_mb": peak / 1024 ** 2}
+
+
+def result(suite: str, case: str, timing: Dict, work: float, unit: str, **params) -> Dict:
+    return {
+        "suite": suite,
+        "case": case,
+        "params": params,
+        **timing,
+        "throughput": work / timing["seconds"] if timing["seconds"] > 0 else None,
+        "unit": unit,
+    }
+
+
+def bench_rasterize(args, tmp: Path) -> List[Dict]:
+    results = []
+    with isolated_cache(tmp):
+        laz_dir = tmp / "laz"
+        laz_dir.mkdir()
+        dem = synthetic_dem(args.sheet_px, SHEET_RES)
+        for n_points in args.points:
+            laz_path = write_synthetic_laz(laz_dir / f"bench_{n_points}.laz", dem, SHEET_RES, n_points)
+            tif_path = tmp / "geotiff" / f"{laz_path.stem}.tif"
+
+            # Hotový GeoTIFF by rasterizér přeskočil
+            timing = measure(
+                lambda: atom_downloader.rasterize_laz_to_geotiff(laz_path, SHEET_RES, compact=False),
+                args.repeat, setup=lambda: tif_path.unlink(missing_ok=True),
+            )
+            results.append(result("rasterize", f"{n_points} bodů", timing, n_points, "body/s",
+                                  points=n_points, sheet_px=args.sheet_px))
+    return results
+
+
+def _sheet_tiles(z: int, size_px: int, limit: int) -> List[tuple]:
+    """Dlaždice zoomu z uvnitř syntetického listu (nejvýše limit)."""
+    to_wgs84 = pyproj.Transformer.from_crs(5514, 4326, always_xy=True)
+    extent = size_px * SHEET_RES
+    # Okraj 10 % → dlaždice jsou plně pokryté listem
+    left, top = SJTSK_ORIGIN[0] + 0.1 * extent, SJTSK_ORIGIN[1] - 0.1 * extent
+    right, bottom = SJTSK_ORIGIN[0] + 0.9 * extent, SJTSK_ORIGIN[1] - 0.9 * extent
+    west, north = to_wgs84.transform(left, top)
+    east, south = to_wgs84.transform(right, bottom)
+    tiles = [(z, x, y) for x, y in tiles_in_bounds(min(west, east), min(south, north),
+                                                   max(west, east), max(south, north), z)]
+    return tiles[:limit]
+
+
+def bench_dem_tile(args, tmp: Path) -> List[Dict]:
+    results = []
+    with isolated_cache(tmp):
+        write_sjtsk_geotiff(tmp / "geotiff" / "bench.tif", synthetic_dem(args.sheet_px, SHEET_RES),
+                            SHEET_RES)
+        catalog.sync()
+        for z in args.zooms:
+            tiles = _sheet_tiles(z, args.sheet_px, args.tiles)
+            if not tiles:
+                continue
+
+            def render_all():
+                for tile in tiles:
+                    dem_tiles.get_dem_tile(*tile)
+
+            def clear_cache():
+                # Vzorkovací mřížky dlaždic (LRU v procesu) zůstávají – jako na běžícím serveru
+                shutil.rmtree(dem_tiles.dem_tile_cache.layer_dir, ignore_errors=True)
+
+            cold = measure(render_all, args.repeat, setup=clear_cache)
+            results.append(result("dem_tile", f"z{z} cold", cold, len(tiles), "dlaždic/s",
+                                  zoom=z, tiles=len(tiles)))
+            render_all()
+            warm = measure(render_all, args.repeat)
+            results.append(result("dem_tile", f"z{z} warm", warm, len(tiles), "dlaždic/s",
+                                  zoom=z, tiles=len(tiles)))
+    return results
+
+
+def bench_encode(args, tmp: Path) -> List[Dict]:
+    tiles = [synthetic_dem(dem_tiles.TILE_SIZE, 1.0, seed=seed) for seed in range(args.encode_tiles)]
+    # Část dlaždice bez dat jako na okraji pokrytí
+    for tile in tiles[::2]:
+        tile[:, : dem_tiles.TILE_SIZE // 4] = np.nan
+
+    results = []
+    for fmt in tile_codecs.MEDIA_TYPES:
+        sizes = []
+
+        def encode_all():
+            sizes[:] = [len(tile_codecs.encode_tile(tile, fmt)) for tile in tiles]
+
+        timing = measure(encode_all, args.repeat)
+        results.append(result("encode", fmt, timing, len(tiles), "dlaždic/s",
+                              tiles=len(tiles), mean_kb=round(sum(sizes) / len(sizes) / 1024, 1)))
+    return results
+
+
+def bench_profile(args, tmp: Path) -> List[Dict]:
+    res = 1.0
+    size = args.profile_px
+    band = synthetic_dem(size, res)
+    transform = from_origin(0.0, size * res, res, res)
+    # Rastr leží ve Web Mercatoru s počátkem ve středních Čechách (geodetické vzdálenosti)
+    to_wgs84 = pyproj.Transformer.from_crs(3857, 4326, always_xy=True)
+    origin = PROFILE_ORIGIN_3857
+
+    results = []
+    for length in args.profile_lengths:
+        # Úhlopříčka od levého horního rohu, nejvýše přes celý rastr
+        offset = min(length, (size - 2) * res * math.sqrt(2)) / math.sqrt(2)
+        top = size * res - 1.0
+        line = LineString([(1.0, top), (1.0 + offset, top - offset)])
+        line_wgs84 = LineString([to_wgs84.transform(origin[0] + x, origin[1] + y) for x, y in line.coords])
+        fractions = terrain_profile.profile_fractions(
+            line.length, step_m=res, max_points=terrain_profile.MAX_FULL_RES_POINTS
+        )
+
+        def build():
+            xs, ys = terrain_profile.interpolate_line(line, fractions)
+            elevations = terrain_profile.sample_elevations(band, transform, xs, ys)
+            terrain_profile.build_profile(line_wgs84, fractions, elevations, 200)
+
+        timing = measure(build, args.repeat)
+        results.append(result("profile", f"{int(line.length)} m", timing, len(fractions), "vzorky/s",
+                              length_m=round(line.length, 1), samples=len(fractions)))
+    return results
+
+
+def bench_svf(args, tmp: Path) -> List[Dict]:
+    results = []
+    for size in args.svf_sizes:
+        dem = synthetic_dem(size, 1.0)
+        timing = measure(lambda: svf.sky_view_factor(dem, 1.0), args.repeat)
+        results.append(result("svf", f"{size} px", timing, size * size / 1e6, "Mpx/s",
+                              size=size, workers=svf.SVF_WORKERS))
+    return results
+
+
+SUITES = {
+    "rasterize": bench_rasterize,
+    "dem_tile": bench_dem_tile,
+    "encode": bench_encode,
+    "profile": bench_profile,
+    "svf": bench_svf,
+}
+
+
+def run_metadata(args) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+    }
+
+
+def load_baseline(value: str) -> Optional[Dict]:
+    """Předchozí výsledky: cesta k JSON, nebo "last" = poslední uložený běh."""
+    if value == "last":
+        runs = sorted(RESULTS_DIR.glob("*.json"))
+        if not runs:
+            return None
+        path = runs[-1]
+    else:
+        path = Path(value)
+    with path.open() as f:
+        data = json.load(f)
+    data["path"] = str(path)
+    return data
+
+
+def print_results(results: List[Dict], baseline: Optional[Dict]) -> None:
+    previous = {}
+    if baseline:
+        previous = {(r["suite"], r["case"]): r for r in baseline["results"]}
+        print(f"Srovnání s {baseline['path']} ({baseline['meta'].get('commit') or '?'})")
+
+    print(f"{'suite':<10} {'case':<18} {'median s':>9} {'throughput':>20} {'peak MB':>8}  Δ času")
+    for r in results:
+        throughput = f"{r['throughput']:.1f} {r['unit']}" if r["throughput"] else "-"
+        change = ""
+        before = previous.get((r["suite"], r["case"]))
+        if before:
+            change = f"{(r['seconds'] / before['seconds'] - 1) * 100:+.1f} %"
+        print(f"{r['suite']:<10} {r['case']:<18} {r['seconds']:>9.4f} {throughput:>20} "
+              f"{r['peak_mb']:>8.1f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmarky rasterizace, dlaždic a kódování")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Sady čárkou oddělené ({', '.join(SUITES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Počet měřených běhů (medián)")
+    parser.add_argument("--points", type=_sizes, default="100000,500000", help="Počty bodů LAZ")
+    parser.add_argument("--sheet-px", type=int, default=500, help="Velikost syntetického listu (px po 5 m)")
+    parser.add_argument("--zooms", type=_sizes, default="13,15", help="Zoomy pro dem_tile")
+    parser.add_argument("--tiles", type=int, default=32, help="Max. počet dlaždic na zoom")
+    parser.add_argument("--encode-tiles", type=int, default=16, help="Počet dlaždic pro encode")
+    parser.add_argument("--profile-px", type=int, default=4096, help="Velikost rastru pro profil (px po 1 m)")
+    parser.add_argument("--profile-lengths", type=_sizes, default="1000,5000", help="Délky profilů (m)")
+    parser.add_argument("--svf-sizes", type=_sizes, default="512,1024", help="Velikosti DEM pro SVF (px)")
+    parser.add_argument("--output", type=Path, help="Soubor výsledků (default benchmarks/results/<čas>.json)")
+    parser.add_argument("--baseline", help="Porovnat s dřívějším během: cesta k JSON nebo 'last'")
+    parser.add_argument("--no-save", action="store_true", help="Výsledky neukládat")
+    args = parser.parse_args()
+
+    suites = [name for name in args.suites.split(",") if name]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Neznámé sady: {', '.join(sorted(unknown))}")
+
+    # Načíst před během, ať "last" neukáže na právě ukládaný soubor
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    results = []
+    for name in suites:
+        print(f"⏱️  {name} ...", flush=True)
+        with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+            results.extend(SUITES[name](args, Path(tmp)))
+
+    report = {"meta": run_metadata(args), "results": results}
+    print()
+    print_results(results, baseline)
+
+    if not args.no_save:
+        output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\n💾 Výsledky: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Zátěžový test servírování dlaždic a hromadného stahování proti stubu ČÚZK.
+
+Režimy:
+
+- tiles  – klienti simulují posun mapy: výřez viewport px na zoomu, každý krok
+           posune střed o --pan-px (občas změní zoom) a stáhne nově viditelné
+           dlaždice všech vrstev, nejvýše --per-client požadavků souběžně
+           (jako prohlížeč). Dlaždice, kterou už klient má, znovu nestahuje.
+- ingest – spustí scripts/download_czech_republic.py proti stubu (--mode custom)
+           a změří listy/s; latence stahování ukáže statistika stubu.
+
+Report: počet požadavků, propustnost, p50 / p90 / p99 / max latence,
+statusy a rozpad podle X-Data-Source (ATOM / WMS / MBTiles ...).
+
+S --spawn skript sám spustí stub (benchmarks/cuzk_stub.py) a pro tiles
+i backend (uvicorn) s CUZK_* a DATA_CACHE_DIR – bez --cache-dir v dočasném
+adresáři. Se sdíleným --cache-dir lze nejdřív pustit ingest a pak tiles
+nad staženými listy (ATOM cache místo WMS fallbacku).
+
+Použití:
+    python benchmarks/load_test.py tiles --spawn --clients 16 --duration 30
+    python benchmarks/load_test.py ingest --spawn --sheets 8 --parallel 4 --cache-dir /tmp/lt
+    python benchmarks/load_test.py tiles --target http://127.0.0.1:8000 --layers "dem?format=terrarium,hillshade"
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import httpx
+import numpy as np
+import pyproj
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.cuzk_stub import SHEET_SIZE_M  # noqa: E402
+from benchmarks.synthetic import SJTSK_ORIGIN  # noqa: E402
+
+BACKEND_DIR = Path(__file__).parent.parent
+TILE_SIZE = 256
+MIN_ZOOM, MAX_ZOOM = 10, 17
+# Pravděpodobnost změny zoomu v jednom kroku
+ZOOM_CHANCE = 0.1
+
+
+@dataclass
+class Sample:
+    seconds: float
+    status: int
+    source: str
+    size: int
+
+
+def stub_center(rows: int = 4, cols: int = 4) -> Tuple[float, float]:
+    """Střed mřížky listů stubu (lat, lon)."""
+    x = SJTSK_ORIGIN[0] + cols * SHEET_SIZE_M / 2
+    y = SJTSK_ORIGIN[1] - rows * SHEET_SIZE_M / 2
+    lon, lat = pyproj.Transformer.from_crs(5514, 4326, always_xy=True).transform(x, y)
+    return lat, lon
+
+
+def world_px(lat: float, lon: float, z: int) -> Tuple[float, float]:
+    """Pixelové souřadnice bodu ve Web Mercator světě zoomu z."""
+    n = TILE_SIZE * 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def visible_tiles(cx: float, cy: float, z: int, width: int, height: int) -> List[Tuple[int, int, int]]:
+    """Dlaždice ve výřezu se středem (cx, cy) v px, od středu ven (pořadí jako mapové knihovny)."""
+    n = 2 ** z
+    x0, x1 = int((cx - width / 2) // TILE_SIZE), int((cx + width / 2) // TILE_SIZE)
+    y0, y1 = int((cy - height / 2) // TILE_SIZE), int((cy + height / 2) // TILE_SIZE)
+    tiles = [(z, x, y) for x in range(max(x0, 0), min(x1, n - 1) + 1) for y in range(max(y0, 0), min(y1, n - 1) + 1)]
+    ctx, cty = cx / TILE_SIZE, cy / TILE_SIZE
+    return sorted(tiles, key=lambda t: (t[1] + 0.5 - ctx) ** 2 + (t[2] + 0.5 - cty) ** 2)
+
+
+def tile_url(layer: str, z: int, x: int, y: int) -> str:
+    path, _, query = layer.partition("?")
+    return f"/api/tiles/{path}/{z}/{x}/{y}" + (f"?{query}" if query else "")
+
+
+async def fetch(client: httpx.AsyncClient, url: str, samples: List[Sample]) -> None:
+    start = time.perf_counter()
+    try:
+        resp = await client.get(url)
+        status, source, size = resp.status_code, resp.headers.get("x-data-source", ""), len(resp.content)
+    except httpx.HTTPError as exc:
+        status, source, size = 0, type(exc).__name__, 0
+    samples.append(Sample(time.perf_counter() - start, status, source, size))
+
+
+async def pan_client(client: httpx.AsyncClient, args, deadline: float, rng: random.Random,
+                     samples: List[Sample]) -> None:
+    """Jeden uživatel posouvající mapu až do deadline."""
+    z = args.zoom
+    cx, cy = world_px(*args.center, z)
+    heading = rng.uniform(0, 2 * math.pi)
+    loaded: Set[Tuple[str, int, int, int]] = set()
+    slots = asyncio.Semaphore(args.per_client)
+
+    async def load(layer: str, tile: Tuple[int, int, int]):
+        async with slots:
+            # Po konci testu už nové požadavky nezačínat, jen doběhnou rozjeté
+            if time.monotonic() < deadline:
+                await fetch(client, tile_url(layer, *tile), samples)
+
+    while time.monotonic() < deadline:
+        tiles = visible_tiles(cx, cy, z, args.viewport[0], args.viewport[1])
+        missing = [(layer, tile) for tile in tiles for layer in args.layers if (layer, *tile) not in loaded]
+        loaded.update((layer, *tile) for layer, tile in missing)
+        await asyncio.gather(*(load(layer, tile) for layer, tile in missing))
+        await asyncio.sleep(args.think_ms / 1000.0)
+
+        if rng.random() < ZOOM_CHANCE:
+            new_z = min(max(z + rng.choice((-1, 1)), MIN_ZOOM), MAX_ZOOM)
+            scale = 2.0 ** (new_z - z)
+            cx, cy, z = cx * scale, cy * scale, new_z
+        else:
+            # Plynulé posouvání s mírnými změnami směru
+            heading += rng.gauss(0.0, 0.4)
+            cx += args.pan_px * math.cos(heading)
+            cy += args.pan_px * math.sin(heading)
+
+
+def percentiles(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {}
+    values = np.array(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict:
+    by_source = defaultdict(list)
+    for sample in samples:
+        by_source[sample.source or "-"].append(sample.seconds)
+    ok = [s for s in samples if 200 <= s.status < 300]
+    return {
+        "requests": len(samples),
+        "seconds": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "ok": len(ok),
+        "mb_per_s": sum(s.size for s in ok) / 1024 ** 2 / elapsed if elapsed > 0 else 0.0,
+        "statuses": dict(Counter(str(s.status) for s in samples)),
+        "latency": percentiles([s.seconds for s in samples]),
+        "sources": {source: {"requests": len(values), **percentiles(values)}
+                    for source, values in sorted(by_source.items())},
+    }
+
+
+def print_latency(label: str, latency: Dict, count: int) -> None:
+    if not latency:
+        print(f"  {label:<28} {count:>7}")
+        return
+    print(f"  {label:<28} {count:>7} {latency['p50_ms']:>9.1f} {latency['p90_ms']:>9.1f} "
+          f"{latency['p99_ms']:>9.1f} {latency['max_ms']:>9.1f}")
+
+
+def print_tiles_report(report: Dict) -> None:
+    print(f"\n📊 {report['requests']} požadavků za {report['seconds']:.1f} s → "
+          f"{report['throughput_rps']:.1f} req/s, {report['mb_per_s']:.2f} MB/s, OK {report['ok']}")
+    print(f"   Statusy: {report['statuses']}")
+    print(f"  {'':<28} {'n':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print_latency("celkem", report["latency"], report["requests"])
+    for source, stats in report["sources"].items():
+        latency = {key: value for key, value in stats.items() if key != "requests"}
+        print_latency(source, latency, stats["requests"])
+
+
+def print_stub_stats(stats: Dict) -> None:
+    if not stats:
+        return
+    print("\n🧪 Stub ČÚZK (doba obsluhy vč. umělé latence):")
+    for service, values in sorted(stats.items()):
+        print(f"  {service:<14} {values['requests']:>6} req  p50 {values['p50_ms']:>8.1f} ms  "
+              f"p99 {values['p99_ms']:>8.1f} ms  {values['statuses']}")
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Proces skončil dřív, než začal odpovídat: {' '.join(process.args)}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} neodpovídá do {timeout:.0f} s")
+
+
+@contextmanager
+def spawned(cmd: List[str], ready_url: str, env: Optional[Dict[str, str]] = None) -> Iterator[None]:
+    process = subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **(env or {})},
+                               stdout=subprocess.DEVNULL)
+    try:
+        wait_ready(ready_url, process)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def stub_env(stub: str, cache_dir: Path) -> Dict[str, str]:
+    return {
+        "CUZK_ATOM_FEED_URL": f"{stub}/atom/DMR5G-SJTSK.xml",
+        "CUZK_WMS_URL": f"{stub}/wms",
+        "CUZK_WCS_URL": f"{stub}/wcs",
+        "DATA_CACHE_DIR": str(cache_dir),
+    }
+
+
+def stub_command(args) -> List[str]:
+    return [
+        sys.executable, "benchmarks/cuzk_stub.py", "--port", str(args.stub_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+    ]
+
+
+def stub_stats(stub: Optional[str]) -> Dict:
+    if not stub:
+        return {}
+    try:
+        return httpx.get(f"{stub}/_stub/stats", timeout=5.0).json()
+    except httpx.HTTPError:
+        return {}
+
+
+async def run_tiles(args) -> Dict:
+    limits = httpx.Limits(max_connections=args.clients * args.per_client)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        samples: List[Sample] = []
+        start = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(
+            pan_client(client, args, deadline, random.Random(args.seed + i), samples)
+            for i in range(args.clients)
+        ))
+        return summarize(samples, time.perf_counter() - start)
+
+
+def run_ingest(args, stub: str, cache_dir: Path) -> Dict:
+    # custom s celým světem = všechny listy stubu v pořadí feedu, --limit je ořízne
+    cmd = [sys.executable, "scripts/download_czech_republic.py", "--mode", "custom", "--bbox=-90,-180,90,180",
+           "--limit", str(args.sheets), "--parallel", str(args.parallel), "--rate", str(args.rate)]
+    start = time.perf_counter()
+    env = {**os.environ, **stub_env(stub, cache_dir)}
+    if not args.verbose:
+        env["LOG_LEVEL"] = "WARNING"
+    subprocess.run(cmd, cwd=BACKEND_DIR, env=env,
+                   stdout=None if args.verbose else subprocess.DEVNULL, check=False)
+    elapsed = time.perf_counter() - start
+
+    log_path = cache_dir / "dmr5g" / "download_log.json"
+    log = json.loads(log_path.read_text()) if log_path.exists() else {}
+    processed = log.get("downloaded", 0) + log.get("skipped", 0)
+    return {
+        "seconds": elapsed,
+        "sheets": log,
+        "sheets_per_s": processed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zátěžový test dlaždic a stahování proti stubu ČÚZK")
+    parser.add_argument("mode", choices=["tiles", "ingest"])
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="URL backendu (tiles bez --spawn)")
+    parser.add_argument("--stub", help="URL běžícího stubu (bez --spawn; pro ingest a statistiky)")
+    parser.add_argument("--spawn", action="store_true", help="Spustit stub (a pro tiles i backend) automaticky")
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--backend-port", type=int, default=8766)
+    parser.add_argument("--cache-dir", type=Path, help="DATA_CACHE_DIR spuštěných procesů (default dočasný)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latence stubu (jen --spawn)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Rozptyl latence stubu (jen --spawn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Podíl 503 ze stubu (jen --spawn)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Podíl 429 ze stubu (jen --spawn)")
+    # tiles
+    parser.add_argument("--clients", type=int, default=8, help="Souběžní uživatelé")
+    parser.add_argument("--per-client", type=int, default=6, help="Souběžné požadavky na klienta")
+    parser.add_argument("--duration", type=float, default=30.0, help="Délka testu v sekundách")
+    parser.add_argument("--zoom", type=int, default=15, help="Počáteční zoom")
+    parser.add_argument("--center", help="Počáteční střed lat,lon (default střed listů stubu)")
+    parser.add_argument("--viewport", default="1920x1080", help="Velikost výřezu v px")
+    parser.add_argument("--pan-px", type=float, default=200.0, help="Posun na krok v px")
+    parser.add_argument("--think-ms", type=float, default=250.0, help="Pauza mezi kroky")
+    parser.add_argument("--layers", default="dem?format=terrarium",
+                        help="Vrstvy /api/tiles/<vrstva> čárkou oddělené, i s query")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout požadavku v s")
+    parser.add_argument("--seed", type=int, default=0)
+    # ingest
+    parser.add_argument("--sheets", type=int, default=8, help="Počet listů ke stažení")
+    parser.add_argument("--parallel", type=int, default=2, help="Paralelní stahování listů")
+    parser.add_argument("--rate", type=float, default=0.0, help="Pauza mezi listy (s)")
+    parser.add_argument("--verbose", action="store_true", help="Zobrazit výstup download skriptu")
+    parser.add_argument("--output", type=Path, help="Uložit report jako JSON")
+    args = parser.parse_args()
+
+    args.layers = [layer for layer in args.layers.split(",") if layer]
+    args.viewport = tuple(int(v) for v in args.viewport.lower().split("x"))
+    args.center = tuple(map(float, args.center.split(","))) if args.center else stub_center()
+
+    with ExitStack() as stack:
+        cache_dir = args.cache_dir or Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="loadtest_")))
+        stub = args.stub
+        if args.spawn:
+            stub = f"http://127.0.0.1:{args.stub_port}"
+            stack.enter_context(spawned(stub_command(args), f"{stub}/_stub/config"))
+            print(f"🧪 Stub: {stub} (latence {args.latency_ms} ± {args.jitter_ms} ms, "
+                  f"503 {args.error_rate:.0%}, 429 {args.throttle_rate:.0%})")
+
+        if args.mode == "ingest":
+            if not stub:
+                parser.error("ingest potřebuje --stub URL nebo --spawn")
+            print(f"📥 Stahuji {args.sheets} listů, paralelně {args.parallel} → {cache_dir}")
+            report = run_ingest(args, stub, cache_dir)
+            log = report["sheets"]
+            print(f"\n📊 {log.get('downloaded', 0)} staženo, {log.get('skipped', 0)} přeskočeno, "
+                  f"{log.get('failed', 0)} selhalo za {report['seconds']:.1f} s → {report['sheets_per_s']:.2f} listů/s")
+        else:
+            if args.spawn:
+                args.target = f"http://127.0.0.1:{args.backend_port}"
+                stack.enter_context(spawned(
+                    [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.backend_port),
+                     "--log-level", "warning"],
+                    f"{args.target}/metrics", env=stub_env(stub, cache_dir),
+                ))
+            print(f"🗺️  {args.clients} klientů × {args.per_client} spojení, {args.duration:.0f} s, "
+                  f"z{args.zoom} @ {args.center[0]:.4f},{args.center[1]:.4f} → {args.target}")
+            report = asyncio.run(run_tiles(args))
+            print_tiles_report(report)
+
+        report["stub"] = stub_stats(stub)
+        print_stub_stats(report["stub"])
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\n💾 Report: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark nativního Sky-View Factoru proti WhiteboxTools.
+
+Porovná rychlost (sekundy, Mpx/s) a přesnost (RMSE, MAE, korelace)
+nativní implementace app/svf.py s nástrojem WhiteboxTools SkyViewFactor
+na syntetickém DEM.
+
+Použití:
+    python benchmarks/svf_whitebox.py [--sizes 512,1024,2048] [--radius 10] [--directions 16]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import rasterio
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app import svf  # noqa: E402
+from benchmarks.synthetic import synthetic_dem, write_sjtsk_geotiff  # noqa: E402
+
+
+def run_whitebox(dem_path: Path, out_path: Path, n_directions: int, radius_m: float) -> float:
+    """Spustí WhiteboxTools SkyViewFactor, vrací čas v sekundách."""
+    import whitebox
+
+    wbt = whitebox.WhiteboxTools()
+    wbt.set_verbose_mode(False)
+    start = time.perf_counter()
+    ret = wbt.run_tool("sky_view_factor", [
+        f"--dem='{dem_path}'",
+        f"--output='{out_path}'",
+        f"--az_fraction={360.0 / n_directions}",
+        f"--max_dist={radius_m}",
+    ])
+    elapsed = time.perf_counter() - start
+    if ret != 0 or not out_path.exists():
+        raise RuntimeError("WhiteboxTools sky_view_factor selhal")
+    return elapsed
+
+
+def compare(native: np.ndarray, reference: np.ndarray, margin: int) -> dict:
+    """Porovná výsledky bez okrajového pásu (okraje počítají nástroje různě)."""
+    a = native[margin:-margin, margin:-margin]
+    b = reference[margin:-margin, margin:-margin]
+    valid = np.isfinite(a) & np.isfinite(b)
+    diff = a[valid] - b[valid]
+    return {
+        "rmse": float(np.sqrt(np.mean(diff ** 2))),
+        "mae": float(np.mean(np.abs(diff))),
+        "corr": float(np.corrcoef(a[valid], b[valid])[0, 1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SVF: nativní vs. WhiteboxTools")
+    parser.add_argument("--sizes", default="512,1024,2048", help="Velikosti DEM (px), čárkou oddělené")
+    parser.add_argument("--res", type=float, default=1.0, help="Velikost pixelu (m)")
+    parser.add_argument("--radius", type=float, default=10.0, help="Poloměr horizontu (m)")
+    parser.add_argument("--directions", type=int, default=16, help="Počet směrů")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'native s':>9} {'Mpx/s':>7} {'wbt s':>8} {'speedup':>8} {'rmse':>7} {'corr':>6}")
+    for size in map(int, args.sizes.split(",")):
+        dem = synthetic_dem(size, args.res)
+
+        start = time.perf_counter()
+        native = svf.sky_view_factor(dem, args.res, n_directions=args.directions, radius_m=args.radius)
+        native_s = time.perf_counter() - start
+        mpx = size * size / native_s / 1e6
+
+        with tempfile.TemporaryDirectory(prefix="svf_bench_") as tmp:
+            dem_path = write_sjtsk_geotiff(Path(tmp) / "dem.tif", dem, args.res)
+            out_path = Path(tmp) / "svf_wbt.tif"
+            try:
+                wbt_s = run_whitebox(dem_path, out_path, args.directions, args.radius)
+                with rasterio.open(out_path) as src:
+                    reference = src.read(1, masked=True).filled(np.nan).astype(np.float32)
+            except Exception as exc:
+                print(f"{size:>6} {native_s:>9.3f} {mpx:>7.2f}   WhiteboxTools nedostupné: {exc}")
+                continue
+
+        margin = int(round(args.radius / args.res)) + 1
+        stats = compare(native, reference, margin)
+        print(f"{size:>6} {native_s:>9.3f} {mpx:>7.2f} {wbt_s:>8.3f} {wbt_s / native_s:>7.1f}x "
+              f"{stats['rmse']:>7.4f} {stats['corr']:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Syntetická testovací data pro benchmarky (bez závislosti na ČÚZK).
+
+DEM napodobuje krajinu s archeologickými strukturami: zvlněný terén,
+příkopy, valy a mohyly + šum odpovídající přesnosti DMR 5G.
+Mračno bodů (LAZ) vzniká náhodným vzorkováním stejného DEM.
+"""
+
+from pathlib import Path
+from typing import Tuple
+
+import laspy
+import numpy as np
+import rasterio
+from rasterio.crs import CRS as RioCRS
+from rasterio.transform import from_origin
+
+# Levý horní roh syntetického listu v S-JTSK (okolí Prahy)
+SJTSK_ORIGIN = (-745000.0, -1040000.0)
+
+
+def synthetic_dem(size: int, res: float = 1.0, seed: int = 0) -> np.ndarray:
+    """Vygeneruje float32 DEM size x size pixelů (výšky v metrech)."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) * res
+
+    # Zvlněný terén ~ 250–320 m n. m.
+    dem = 280.0 + 25.0 * np.sin(xx / 700.0) * np.cos(yy / 900.0) + 0.01 * xx
+
+    # Příkopy a valy (lineární struktury)
+    for i in range(1, 4):
+        y0 = size * res * i / 4
+        dist = np.abs(yy - y0 - 0.2 * xx)
+        dem -= 1.5 * np.exp(-(dist / 3.0) ** 2)
+        dem += 1.0 * np.exp(-((dist - 8.0) / 4.0) ** 2)
+
+    # Mohyly
+    for _ in range(max(1, size // 100)):
+        cy, cx = rng.uniform(0, size * res, 2)
+        r2 = (yy - cy) ** 2 + (xx - cx) ** 2
+        dem += 2.0 * np.exp(-r2 / 60.0)
+
+    dem += rng.normal(0.0, 0.09, dem.shape)
+    return dem.astype(np.float32)
+
+
+def write_sjtsk_geotiff(path: Path, dem: np.ndarray, res: float = 1.0,
+                        origin: Tuple[float, float] = SJTSK_ORIGIN, **creation_options) -> Path:
+    """Zapíše DEM jako GeoTIFF v S-JTSK (EPSG:5514) se stejnými volbami jako rasterizer."""
+    options = {"compress": "deflate", "nodata": -32768.0}
+    options.update(creation_options)
+    with rasterio.open(
+        path, "w", driver="GTiff",
+        height=dem.shape[0], width=dem.shape[1], count=1,
+        dtype=dem.dtype, crs=RioCRS.from_epsg(5514),
+        transform=from_origin(origin[0], origin[1], res, res),
+        **options
+    ) as dst:
+        dst.write(dem, 1)
+    return path
+
+
+def write_synthetic_laz(path: Path, dem: np.ndarray, res: float = 1.0, n_points: int = 100_000,
+                        origin: Tuple[float, float] = SJTSK_ORIGIN, seed: int = 0) -> Path:
+    """
+    Zapíše mračno n_points bodů terénu nad DEM jako LAZ (LAS 1.4) v S-JTSK.
+
+    Body leží náhodně v ploše DEM, výška je nejbližší pixel + šum 5 cm,
+    třída 2 (terén) – jako klasifikované body DMR 5G. Přípona .las zapíše
+    nekomprimovaný LAS.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = dem.shape
+    cols = rng.uniform(0, width, n_points)
+    rows = rng.uniform(0, height, n_points)
+
+    header = laspy.LasHeader(point_format=6, version="1.4")
+    header.scales = np.array([0.01, 0.01, 0.01])
+    header.offsets = np.array([origin[0], origin[1] - height * res, 0.0])
+    las = laspy.LasData(header)
+    las.x = origin[0] + cols * res
+    las.y = origin[1] - rows * res
+    las.z = dem[rows.astype(int), cols.astype(int)] + rng.normal(0.0, 0.05, n_points)
+    las.classification = np.full(n_points, 2, dtype=np.uint8)
+    las.write(path)
+    return path
@@ -46,6 +46,10 @@ from app.atom_downloader import (
     AtomMapSheet,
     CACHE_DIR
 )
+from app import logging_config
+
+# Víc souběžných downloadů ČÚZK neunese (viz --parallel)
+MAX_PARALLEL = 4
 
 # Definice českých měst (top 30 podle počtu obyvatel)
 CZECH_CITIES = [
@@ -201,14 +205,15 @@ async def download_sheet(sheet: AtomMapSheet, stats: DownloadStats,
         
         stats.total_size_mb += zip_path.stat().st_size / (1024 * 1024)
         
-        # 3. Extrahuj LAZ
-        laz_path = extract_laz_from_zip(zip_path)
+        # 3. Extrahuj LAZ a 4. rasterizuj – blokující práce mimo event loop,
+        # aby ostatní paralelní downloady mezitím běžely
+        loop = asyncio.get_running_loop()
+        laz_path = await loop.run_in_executor(None, extract_laz_from_zip, zip_path)
         if not laz_path:
             stats.failed += 1
             return False
         
-        # 4. Rasterizuj
-        tif_path = rasterize_laz_to_geotiff(laz_path, resolution=5.0)
+        tif_path = await loop.run_in_executor(None, rasterize_laz_to_geotiff, laz_path, 5.0)
         if not tif_path:
             stats.failed += 1
             return False
@@ -240,15 +245,20 @@ async def download_batch(sheets: List[AtomMapSheet], rate_limit: float = 2.0,
     print(f"⏭️  Skip existing: {skip_existing}")
     print(f"{'='*60}\n")
     
-    # Stahuj po jednom (nebo parallel)
-    for i, sheet in enumerate(sheets):
-        print(f"\n[{i+1}/{stats.total_sheets}] ", end="")
-        
-        await download_sheet(sheet, stats, skip_existing)
-        
-        # Rate limiting
-        if i < len(sheets) - 1:  # Ne po posledním
-            await asyncio.sleep(rate_limit)
+    # Stahuj po jednom (nebo parallel) – každý slot drží pauzu rate_limit po svém listu
+    slots = asyncio.Semaphore(min(max(1, parallel), MAX_PARALLEL))
+
+    async def download_slot(i: int, sheet: AtomMapSheet):
+        async with slots:
+            print(f"\n[{i+1}/{stats.total_sheets}] ", end="")
+            
+            await download_sheet(sheet, stats, skip_existing)
+            
+            # Rate limiting
+            if i < len(sheets) - 1:  # Ne po posledním
+                await asyncio.sleep(rate_limit)
+
+    await asyncio.gather(*(download_slot(i, sheet) for i, sheet in enumerate(sheets)))
     
     # Finální statistiky
     print(f"\n{'='*60}")
@@ -282,6 +292,17 @@ async def download_batch(sheets: List[AtomMapSheet], rate_limit: float = 2.0,
     print(f"📝 Log uložen: {log_file}")
 
 
+def parallel_count(value: str) -> int:
+    """Hodnota --parallel v rozsahu 1..MAX_PARALLEL."""
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Neplatný počet: {value}")
+    if not 1 <= count <= MAX_PARALLEL:
+        raise argparse.ArgumentTypeError(f"Paralelnost musí být 1–{MAX_PARALLEL}")
+    return count
+
+
 async def main():
     parser = argparse.ArgumentParser(description="Stažení DMR 5G dat pro ČR")
     parser.add_argument("--mode", choices=["full", "cities", "regions", "custom", "test"],
@@ -290,10 +311,13 @@ async def main():
     parser.add_argument("--bbox", help="Custom bbox: min_lat,min_lon,max_lat,max_lon")
     parser.add_argument("--limit", type=int, help="Max počet listů")
     parser.add_argument("--rate", type=float, default=2.0, help="Rate limit (sekundy)")
-    parser.add_argument("--parallel", type=int, default=1, help="Paralelní downloady")
+    parser.add_argument("--parallel", type=parallel_count, default=1,
+                       help=f"Paralelní downloady (max {MAX_PARALLEL})")
     parser.add_argument("--no-skip", action="store_true", help="Nestahuj již existující")
     
     args = parser.parse_args()
+    # Průběh downloaderu (stahování, rasterizace) jde přes logging
+    logging_config.configure_logging()
     
     # 1. Načti ATOM feed
     print("📡 Stahuji ATOM feed...")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Export pyramidy DEM dlaždic z ATOM cache do jednoho MBTiles archivu.
+
+Archiv obsahuje Terrarium PNG (standardní tabulka tiles) i syrové float32
+dlaždice (tabulka tiles_float32). Server z něj odpovídá na /api/tiles/dem
+bez převzorkování (viz app/mbtiles.py), archiv lze servírovat i staticky
+libovolným MBTiles serverem.
+
+Dlaždice se berou z cache dlaždic (scripts/seed_tiles.py), chybějící se
+vyrenderují paralelně z listů. Dlaždice s místy bez dat (okraj pokrytí)
+se do archivu nezapisují – server je renderuje z ATOM cache, takže se po
+stažení sousedních listů doplní. Archiv se zapisuje do dočasného souboru
+a na místo se přesune až po dokončení – běžící server tak přejde na nový
+export atomicky.
+
+Použití:
+    python export_mbtiles.py [--mode MODE] [--zoom 10-15] [--output PATH]
+
+Režimy a přepínače --region, --bbox, --zoom, --workers jsou stejné
+jako u seed_tiles.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app import dem_tiles, mbtiles, tile_codecs
+from seed_tiles import CZECH_REGIONS, PROGRESS_INTERVAL, collect_tiles, parse_zoom, run_chunks
+
+NODATA = tile_codecs.TERRARIUM_NODATA
+
+
+def encode_chunk(tiles: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int, Optional[bytes], Optional[bytes]]]:
+    """Načte / vyrenderuje dávku dlaždic a zakóduje je (běží ve worker procesu)."""
+    result = []
+    for z, x, y in tiles:
+        try:
+            tile = dem_tiles.export_tile(z, x, y)
+        except Exception as e:
+            print(f"❌ Chyba při renderování {z}/{x}/{y}: {e}")
+            tile = None
+        # Neúplnou dlaždici by archiv (s předností před ATOM cache) držel i po doplnění listů
+        if tile is None or not np.isfinite(tile).all():
+            result.append((z, x, y, None, None))
+            continue
+        result.append((
+            z, x, y,
+            # Export běží offline → nejvyšší komprese PNG
+            tile_codecs.terrarium_png(tile, NODATA, compress_level=9),
+            tile_codecs.float32_raw(tile, NODATA),
+        ))
+    return result
+
+
+def archive_bounds(tiles: List[Tuple[int, int, int]]) -> str:
+    """Obálka exportovaných dlaždic ve WGS84 pro metadata (west,south,east,north)."""
+    z = max(t[0] for t in tiles)
+    xs = [t[1] for t in tiles if t[0] == z]
+    ys = [t[2] for t in tiles if t[0] == z]
+    n = 2 ** z
+    west, east = min(xs) / n * 360.0 - 180.0, (max(xs) + 1) / n * 360.0 - 180.0
+    north = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * min(ys) / n)))))
+    south = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (max(ys) + 1) / n)))))
+    return f"{west:.6f},{south:.6f},{east:.6f},{north:.6f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export DEM dlaždic z ATOM cache do MBTiles")
+    parser.add_argument("--mode", choices=["catalog", "regions", "custom"], default="catalog",
+                        help="Rozsah exportu")
+    parser.add_argument("--region", help="Název kraje (pro mode=regions)")
+    parser.add_argument("--bbox", help="Custom bbox: min_lat,min_lon,max_lat,max_lon")
+    parser.add_argument("--zoom", type=parse_zoom, default=(10, 15), help="Rozsah zoomů, např. 12-15")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Počet procesů")
+    parser.add_argument("--output", type=Path, default=mbtiles.DEM_MBTILES_PATH,
+                        help=f"Výstupní archiv (default {mbtiles.DEM_MBTILES_PATH})")
+
+    args = parser.parse_args()
+
+    bbox = None
+    if args.mode == "regions":
+        if not args.region or args.region not in CZECH_REGIONS:
+            print("❌ Zadejte platný kraj pomocí --region")
+            print(f"Dostupné kraje: {', '.join(CZECH_REGIONS.keys())}")
+            return
+        bbox = CZECH_REGIONS[args.region]["bbox"]
+    elif args.mode == "custom":
+        if not args.bbox:
+            print("❌ Pro custom mode zadejte --bbox min_lat,min_lon,max_lat,max_lon")
+            return
+        bbox = tuple(map(float, args.bbox.split(',')))
+
+    tiles = collect_tiles(bbox, args.zoom)
+    if not tiles:
+        print("❌ V oblasti nejsou žádné stažené listy (viz download_czech_republic.py)")
+        return
+
+    print(f"📦 Export {len(tiles)} dlaždic (zoom {args.zoom[0]}–{args.zoom[1]}) → {args.output}")
+    start_time = time.time()
+    last_report = start_time
+    written = done = 0
+
+    metadata = {
+        "name": "DMR 5G",
+        "description": "Digitální model reliéfu ČR 5. generace (ČÚZK), výšky Bpv v metrech",
+        "format": "png",
+        "encoding": "terrarium",
+        "type": "baselayer",
+        "version": "1",
+        "minzoom": str(args.zoom[0]),
+        "maxzoom": str(args.zoom[1]),
+        "bounds": archive_bounds(tiles),
+        "attribution": "© ČÚZK",
+        "float32_nodata": str(NODATA),
+        "generated": datetime.now().isoformat(),
+    }
+
+    workers = max(1, args.workers)
+    with mbtiles.MBTilesWriter(args.output, metadata) as writer, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        # Omezený počet rozpracovaných dávek jako u seed_tiles.py – zakódované dlaždice
+        # se zapisují průběžně a nehromadí se v paměti
+        for batch in run_chunks(pool, encode_chunk, tiles, workers * 4):
+            for z, x, y, png, raw in batch:
+                done += 1
+                if png is None:
+                    continue
+                writer.put("terrarium", z, x, y, png)
+                writer.put("float32", z, x, y, raw)
+                written += 1
+
+            if time.time() - last_report > PROGRESS_INTERVAL:
+                elapsed = time.time() - start_time
+                rate = done / elapsed
+                print(f"📊 {done / len(tiles) * 100:5.1f}% ({done}/{len(tiles)}) | "
+                      f"📦 {written} zapsáno, ∅ {done - written} bez dat / neúplných | {rate:.1f} dlaždic/s, "
+                      f"zbývá ~{(len(tiles) - done) / rate / 60:.0f} min", flush=True)
+                last_report = time.time()
+        writer.set_metadata("tile_count", str(written))
+
+    elapsed = time.time() - start_time
+    size_mb = args.output.stat().st_size / 1024 ** 2
+    print(f"🏁 Hotovo za {elapsed / 60:.1f} min: {written} dlaždic ({done - written} bez dat / neúplných "
+          f"vynecháno), {size_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
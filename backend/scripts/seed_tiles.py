@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Předgenerování DEM dlaždic (/api/tiles/dem) z ATOM cache DMR 5G.
+
+Dlaždice se renderují paralelně z již stažených listů (viz
+download_czech_republic.py) a zapisují do diskové cache dlaždic, takže
+první návštěvník oblasti nečeká na převzorkování.
+
+- Resume: dlaždice, které už jsou v cache a jsou novější než jejich
+  listy, se přeskočí – přerušený běh stačí spustit znovu
+- Generují se jen dlaždice překrývající stažené listy
+- Průběžný progress (počty, rychlost, odhad zbývajícího času)
+
+Použití:
+    python seed_tiles.py [--mode MODE] [--zoom 10-15] [--workers N]
+
+Režimy:
+    --mode catalog   Všechny listy v katalogu (default)
+    --mode regions   Listy v kraji (--region praha)
+    --mode custom    Listy v bbox (--bbox min_lat,min_lon,max_lat,max_lon)
+
+Přepínače:
+    --zoom Z1-Z2     Rozsah zoomů (default: 10-15)
+    --workers N      Počet procesů (default: počet jader)
+    --force          Přegeneruj i platné dlaždice v cache
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from rasterio.warp import transform_bounds
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app import catalog, dem_cache, dem_tiles
+from app.tile_grid import tiles_in_bounds
+from download_czech_republic import CZECH_REGIONS
+
+# Počet dlaždic na jednu úlohu pro worker (méně režie IPC)
+CHUNK_SIZE = 64
+PROGRESS_INTERVAL = 5.0
+
+
+def parse_zoom(value: str) -> Tuple[int, int]:
+    """'12-15' → (12, 15), '14' → (14, 14)."""
+    parts = value.split("-")
+    try:
+        low, high = int(parts[0]), int(parts[-1])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Neplatný rozsah zoomů: {value}")
+    if len(parts) > 2 or low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"Neplatný rozsah zoomů: {value}")
+    if low < dem_tiles.MIN_DEM_ZOOM:
+        raise argparse.ArgumentTypeError(f"Minimální zoom DEM dlaždic je {dem_tiles.MIN_DEM_ZOOM}")
+    return low, high
+
+
+def collect_tiles(bbox: Optional[tuple], zooms: Tuple[int, int]) -> List[Tuple[int, int, int]]:
+    """
+    Dlaždice překrývající listy v katalogu (volitelně jen v bbox).
+
+    Args:
+        bbox: (min_lat, min_lon, max_lat, max_lon) ve WGS84, None = celý katalog
+    """
+    sjtsk_bbox = None
+    if bbox:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        sjtsk_bbox = dem_cache.wgs84_bounds_to_sjtsk(min_lon, min_lat, max_lon, max_lat)
+    rows, _ = catalog.query_sheets(sjtsk_bbox)
+
+    tiles = set()
+    for row in rows:
+        west, south, east, north = transform_bounds(
+            dem_tiles.SJTSK, "EPSG:4326", row["min_x"], row["min_y"], row["max_x"], row["max_y"], densify_pts=21
+        )
+        if bbox:
+            west, south = max(west, min_lon), max(south, min_lat)
+            east, north = min(east, max_lon), min(north, max_lat)
+            if west >= east or south >= north:
+                continue
+        for z in range(zooms[0], zooms[1] + 1):
+            tiles.update((z, x, y) for x, y in tiles_in_bounds(west, south, east, north, z))
+    return sorted(tiles)
+
+
+def seed_chunk(tiles: List[Tuple[int, int, int]], force: bool) -> Counter:
+    """Vyrenderuje dávku dlaždic (běží ve worker procesu)."""
+    result = Counter()
+    for z, x, y in tiles:
+        try:
+            result[dem_tiles.seed_tile(z, x, y, force)] += 1
+        except Exception as e:
+            print(f"❌ Chyba při renderování {z}/{x}/{y}: {e}")
+            result["failed"] += 1
+    return result
+
+
+def chunks(tiles: List[Tuple[int, int, int]]) -> Iterator[List[Tuple[int, int, int]]]:
+    for i in range(0, len(tiles), CHUNK_SIZE):
+        yield tiles[i:i + CHUNK_SIZE]
+
+
+def run_chunks(pool: ProcessPoolExecutor, fn: Callable, tiles: List[Tuple[int, int, int]],
+               max_pending: int, *args) -> Iterator:
+    """
+    Výsledky fn(dávka, *args) pro všechny dávky v pořadí dokončení.
+
+    Rozpracovaných dávek je nejvýše max_pending – hotové výsledky se
+    nehromadí v paměti ani u celorepublikového běhu.
+    """
+    pending = set()
+    batches = chunks(tiles)
+    while True:
+        while len(pending) < max_pending:
+            batch = next(batches, None)
+            if batch is None:
+                break
+            pending.add(pool.submit(fn, batch, *args))
+        if not pending:
+            return
+
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            yield future.result()
+
+
+class SeedStats:
+    """Statistiky seedování."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.counts = Counter()
+        self.start_time = time.time()
+
+    @property
+    def done(self) -> int:
+        return sum(self.counts.values())
+
+    def print_progress(self):
+        elapsed = time.time() - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else 0.0
+        print(
+            f"📊 {self.done / max(self.total, 1) * 100:5.1f}% ({self.done}/{self.total}) | "
+            f"✅ {self.counts['rendered']} vyrenderováno, ⏭️  {self.counts['cached']} v cache, "
+            f"∅ {self.counts['empty']} bez dat, ❌ {self.counts['failed']} | "
+            f"{rate:.1f} dlaždic/s, zbývá ~{remaining / 60:.0f} min",
+            flush=True,
+        )
+
+
+def seed(tiles: List[Tuple[int, int, int]], workers: int, force: bool) -> SeedStats:
+    """Renderuje dlaždice v procesovém poolu s omezeným počtem rozpracovaných dávek."""
+    stats = SeedStats(len(tiles))
+    last_report = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for counts in run_chunks(pool, seed_chunk, tiles, workers * 4, force):
+            stats.counts.update(counts)
+
+            if time.time() - last_report > PROGRESS_INTERVAL:
+                stats.print_progress()
+                last_report = time.time()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Předgenerování DEM dlaždic z ATOM cache")
+    parser.add_argument("--mode", choices=["catalog", "regions", "custom"], default="catalog",
+                        help="Rozsah seedování")
+    parser.add_argument("--region", help="Název kraje (pro mode=regions)")
+    parser.add_argument("--bbox", help="Custom bbox: min_lat,min_lon,max_lat,max_lon")
+    parser.add_argument("--zoom", type=parse_zoom, default=(10, 15), help="Rozsah zoomů, např. 12-15")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Počet procesů")
+    parser.add_argument("--force", action="store_true", help="Přegeneruj i platné dlaždice")
+
+    args = parser.parse_args()
+
+    bbox = None
+    if args.mode == "regions":
+        if not args.region or args.region not in CZECH_REGIONS:
+            print("❌ Zadejte platný kraj pomocí --region")
+            print(f"Dostupné kraje: {', '.join(CZECH_REGIONS.keys())}")
+            return
+        bbox = CZECH_REGIONS[args.region]["bbox"]
+        print(f"🗺️  Režim: KRAJ {CZECH_REGIONS[args.region]['name']}")
+    elif args.mode == "custom":
+        if not args.bbox:
+            print("❌ Pro custom mode zadejte --bbox min_lat,min_lon,max_lat,max_lon")
+            return
+        bbox = tuple(map(float, args.bbox.split(',')))
+        print(f"📍 Režim: CUSTOM BBOX {bbox}")
+    else:
+        print(f"🌍 Režim: CELÝ KATALOG ({catalog.sheet_count()} listů)")
+
+    tiles = collect_tiles(bbox, args.zoom)
+    if not tiles:
+        print("❌ V oblasti nejsou žádné stažené listy (viz download_czech_republic.py)")
+        return
+
+    print(f"\n{'='*60}")
+    print(f"🚀 SEEDOVÁNÍ DEM DLAŽDIC")
+    print(f"{'='*60}")
+    print(f"📊 Dlaždic: {len(tiles)} (zoom {args.zoom[0]}–{args.zoom[1]})")
+    print(f"🔄 Procesů: {args.workers}")
+    print(f"📁 Cache: {dem_tiles.dem_tile_cache.layer_dir}")
+    print(f"{'='*60}\n")
+
+    stats = seed(tiles, max(1, args.workers), args.force)
+    elapsed = time.time() - stats.start_time
+
+    print(f"\n{'='*60}")
+    print(f"🏁 DOKONČENO za {elapsed / 60:.1f} min")
+    print(f"{'='*60}")
+    stats.print_progress()
+
+    log_file = dem_tiles.dem_tile_cache.layer_dir / "seed_log.json"
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with log_file.open('w') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "mode": args.mode,
+            "bbox": bbox,
+            "zoom": list(args.zoom),
+            "total_tiles": stats.total,
+            **stats.counts,
+            "time_seconds": elapsed,
+        }, f, indent=2)
+    print(f"📝 Log uložen: {log_file}")
+
+
+if __name__ == "__main__":
+    main()
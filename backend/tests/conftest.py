@@ -0,0 +1,15 @@
+"""
+Společné nastavení testů.
+
+Testy pokrývají čisté funkce backendu (bez sítě a bez stažených listů).
+Moduly app.* při importu zakládají adresáře v data_cache – testy proto
+běží nad dočasným DATA_CACHE_DIR, pokud není nastavený.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("DATA_CACHE_DIR", tempfile.mkdtemp(prefix="earcheo-tests-"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,77 @@
+import asyncio
+
+from app import jobs
+
+
+def test_hash_job_is_deterministic():
+    a = jobs.hash_job("svf", {"radius": 10, "directions": 16}, "abc")
+    b = jobs.hash_job("svf", {"directions": 16, "radius": 10}, "abc")
+    assert a == b
+    assert a != jobs.hash_job("svf", {"radius": 10, "directions": 16}, "abd")
+    assert a != jobs.hash_job("openness", {"radius": 10, "directions": 16}, "abc")
+
+
+def test_submit_deduplicates_by_id():
+    calls = []
+
+    async def runner(job):
+        calls.append(job.job_id)
+        await asyncio.sleep(0.01)
+        return jobs.JobResult(data={"ok": True})
+
+    async def scenario():
+        manager = jobs.JobManager(max_workers=1, ttl=60)
+        first, first_dup = manager.submit("svf", "dedup-job", runner)
+        second, second_dup = manager.submit("svf", "dedup-job", runner)
+        await asyncio.gather(*manager._tasks)
+        third, third_dup = manager.submit("svf", "dedup-job", runner)
+        return first, first_dup, second, second_dup, third, third_dup
+
+    first, first_dup, second, second_dup, third, third_dup = asyncio.run(scenario())
+    assert (first_dup, second_dup, third_dup) == (False, True, True)
+    assert first is second is third
+    assert first.status == "done" and first.result.data == {"ok": True}
+    assert calls == ["dedup-job"]
+
+
+def test_failed_job_runs_again():
+    attempts = []
+
+    async def runner(job):
+        attempts.append(job.job_id)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return jobs.JobResult(data=len(attempts))
+
+    async def scenario():
+        manager = jobs.JobManager(max_workers=1, ttl=60)
+        failed, _ = manager.submit("profile", "retry-job", runner)
+        await asyncio.gather(*manager._tasks)
+        retried, deduplicated = manager.submit("profile", "retry-job", runner)
+        await asyncio.gather(*manager._tasks)
+        return failed, retried, deduplicated
+
+    failed, retried, deduplicated = asyncio.run(scenario())
+    assert failed.status == "failed" and failed.error == "boom"
+    assert not deduplicated and retried.status == "done" and retried.result.data == 2
+
+
+def test_expired_results_are_purged():
+    async def runner(job):
+        (job.workdir / "result.bin").write_bytes(b"x")
+        return jobs.JobResult(path=job.workdir / "result.bin")
+
+    async def scenario():
+        manager = jobs.JobManager(max_workers=1, ttl=60)
+        job, _ = manager.submit("svf", "ttl-job", runner)
+        await asyncio.gather(*manager._tasks)
+        return manager, job
+
+    manager, job = asyncio.run(scenario())
+    assert manager.get("ttl-job") is job
+    assert job.workdir.exists()
+
+    job.finished -= 61
+    assert manager.get("ttl-job") is None
+    assert "ttl-job" not in manager.known_ids()
+    assert not job.workdir.exists()
@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+
+from app import logging_config
+from app.logging_config import RateLimitFilter
+
+
+def make_record(msg: str = "Staženo %s", name: str = "app.test", **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord({"name": name, "msg": msg, "args": ("x",), "levelno": logging.INFO})
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_limit_per_template_and_logger(clock):
+    rate_filter = RateLimitFilter(limit=3, window=10)
+    passed = [rate_filter.filter(make_record()) for _ in range(5)]
+    assert passed == [True, True, True, False, False]
+    # Jiná šablona i jiný logger mají vlastní okno
+    assert rate_filter.filter(make_record("Jiná zpráva %s"))
+    assert rate_filter.filter(make_record(name="app.other"))
+
+
+def test_suppressed_count_on_next_window(clock):
+    rate_filter = RateLimitFilter(limit=1, window=10)
+    assert rate_filter.filter(make_record())
+    assert not rate_filter.filter(make_record())
+    assert not rate_filter.filter(make_record())
+
+    clock[0] += 10
+    record = make_record()
+    assert rate_filter.filter(record)
+    assert record.suppressed == 2
+
+    clock[0] += 10
+    record = make_record()
+    assert rate_filter.filter(record)
+    assert not hasattr(record, "suppressed")
+
+
+def test_zero_limit_disables_rate_limiting(clock):
+    rate_filter = RateLimitFilter(limit=0, window=10)
+    assert all(rate_filter.filter(make_record()) for _ in range(100))
+
+
+def test_sampling(clock, monkeypatch):
+    rate_filter = RateLimitFilter(limit=0, window=10)
+    monkeypatch.setattr(logging_config.random, "random", lambda: 0.7)
+    assert not rate_filter.filter(make_record(sample=0.5))
+    assert rate_filter.filter(make_record(sample=0.9))
+    assert rate_filter.filter(make_record())
+
+
+def test_formatters_include_extra_fields():
+    record = make_record(sheet="PRAH12", bytes=1024)
+    text = logging_config.TextFormatter().format(record)
+    assert text.endswith("app.test: Staženo x sheet=PRAH12 bytes=1024")
+    json_line = logging_config.JsonFormatter().format(record)
+    assert '"msg": "Staženo x"' in json_line and '"sheet": "PRAH12"' in json_line
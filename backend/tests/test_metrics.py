@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import re
+import threading
+
+import pytest
+
+from app import metrics
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_]+="(?:[^"\\]|\\.)*"(,[a-zA-Z_]+="(?:[^"\\]|\\.)*")*\})? \S+$')
+
+
+@pytest.fixture
+def registry():
+    """Metriky vytvořené v testu se po něm odeberou z globálního registru."""
+    before = list(metrics.REGISTRY)
+    yield
+    metrics.REGISTRY[:] = before
+
+
+def test_counter_exposition(registry):
+    counter = metrics.Counter("test_lookups_total", "Dotazy", ["cache", "result"])
+    counter.inc(cache="tiles", result="hit")
+    counter.inc(2, cache="tiles", result="hit")
+    counter.inc(cache="svf", result='mi"ss')
+    assert counter.render().splitlines() == [
+        "# HELP test_lookups_total Dotazy",
+        "# TYPE test_lookups_total counter",
+        'test_lookups_total{cache="svf",result="mi\\"ss"} 1',
+        'test_lookups_total{cache="tiles",result="hit"} 3',
+    ]
+    assert counter.value(cache="tiles", result="hit") == 3
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("test_seconds", "Doba", ["route"], buckets=(0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, route="/a")
+    assert histogram.render().splitlines()[2:] == [
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="0.5"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 2.45',
+        'test_seconds_count{route="/a"} 4',
+    ]
+    assert histogram.count(route="/a") == 4
+
+
+def test_render_is_valid_exposition(registry):
+    metrics.Histogram("test_unlabelled_seconds", "Bez labelů").observe(0.2)
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert "test_unlabelled_seconds_count 1" in text
+    for line in text.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), line
+
+
+def test_stage_lands_in_trace_from_copied_context():
+    trace = metrics.RequestTrace()
+    token = metrics._current_trace.set(trace)
+    try:
+        with metrics.stage("encode"):
+            pass
+        worker = threading.Thread(target=contextvars.copy_context().run,
+                                  args=(metrics.record_stage, "upstream", 0.25))
+        worker.start()
+        worker.join()
+    finally:
+        metrics._current_trace.reset(token)
+    assert set(trace.stages) == {"encode", "upstream"}
+    assert trace.stages["upstream"] == 0.25
+    assert trace.server_timing(1.0).endswith("upstream;dur=250.0, total;dur=1000.0")
+
+
+def test_stage_outside_request_is_background():
+    before = metrics.STAGE_SECONDS.count(route="background", stage="test_stage", source="")
+    with metrics.stage("test_stage"):
+        pass
+    assert metrics.STAGE_SECONDS.count(route="background", stage="test_stage", source="") == before + 1
+
+
+def test_middleware_records_request_and_stages():
+    async def app(scope, receive, send):
+        with metrics.stage("test_mw"):
+            pass
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"x-data-source", b"ATOM-Real-DMR5G-PRAH12")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    labels = dict(route="unmatched", stage="test_mw", source="ATOM-Real-DMR5G")
+    before = metrics.STAGE_SECONDS.count(**labels)
+    asyncio.run(metrics.MetricsMiddleware(app)({"type": "http", "method": "GET"}, receive, send))
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"server-timing"].startswith(b"test_mw;dur=")
+    assert headers[b"timing-allow-origin"] == b"*"
+    assert metrics.STAGE_SECONDS.count(**labels) == before + 1
+    assert metrics.REQUEST_SECONDS.count(route="unmatched", method="GET", status="200",
+                                         source="ATOM-Real-DMR5G") >= 1
+
+
+def test_sentinel_pool_records_into_request_trace():
+    from app.sentinel import SentinelExecutor
+
+    def call():
+        with metrics.stage("upstream"):
+            return 42
+
+    async def scenario():
+        trace = metrics.RequestTrace()
+        metrics._current_trace.set(trace)
+        executor = SentinelExecutor(max_workers=1, max_queue=4, timeout=5)
+        return await executor.run(call), trace
+
+    result, trace = asyncio.run(scenario())
+    assert result == 42
+    assert set(trace.stages) == {"queue", "upstream"}
+
+
+def test_gauge_set_and_callback(registry):
+    gauge = metrics.Gauge("test_depth", "Fronta", ["queue"])
+    depth = [3]
+    gauge.set(2, queue="b")
+    gauge.set_function(lambda: depth[0], queue="a")
+    depth[0] = 5
+    assert gauge.render().splitlines() == [
+        "# HELP test_depth Fronta",
+        "# TYPE test_depth gauge",
+        'test_depth{queue="a"} 5',
+        'test_depth{queue="b"} 2',
+    ]
+    assert gauge.value(queue="a") == 5
+
+
+def test_queue_depths_are_exported(monkeypatch):
+    from app import jobs, sentinel
+
+    monkeypatch.setattr(sentinel.executor, "queued", 7)
+    manager = jobs.JobManager()
+    manager._jobs["queued-job"] = jobs.Job(job_id="queued-job", kind="svf")
+    monkeypatch.setattr(jobs, "job_manager", manager)
+    text = metrics.render()
+    assert 'earcheo_queue_depth{queue="sentinel"} 7' in text
+    assert 'earcheo_queue_depth{queue="jobs"} 1' in text
+    assert 'earcheo_queue_running{queue="jobs"} 0' in text
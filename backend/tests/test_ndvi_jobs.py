@@ -0,0 +1,62 @@
+"""
+NDVI přes API úloh se zástupným Sentinel Hub voláním.
+
+Testy importují app.main – WhiteboxTools si při inicializaci stahují
+binárky, bez nich (offline) se modul přeskočí.
+"""
+
+import asyncio
+import json
+
+import pytest
+from sentinelhub.download.models import DownloadRequest, DownloadResponse
+
+from app import jobs
+
+try:
+    from app import main
+except Exception as exc:  # whitebox bez binárek a bez sítě
+    pytest.skip(f"app.main nelze importovat: {exc}", allow_module_level=True)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nfake-ndvi"
+BBOX = dict(min_lon=14.40, min_lat=50.05, max_lon=14.42, max_lat=50.07)
+
+
+@pytest.fixture
+def sentinel_stub(monkeypatch):
+    """Sentinel Hub vrací DownloadResponse jako skutečné get_data(decode_data=False)."""
+    calls = []
+
+    def get_data(self, decode_data=True, **kwargs):
+        calls.append(decode_data)
+        return [DownloadResponse(request=DownloadRequest(), content=PNG_BYTES, status_code=200)]
+
+    monkeypatch.setattr(main, "SENTINEL_CLIENT_ID", "test-id")
+    monkeypatch.setattr(main, "SENTINEL_CLIENT_SECRET", "test-secret")
+    monkeypatch.setattr(main.SentinelHubRequest, "get_data", get_data)
+    monkeypatch.setattr(jobs, "job_manager", jobs.JobManager(max_workers=1, ttl=60))
+    return calls
+
+
+def test_ndvi_job_writes_png(sentinel_stub):
+    async def scenario():
+        response = await main.submit_ndvi_job(**BBOX, from_date="2025-06-01", to_date="2025-06-30",
+                                               resolution=40)
+        await asyncio.gather(*jobs.job_manager._tasks)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 202
+    job = jobs.job_manager.get(json.loads(response.body)["job_id"])
+    assert job.status == "done", job.error
+    assert job.result.path.read_bytes() == PNG_BYTES
+    assert sentinel_stub == [False]
+
+
+def test_ndvi_endpoint_streams_png(sentinel_stub):
+    async def scenario():
+        response = await main.calculate_ndvi(**BBOX, from_date="2025-06-01", to_date="2025-06-30",
+                                             resolution=40)
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    assert asyncio.run(scenario()) == PNG_BYTES
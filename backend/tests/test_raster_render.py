@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from app import raster_render
+
+
+@pytest.fixture
+def svf_geotiff(tmp_path):
+    """SVF jako z WhiteboxTools: hodnoty 0.6..1.0, okraj NoData = -32768."""
+    rng = np.random.default_rng(33)
+    data = rng.uniform(0.6, 1.0, (300, 280)).astype(np.float32)
+    data[:4, :] = data[-4:, :] = data[:, :4] = data[:, -4:] = -32768
+    path = tmp_path / "svf.tif"
+    with rasterio.open(path, "w", driver="GTiff", height=300, width=280, count=1, dtype="float32",
+                       crs="EPSG:5514", transform=from_origin(-740000, -1040000, 5, 5),
+                       nodata=-32768, tiled=True, blockxsize=128, blockysize=128) as dst:
+        dst.write(data, 1)
+    return path, data
+
+
+def test_dataset_stretch_ignores_nodata(svf_geotiff):
+    path, data = svf_geotiff
+    with rasterio.open(path) as src:
+        assert raster_render.dataset_min_max(src) == pytest.approx((0.6, 1.0), abs=1e-3)
+        stretch = raster_render.dataset_stretch(src, clip_percent=1.0)
+    assert 0.6 < stretch.vmin < 0.62 and 0.98 < stretch.vmax < 1.0
+
+
+def test_normalize_dataset_uses_full_grey_range(svf_geotiff):
+    path, data = svf_geotiff
+    with rasterio.open(path) as src:
+        image, _ = raster_render.normalize_dataset_to_uint8(src, clip_percent=0.0)
+    inner = image[4:-4, 4:-4]
+    assert len(np.unique(inner)) > 200
+    assert np.all(image[:4, :] == 0)
+
+
+def test_array_stretch_matches_dataset_stretch(svf_geotiff):
+    path, data = svf_geotiff
+    arr = np.where(data == -32768, np.nan, data)
+    with rasterio.open(path) as src:
+        from_dataset = raster_render.dataset_stretch(src)
+    assert raster_render.array_stretch(arr) == from_dataset
+
+
+def test_streaming_histogram_percentiles():
+    hist = raster_render.StreamingHistogram(0.0, 100.0, bins=1000)
+    values = np.arange(100_001, dtype=np.float32).reshape(-1, 1) / 1000
+    for block in raster_render.iter_array_blocks(values, rows=7):
+        hist.update(block)
+    assert hist.percentile(50) == pytest.approx(50.0, abs=0.1)
+    stretch = hist.stretch(5.0)
+    assert (stretch.vmin, stretch.vmax) == pytest.approx((5.0, 95.0), abs=0.1)
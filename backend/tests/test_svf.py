@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from app import svf
+
+
+def synthetic_dem(height: int = 150, width: int = 170) -> np.ndarray:
+    rng = np.random.default_rng(28)
+    rows, cols = np.mgrid[0:height, 0:width]
+    dem = 300 + 5 * np.sin(rows / 9.0) * np.cos(cols / 13.0) + rng.normal(0, 0.3, (height, width))
+    return dem.astype(np.float32)
+
+
+@pytest.mark.parametrize("method", [svf.sky_view_factor, svf.positive_openness])
+def test_tiled_matches_whole_raster(method):
+    dem = synthetic_dem()
+    dem[40:45, 60:70] = np.nan
+    whole = method(dem, 1.0, n_directions=8, radius_m=6.0, tile_size=1024, parallel=False)
+    tiled = method(dem, 1.0, n_directions=8, radius_m=6.0, tile_size=32, parallel=False)
+    np.testing.assert_array_equal(tiled, whole)
+
+
+def test_parallel_matches_serial():
+    dem = synthetic_dem()
+    serial = svf.sky_view_factor(dem, 1.0, n_directions=8, radius_m=6.0, tile_size=64, parallel=False)
+    parallel = svf.sky_view_factor(dem, 1.0, n_directions=8, radius_m=6.0, tile_size=64, parallel=True)
+    np.testing.assert_array_equal(parallel, serial)
+
+
+def test_svf_range_and_nodata():
+    dem = synthetic_dem()
+    dem[10, 10] = -9999
+    result = svf.sky_view_factor(dem, 1.0, n_directions=8, radius_m=6.0, nodata=-9999, parallel=False)
+    assert np.isnan(result[10, 10])
+    valid = result[np.isfinite(result)]
+    assert valid.min() >= 0 and valid.max() <= 1
+
+
+def test_flat_terrain_sees_whole_sky():
+    dem = np.full((40, 40), 250.0, dtype=np.float32)
+    result = svf.sky_view_factor(dem, 1.0, n_directions=8, radius_m=5.0, parallel=False)
+    np.testing.assert_allclose(result, 1.0, atol=1e-6)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app import terrain_mesh
+from app.terrain_mesh import GRID_SIZE, MESH_HEADER, QUANTIZED_MAX
+
+
+def decode_mesh(data: bytes):
+    """Referenční dekodér formátu z hlavičky app/terrain_mesh.py."""
+    min_h, max_h, vertex_count, triangle_count = MESH_HEADER.unpack_from(data)
+    offset = MESH_HEADER.size
+    columns = []
+    for _ in range(3):
+        zigzag = np.frombuffer(data, dtype="<u2", count=vertex_count, offset=offset).astype(np.int64)
+        offset += 2 * vertex_count
+        columns.append(np.cumsum((zigzag >> 1) ^ -(zigzag & 1)))
+    u, v, h = columns
+
+    index_dtype = "<u2" if vertex_count <= 65536 else "<u4"
+    codes = np.frombuffer(data, dtype=index_dtype, count=3 * triangle_count, offset=offset)
+    assert offset + codes.nbytes == len(data)
+    indices = np.empty(len(codes), dtype=np.int64)
+    highest = 0
+    for i, code in enumerate(codes.tolist()):
+        indices[i] = highest - code
+        if code == 0:
+            highest += 1
+    heights = min_h + h / QUANTIZED_MAX * (max_h - min_h)
+    return u, v, heights, indices.reshape(-1, 3)
+
+
+def terrain(seed: int = 44) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows, cols = np.mgrid[0:GRID_SIZE, 0:GRID_SIZE]
+    return (200 + 8 * np.sin(rows / 23.0) + 6 * np.cos(cols / 31.0)
+            + rng.normal(0, 0.2, rows.shape)).astype(np.float32)
+
+
+def covered_area(u, v, triangles) -> float:
+    a, b, c = (np.stack([u[triangles[:, k]], v[triangles[:, k]]], axis=1).astype(np.float64) for k in range(3))
+    ab, ac = b - a, c - a
+    return float(np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]).sum() / 2)
+
+
+@pytest.mark.parametrize("heights", [
+    np.full((GRID_SIZE, GRID_SIZE), 312.5, dtype=np.float32),
+    (100 + 0.3 * np.mgrid[0:GRID_SIZE, 0:GRID_SIZE].sum(axis=0)).astype(np.float32),
+])
+def test_planar_tile_is_two_triangles(heights):
+    data, vertices, triangles = terrain_mesh.build_mesh(heights, 0.01)
+    assert (vertices, triangles) == (4, 2)
+    u, v, decoded, _ = decode_mesh(data)
+    assert sorted(zip(u.tolist(), v.tolist())) == [(0, 0), (0, QUANTIZED_MAX), (QUANTIZED_MAX, 0),
+                                                    (QUANTIZED_MAX, QUANTIZED_MAX)]
+
+
+def test_round_trip_matches_grid():
+    heights = terrain()
+    data, vertex_count, triangle_count = terrain_mesh.build_mesh(heights, 0.5)
+    u, v, decoded, triangles = decode_mesh(data)
+    assert len(u) == vertex_count and len(triangles) == triangle_count
+
+    tile = GRID_SIZE - 1
+    cols = np.rint(u / QUANTIZED_MAX * tile).astype(int)
+    rows = tile - np.rint(v / QUANTIZED_MAX * tile).astype(int)
+    span = float(heights.max() - heights.min())
+    np.testing.assert_allclose(decoded, heights[rows, cols], atol=span / QUANTIZED_MAX)
+
+    # Trojúhelníky pokrývají celou dlaždici bez překryvů
+    assert covered_area(u, v, triangles) == pytest.approx(float(QUANTIZED_MAX) ** 2)
+
+
+def test_error_bound_controls_density():
+    heights = terrain()
+    errors = terrain_mesh.compute_errors(heights)
+    counts = [len(terrain_mesh.extract_mesh(errors, e)[0]) for e in (4.0, 1.0, 0.25, 0.0)]
+    assert counts == sorted(counts)
+    assert counts[-1] == GRID_SIZE * GRID_SIZE
+
+
+def test_hypotenuse_midpoints_within_bound():
+    heights = terrain()
+    max_error = 0.5
+    vertices, triangles = terrain_mesh.extract_mesh(terrain_mesh.compute_errors(heights), max_error)
+    points = vertices[triangles]
+    a, b = points[:, 0], points[:, 1]
+    leaf = np.abs(a - b).max(axis=1) == 1
+    a, b = a[~leaf], b[~leaf]
+    m = (a + b) // 2
+    interpolated = (heights[a[:, 1], a[:, 0]].astype(np.float64) + heights[b[:, 1], b[:, 0]]) / 2
+    assert np.abs(interpolated - heights[m[:, 1], m[:, 0]]).max() <= max_error + 1e-4
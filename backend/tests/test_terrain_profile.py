@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.terrain_profile import geodesic_distances, lttb_indices
+
+
+def test_lttb_short_input_is_returned_whole():
+    x = np.arange(5, dtype=np.float64)
+    assert list(lttb_indices(x, x, 10)) == [0, 1, 2, 3, 4]
+    assert list(lttb_indices(x, x, 5)) == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_endpoints_and_count():
+    x = np.linspace(0, 1000, 2001)
+    y = np.sin(x / 50.0)
+    idx = lttb_indices(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    assert 437 in lttb_indices(x, y, 20)
+
+
+def test_lttb_tolerates_nan():
+    x = np.arange(500, dtype=np.float64)
+    y = np.cos(x / 20.0)
+    y[100:150] = np.nan
+    idx = lttb_indices(x, y, 50)
+    assert len(idx) == 50
+    assert np.all(np.diff(idx) > 0)
+
+    all_nan = lttb_indices(x, np.full(500, np.nan), 50)
+    assert len(all_nan) == 50
+
+
+def test_lttb_degenerate_target():
+    x = np.arange(100, dtype=np.float64)
+    assert list(lttb_indices(x, x, 2)) == [0, 99]
+
+
+def test_geodesic_distances_along_meridian():
+    lngs = np.array([15.0, 15.0, 15.0])
+    lats = np.array([49.0, 49.5, 50.0])
+    distances = geodesic_distances(lngs, lats)
+    assert distances[0] == 0.0
+    # Stupeň šířky kolem 49.5° N má na elipsoidu WGS84 cca 111.2 km
+    assert abs(distances[-1] - 111_200) < 200
+    assert abs(distances[1] - distances[2] / 2) < 50
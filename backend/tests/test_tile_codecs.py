@@ -0,0 +1,112 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import tile_codecs
+
+
+def dem_tile(size: int = 256) -> np.ndarray:
+    rng = np.random.default_rng(45)
+    rows, cols = np.mgrid[0:size, 0:size]
+    tile = (350 + 20 * np.sin(rows / 17.0) + 0.05 * cols + rng.normal(0, 0.01, rows.shape)).astype(np.float32)
+    tile[:12, 200:] = np.nan
+    return tile
+
+
+def decode_terrarium(data: bytes) -> np.ndarray:
+    rgb = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"), dtype=np.float64)
+    return rgb[..., 0] * 256 + rgb[..., 1] + rgb[..., 2] / 256 - 32768
+
+
+def test_float32_raw_round_trip():
+    tile = dem_tile()
+    decoded = np.frombuffer(tile_codecs.float32_raw(tile, nodata=-9999), dtype="<f4").reshape(tile.shape)
+    valid = np.isfinite(tile)
+    np.testing.assert_array_equal(decoded[valid], tile[valid])
+    assert np.all(decoded[~valid] == -9999)
+
+
+@pytest.mark.parametrize("encode", [tile_codecs.terrarium_png, tile_codecs.terrarium_webp])
+def test_terrarium_round_trip(encode):
+    tile = dem_tile()
+    decoded = decode_terrarium(encode(tile))
+    valid = np.isfinite(tile)
+    # Krok Terraria je 1/256 m (posun o 32768 ve float32 už na tento krok zaokrouhlí)
+    assert np.abs(decoded[valid] - tile[valid]).max() <= 1 / 256
+    assert np.all(decoded[~valid] == tile_codecs.TERRARIUM_NODATA)
+
+
+def test_terrarium_clips_out_of_range():
+    tile = np.array([[-40000.0, 40000.0]], dtype=np.float32)
+    decoded = decode_terrarium(tile_codecs.terrarium_png(tile))
+    assert decoded[0, 0] == -32768 and decoded[0, 1] == pytest.approx(32767, abs=1 / 256)
+
+
+@pytest.mark.parametrize("max_error", [0.005, 0.05])
+def test_int16_round_trip_within_max_error(max_error):
+    tile = dem_tile()
+    decoded = tile_codecs.decode_quantized_int16(tile_codecs.quantized_int16(tile, max_error))
+    valid = np.isfinite(tile)
+    np.testing.assert_array_equal(np.isnan(decoded), ~valid)
+    # Navíc zaokrouhlení do float32 výstupu
+    assert np.abs(decoded[valid] - tile[valid]).max() <= max_error + 1e-4
+
+
+def test_int16_widens_step_for_large_span():
+    tile = np.linspace(0, 2000, 256 * 4, dtype=np.float32).reshape(4, 256)
+    data = tile_codecs.quantized_int16(tile, 0.005)
+    step = tile_codecs.QUANTIZED_HEADER.unpack_from(data)[4]
+    assert step == pytest.approx(2000 / (tile_codecs.QUANTIZED_MAX - 1))
+    decoded = tile_codecs.decode_quantized_int16(data)
+    assert np.abs(decoded - tile).max() <= step / 2 + 1e-3
+
+
+def test_int16_all_nodata():
+    tile = np.full((8, 8), np.nan, dtype=np.float32)
+    assert np.isnan(tile_codecs.decode_quantized_int16(tile_codecs.quantized_int16(tile))).all()
+
+
+def test_int16_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        tile_codecs.decode_quantized_int16(tile_codecs.float32_raw(dem_tile()))
+
+
+@pytest.mark.parametrize("format", list(tile_codecs.MEDIA_TYPES))
+def test_encode_tile_dispatch(format):
+    assert tile_codecs.encode_tile(dem_tile(), format)
+
+
+def test_encode_tile_unknown_format():
+    with pytest.raises(ValueError):
+        tile_codecs.encode_tile(dem_tile(), "jpeg")
+
+
+@pytest.mark.parametrize("codec", ["deflate", "zstd"])
+def test_float32_shuffled_is_lossless(codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    tile = dem_tile()
+    data = tile_codecs.float32_shuffled(tile, nodata=-9999, codec=codec)
+    assert tile_codecs.SHUFFLE_HEADER.unpack_from(data)[1] == tile_codecs.SHUFFLE_CODECS[codec]
+    decoded = tile_codecs.decode_float32_shuffled(data)
+    np.testing.assert_array_equal(decoded, tile_codecs.with_nodata(tile, -9999))
+    assert len(data) < tile.nbytes
+
+
+def test_float32_shuffled_falls_back_to_deflate(monkeypatch):
+    monkeypatch.setattr(tile_codecs, "zstandard", None)
+    data = tile_codecs.float32_shuffled(dem_tile(), codec="zstd")
+    assert tile_codecs.SHUFFLE_HEADER.unpack_from(data)[1] == tile_codecs.SHUFFLE_CODECS["deflate"]
+
+
+def test_float32_shuffled_non_square():
+    tile = dem_tile()[:7, :33]
+    decoded = tile_codecs.decode_float32_shuffled(tile_codecs.float32_shuffled(tile))
+    assert decoded.shape == (7, 33)
+
+
+def test_float32_shuffled_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        tile_codecs.decode_float32_shuffled(tile_codecs.quantized_int16(dem_tile()))
@@ -0,0 +1,24 @@
+import pyproj
+import pytest
+
+from app.tile_grid import lonlat_to_tile, mercator_tile_bounds
+
+
+def test_world_tile_bounds():
+    minx, miny, maxx, maxy = mercator_tile_bounds(0, 0, 0)
+    assert minx == pytest.approx(-20037508.34, abs=0.01)
+    assert maxy == pytest.approx(20037508.34, abs=0.01)
+    assert (minx, miny) == pytest.approx((-maxx, -maxy))
+
+
+@pytest.mark.parametrize("x, y, z", [(-1, 0, 3), (8, 0, 3), (0, 8, 3), (0, -1, 3), (0, 0, -1)])
+def test_out_of_range_tiles_are_rejected(x, y, z):
+    with pytest.raises(ValueError):
+        mercator_tile_bounds(x, y, z)
+
+
+def test_point_lies_in_its_tile():
+    x, y = lonlat_to_tile(14.42, 50.09, 14)
+    minx, miny, maxx, maxy = mercator_tile_bounds(x, y, 14)
+    px, py = pyproj.Transformer.from_crs(4326, 3857, always_xy=True).transform(14.42, 50.09)
+    assert minx < px < maxx and miny < py < maxy
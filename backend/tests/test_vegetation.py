@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_bounds
+
+from app import vegetation
+
+BBOX = (14.400, 50.000, 14.410, 50.006)
+
+
+@pytest.fixture
+def band_dir(tmp_path, monkeypatch):
+    """Tři scény jako GeoTIFF pro LocalBandSource (B04, B08, maska)."""
+    monkeypatch.setattr(vegetation, "BAND_CACHE_DIR", tmp_path / "cache")
+    rng = np.random.default_rng(36)
+    directory = tmp_path / "bands"
+    directory.mkdir()
+    for i, day in enumerate(("2025-05-01", "2025-06-01", "2025-07-01")):
+        red = rng.uniform(0.02, 0.1, (80, 80)).astype(np.float32)
+        nir = (rng.uniform(0.2, 0.5, (80, 80)) + 0.05 * i).astype(np.float32)
+        mask = np.ones((80, 80), dtype=np.float32)
+        mask[:10, :10] = 0
+        with rasterio.open(directory / f"{day}_S2.tif", "w", driver="GTiff", height=80, width=80, count=3,
+                           dtype="float32", crs="EPSG:4326",
+                           transform=from_bounds(*BBOX, 80, 80)) as dst:
+            dst.write(np.stack([red, nir, mask]))
+    return directory
+
+
+def test_stacked_index_matches_composite(band_dir):
+    source = vegetation.LocalBandSource(band_dir)
+    grid = vegetation.make_grid(*BBOX, resolution=10)
+    days = source.list_scenes(grid, "2025-01-01", "2025-12-31")
+    scenes = [vegetation.load_scene(source, grid, day) for day in days]
+
+    stack = np.empty((len(days), grid.height, grid.width), dtype=np.float32)
+    for i, scene in enumerate(scenes):
+        stack[i] = vegetation.index_stack(*scene, "savi")
+    for stat in vegetation.TEMPORAL_STATS:
+        np.testing.assert_array_equal(vegetation.temporal_statistic(stack, stat),
+                                      vegetation.composite(scenes, "savi", stat))
+
+
+def test_scene_cache_round_trip_and_corruption(band_dir):
+    source = vegetation.LocalBandSource(band_dir)
+    grid = vegetation.make_grid(*BBOX, resolution=10)
+    b04, b08 = vegetation.load_scene(source, grid, "2025-06-01")
+    assert vegetation.is_scene_cached(source, grid, "2025-06-01")
+    cached = vegetation.read_cached_scene(source, grid, "2025-06-01")
+    np.testing.assert_array_equal(cached[1], b08)
+
+    path = vegetation.scene_cache_path(source.name, grid, "2025-06-01")
+    path.write_bytes(b"PK\x03\x04 truncated")
+    assert vegetation.read_cached_scene(source, grid, "2025-06-01") is None
+    assert not path.exists()
+
+
+def test_max_scenes_bounds_composite_size(monkeypatch):
+    monkeypatch.setattr(vegetation, "MAX_SCENES", 60)
+    monkeypatch.setattr(vegetation, "MAX_COMPOSITE_MPX", 64)
+    assert vegetation.max_scenes(vegetation.BandGrid(BBOX, 500, 500)) == 60
+    assert vegetation.max_scenes(vegetation.BandGrid(BBOX, 2500, 2500)) == 10
+    assert vegetation.max_scenes(vegetation.BandGrid(BBOX, 10_000, 10_000)) == 1